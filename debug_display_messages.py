@@ -45,20 +45,21 @@ def debug_latest_inspection():
         print("\n📋 Response breakdown:")
         for response in responses:
             text_response = response.response.text_response
-            
-            if text_response:
-                if text_response.startswith('CONDITIONAL_'):
+            kind = response.response.kind
+
+            if kind != ResponseModel.KIND_ANSWER:
+                if kind == ResponseModel.KIND_CONDITIONAL_ANSWER:
                     conditional_responses += 1
-                    print(f"   🔄 Conditional: {text_response[:50]}...")
-                elif text_response.startswith('EVIDENCE_'):
+                    print(f"   🔄 Conditional: {response.response.entry_key}: {(text_response or '')[:50]}...")
+                elif kind == ResponseModel.KIND_EVIDENCE:
                     evidence_responses += 1
-                    print(f"   📸 Evidence: {text_response[:50]}...")
-                elif text_response.startswith('DISPLAY_MESSAGE_'):
+                    print(f"   📸 Evidence: {response.response.entry_key}: {(text_response or '')[:50]}...")
+                elif kind == ResponseModel.KIND_DISPLAY_MESSAGE:
                     display_message_responses += 1
-                    print(f"   💬 Display Message: {text_response}")
-                else:
-                    regular_responses += 1
-                    print(f"   ✅ Regular: Q{response.response.question.id} = {text_response[:30]}...")
+                    print(f"   💬 Display Message: {response.response.entry_key}: {text_response}")
+            elif text_response:
+                regular_responses += 1
+                print(f"   ✅ Regular: Q{response.response.question.id} = {text_response[:30]}...")
             else:
                 # Check other response types
                 if response.response.number_response is not None:
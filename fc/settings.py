@@ -117,6 +117,38 @@ DATABASES = {
     }
 }
 
+# Template access audit rows are written in batches by a background thread
+# (users/audit.py). Set AUDIT_LOG_ASYNC=false to write them inline.
+AUDIT_LOG_ASYNC = os.environ.get('AUDIT_LOG_ASYNC', 'true').lower() == 'true'
+AUDIT_LOG_QUEUE_SIZE = 10000      # events held in memory before new ones are dropped
+AUDIT_LOG_BATCH_SIZE = 200        # rows per bulk_create
+AUDIT_LOG_FLUSH_INTERVAL = 2.0    # seconds between flushes of a partial batch
+AUDIT_LOG_ENQUEUE_TIMEOUT = 0.05  # seconds a request waits on a full queue
+# Allowed template accesses by the same user with the same method are stored
+# once per window with a hit counter; denials are always stored. 0 keeps every event.
+AUDIT_ACCESS_DEDUP_WINDOW = int(os.environ.get('AUDIT_ACCESS_DEDUP_WINDOW', 300))
+# The audit table is partitioned by month; archive_audit_logs moves months older
+# than the retention period into gzip JSON-lines files in AUDIT_LOG_ARCHIVE_DIR
+# and drops them. Run it daily (cron) so next month's partition always exists.
+AUDIT_LOG_RETENTION_MONTHS = int(os.environ.get('AUDIT_LOG_RETENTION_MONTHS', 12))
+AUDIT_LOG_ARCHIVE_DIR = os.environ.get('AUDIT_LOG_ARCHIVE_DIR', os.path.join(BASE_DIR, 'audit_archive'))
+
+# Server-side PDF reports (users/pdf_reports.py): renders run in a process pool
+# of this size (0 renders inline) and are cached in MEDIA under reports/pdf/.
+REPORT_PDF_WORKERS = int(os.environ.get('REPORT_PDF_WORKERS', 2))
+REPORT_PDF_BULK_LIMIT = 500       # inspections per ZIP download
+
+# Permission lookups are cached here (users/permission_cache.py). Local memory
+# is per process, which matches the single gunicorn worker; with several
+# workers use a shared backend, e.g.
+# CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache CACHE_LOCATION=/tmp/fc-cache
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'fc-default'),
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -216,6 +248,9 @@ CORS_ALLOW_METHODS = [
     'PUT',
 ]
 
+# Template lists advertise their next page in a Link header
+CORS_EXPOSE_HEADERS = ['Link']
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
@@ -1,5 +1,7 @@
 
 
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
@@ -8,3 +10,6 @@ urlpatterns = [
     path('api/users/', include('users.urls')),  # Include users app URLs
     path('api/templates/', include('users.urls')),  # Include template URLs under /api/templates/
 ]
+
+# Serve uploaded media (logo renditions etc.) in development; nginx does it in production
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
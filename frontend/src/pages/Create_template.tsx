@@ -228,7 +228,8 @@ function cleanTemplateForSave(template: Template, isNew: boolean): Partial<Templ
     description: template.description,
     logo: template.logo,
     sections: template.sections.map((section) => {
-      const newSectionId = isNew || typeof section.id === "number" ? generateId() : section.id;
+      // Saved sections and questions keep their database ids so edits update them in place
+      const newSectionId = isNew ? generateId() : section.id;
 
       return {
         id: newSectionId,
@@ -236,7 +237,7 @@ function cleanTemplateForSave(template: Template, isNew: boolean): Partial<Templ
         description: section.description,
         isCollapsed: section.isCollapsed,
         questions: section.questions.map((q) => {
-          const newQuestionId = isNew || typeof q.id === "number" ? generateId() : q.id;
+          const newQuestionId = isNew ? generateId() : q.id;
 
           return {
             id: newQuestionId,
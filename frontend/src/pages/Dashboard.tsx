@@ -18,7 +18,7 @@ import {
   Menu
 } from 'lucide-react';
 import ConnectionsPanel, { Connection } from './components/ConnectionsPanel';
-import { fetchData } from '../utils/api';
+import { fetchAllPages, fetchData } from '../utils/api';
 
 interface Template {
   id: number;
@@ -223,7 +223,7 @@ const Dashboard: React.FC = () => {
           try {
             console.log(`Trying endpoint: ${endpoint}`);
 
-            const data = await fetchData(endpoint);
+            const data = await fetchAllPages(endpoint);
             console.log("Logged in user:", loggedInUser);
             console.log("Full response data:", data);
             console.log("Template creators:", data.map((t: Template) => t.createdBy || 'Unknown'));
@@ -873,6 +873,12 @@ const QuestionAnswering: React.FC = () => {
   const [isSubmitting, setIsSubmitting] = useState(false)
   const [isComplete, setIsComplete] = useState(false)
   const [submittedInspectionId, setSubmittedInspectionId] = useState<number | null>(null)
+  // One key per filled-out form: retried submits return the first inspection instead of a duplicate
+  const [submissionKey] = useState<string>(() =>
+    typeof crypto !== "undefined" && "randomUUID" in crypto
+      ? crypto.randomUUID()
+      : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`
+  )
   const [activeMessages, setActiveMessages] = useState<Record<string, string>>({})
   const [conditionalEvidence, setConditionalEvidence] = useState<Record<string, any>>({})
   const [activeConditionalFields, setActiveConditionalFields] = useState<Record<string, LogicRule[]>>({})
@@ -2016,6 +2022,7 @@ const QuestionAnswering: React.FC = () => {
       // Prepare data for submission
       const submissionData = {
         template_id: templateId,
+        submission_key: submissionKey,
         answers: answers,
         conditional_answers: conditionalAnswers,
         conditional_evidence: conditionalEvidence,
@@ -166,8 +166,8 @@ const InspectionReport: React.FC = () => {
   }
 
   const generatePDF = () => {
-    // PDF generation logic similar to Create_template.tsx
-    window.print()
+    // Rendered (and cached) on the server; the browser only downloads it
+    window.open(`/api/users/inspection/${id}/pdf/`, '_blank')
   }
 
   const renderGarmentDetails = () => {
@@ -22,7 +22,7 @@ import {
 } from 'lucide-react';
 import ScheduleInspectionModal from './components/ScheduleInspectionModal';
 import TemplateAssignmentManager from './components/TemplateAssignmentManager';
-import { fetchData } from '../utils/api';
+import { fetchAllPages, fetchData } from '../utils/api';
 import axios from 'axios';
 
 interface Assignment {
@@ -178,7 +178,7 @@ const Schedule: React.FC = () => {
         // For admin users, fetch created templates (same as Dashboard)
         for (const endpoint of endpointsToTry) {
           try {
-            const data = await fetchData(endpoint);
+            const data = await fetchAllPages(endpoint);
 
             // Filter templates by the logged-in user
             // Note: createdBy contains the user's email, but loggedInUser might be username
@@ -4,6 +4,7 @@ import type React from "react"
 import { useState, useEffect, useRef } from "react"
 import { useNavigate } from "react-router-dom"
 import "../assets/Template.css"
+import { nextPageUrl } from "../utils/api"
 import {
   Plus,
   Search,
@@ -88,6 +89,26 @@ const TemplatePage: React.FC = () => {
     template.title.toLowerCase().includes(searchTerm.toLowerCase())
   )
 
+  // Fetch the remaining pages of a template list, following the URL of each page's next link
+  const fetchRemainingPages = async (nextUrl: string | null, listKey?: string) => {
+    const items: Template[] = []
+    while (nextUrl) {
+      const response = await fetch(nextUrl, { credentials: 'include' })
+      if (!response.ok) {
+        throw new Error(`Failed to fetch ${nextUrl}: ${response.status}`)
+      }
+      const page = await response.json()
+      if (listKey) {
+        items.push(...page[listKey])
+        nextUrl = page[listKey.replace('_templates', '_next')]
+      } else {
+        items.push(...page)
+        nextUrl = nextPageUrl(response.headers.get('Link'))
+      }
+    }
+    return items
+  }
+
   const endpointsToTry = [
     "/api/users/templates-with-shared/",
     "/api/templates/",
@@ -302,9 +323,15 @@ const TemplatePage: React.FC = () => {
               // Check if the response has the new format with owned_templates and shared_templates
               if (data.owned_templates && data.shared_templates) {
                 console.log("Using new API format with owned and shared templates");
-                // Combine owned and shared templates
-                const ownedTemplates = data.owned_templates;
-                const sharedTemplates = data.shared_templates.map((template: Template) => ({
+                // Combine owned and shared templates, each paged with its own cursor
+                const ownedTemplates = [
+                  ...data.owned_templates,
+                  ...(await fetchRemainingPages(data.owned_next, 'owned_templates')),
+                ];
+                const sharedTemplates = [
+                  ...data.shared_templates,
+                  ...(await fetchRemainingPages(data.shared_next, 'shared_templates')),
+                ].map((template: Template) => ({
                   ...template,
                   isShared: true // Add a flag to identify shared templates
                 }));
@@ -312,8 +339,12 @@ const TemplatePage: React.FC = () => {
                 setTemplates([...ownedTemplates, ...sharedTemplates]);
               } else {
                 // Use the old format
-                console.log("Template creators:", data.map((t: Template) => t.createdBy || 'Unknown'));
-                setTemplates(data.filter((template: Template) => template.createdBy === loggedInUser));
+                const allTemplates = [
+                  ...data,
+                  ...(await fetchRemainingPages(nextPageUrl(response.headers.get('Link')))),
+                ];
+                console.log("Template creators:", allTemplates.map((t: Template) => t.createdBy || 'Unknown'));
+                setTemplates(allTemplates.filter((template: Template) => template.createdBy === loggedInUser));
               }
 
               setDebugInfo({ endpoints: results, successEndpoint: fullUrl, responseData: data })
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
-import { ArrowLeft, FileText, Calendar, MapPin, User, Eye } from 'lucide-react';
+import { ArrowLeft, FileText, Calendar, MapPin, User, Eye, Download } from 'lucide-react';
 import { fetchData } from '../utils/api';
 import './TemplateResults.css';
 
@@ -127,6 +127,17 @@ const TemplateResults: React.FC = () => {
               <h2>{resultsData.template.title}</h2>
             </div>
           </div>
+          <div className="tr-header-actions">
+            {/* Built and streamed by the server, one row per inspection */}
+            <a href={`/api/users/template/${templateId}/inspections/export/?type=csv`} className="tr-export-btn">
+              <Download size={18} />
+              Export CSV
+            </a>
+            <a href={`/api/users/template/${templateId}/inspections/export/?type=xlsx`} className="tr-export-btn">
+              <Download size={18} />
+              Export Excel
+            </a>
+          </div>
         </div>
 
         {/* Template Info */}
@@ -41,7 +41,9 @@ const AuditLogViewer: React.FC<AuditLogViewerProps> = ({
   standalone = false
 }) => {
   const [auditLogs, setAuditLogs] = useState<AuditLogEntry[]>([]);
+  const [nextPageUrl, setNextPageUrl] = useState<string | null>(null);
   const [isLoading, setIsLoading] = useState(true);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [actionFilter, setActionFilter] = useState<string>('all');
   const [userFilter, setUserFilter] = useState<string>('');
   const [dateRange, setDateRange] = useState<number>(7); // Default to 7 days
@@ -74,8 +76,10 @@ const AuditLogViewer: React.FC<AuditLogViewerProps> = ({
         }
       }
       
+      // Paged response: { next, results }
       const response = await axios.get(url);
-      setAuditLogs(response.data);
+      setAuditLogs(response.data.results);
+      setNextPageUrl(response.data.next);
     } catch (error) {
       console.error('Error fetching audit logs:', error);
     } finally {
@@ -83,6 +87,21 @@ const AuditLogViewer: React.FC<AuditLogViewerProps> = ({
     }
   };
 
+  // Append the next page (cursor pagination, newest first)
+  const fetchMoreAuditLogs = async () => {
+    if (!nextPageUrl) return;
+    setIsLoadingMore(true);
+    try {
+      const response = await axios.get(nextPageUrl);
+      setAuditLogs(prev => [...prev, ...response.data.results]);
+      setNextPageUrl(response.data.next);
+    } catch (error) {
+      console.error('Error fetching more audit logs:', error);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchAuditLogs();
   }, [templateId, userId, actionFilter, dateRange]);
@@ -323,6 +342,17 @@ const AuditLogViewer: React.FC<AuditLogViewerProps> = ({
             </div>
           ))
         )}
+
+        {!isLoading && nextPageUrl && (
+          <button
+            className="refresh-button load-more-button"
+            onClick={fetchMoreAuditLogs}
+            disabled={isLoadingMore}
+          >
+            <RefreshCw size={16} className={isLoadingMore ? 'spinning' : ''} />
+            Load more
+          </button>
+        )}
       </div>
     </div>
   );
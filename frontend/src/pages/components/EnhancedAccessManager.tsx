@@ -203,7 +203,7 @@ const EnhancedAccessManager: React.FC<EnhancedAccessManagerProps> = ({
   const fetchAuditLogs = async () => {
     try {
       const response = await axios.get(`/templates/${templateId}/audit-logs/`);
-      setAuditLogs(response.data);
+      setAuditLogs(response.data.results);
     } catch (error) {
       console.error('Error fetching audit logs:', error);
     }
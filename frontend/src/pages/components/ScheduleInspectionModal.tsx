@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { X, ChevronDown, Info, AlertCircle } from 'lucide-react';
 import axios from 'axios';
+import { fetchAllPages } from '../../utils/api';
 import './ScheduleInspectionModal.css';
 import { fetchCSRFToken } from '../../utils/csrf';
 
@@ -50,10 +51,7 @@ const ScheduleInspectionModal: React.FC<ScheduleInspectionModalProps> = ({ onClo
       setLoading(true);
       try {
         // Load templates
-        const templatesResponse = await axios.get('/api/users/templates/', {
-          withCredentials: true
-        });
-        setTemplates(templatesResponse.data);
+        setTemplates(await fetchAllPages('users/templates/'));
 
         // Load inspectors
         const inspectorsResponse = await axios.get('/api/users/inspectors/', {
@@ -1,4 +1,4 @@
-import axios, { AxiosRequestConfig } from 'axios';
+import axios, { AxiosRequestConfig, AxiosResponse } from 'axios';
 import { fetchCSRFToken } from './csrf';
 
 // Create an axios instance with default config
@@ -67,6 +67,29 @@ export const fetchData = async (endpoint: string, config?: AxiosRequestConfig) =
   }
 };
 
+// Template lists are cursor-paged: the next page's URL comes in a Link header (rel="next")
+export const nextPageUrl = (linkHeader?: string | null): string | null => {
+  const match = linkHeader?.match(/<([^>]+)>;\s*rel="next"/);
+  return match ? match[1] : null;
+};
+
+// Helper function to GET every page of a paged list endpoint
+export const fetchAllPages = async (endpoint: string, config?: AxiosRequestConfig) => {
+  const items: any[] = [];
+  let url: string | null = endpoint;
+  try {
+    while (url) {
+      const response: AxiosResponse = await api.get(url, config);
+      items.push(...response.data);
+      url = nextPageUrl(response.headers.link);
+    }
+    return items;
+  } catch (error) {
+    console.error(`Error fetching pages from ${endpoint}:`, error);
+    throw error;
+  }
+};
+
 // Helper function to make authenticated POST requests
 export const postData = async (endpoint: string, data: any, config?: AxiosRequestConfig) => {
   try {
@@ -0,0 +1,144 @@
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.utils.dateparse import parse_date
+
+from .models import Template, InspectionRollup, DefectTypeRollup
+from .audit_log_views import parse_id
+
+
+INTERVALS = {
+    'day': lambda: F('day'),
+    'week': lambda: TruncWeek('day'),
+    'month': lambda: TruncMonth('day'),
+}
+BREAKDOWNS = {'template': 'template_id', 'inspector': 'inspector', 'site': 'site'}
+
+INSPECTION_SUMS = ('inspections', 'passed', 'failed', 'critical', 'major', 'minor')
+DEFECT_SUMS = ('occurrences', 'critical', 'major', 'minor')
+
+
+def _parse_day(name, value):
+    try:
+        day = parse_date(value)
+    except ValueError:
+        # Well-formed but impossible dates (2024-02-30)
+        day = None
+    if day is None:
+        raise ValidationError({name: "Use an ISO date."})
+    return day
+
+
+def filter_rollups(rollups, params):
+    """
+    Filters shared by both rollup tables: template (repeatable), inspector,
+    site and start / end (ISO dates, inclusive).
+    """
+    template_ids = [parse_id('template', value) for value in params.getlist('template')]
+    if template_ids:
+        rollups = rollups.filter(template_id__in=template_ids)
+
+    for name in ('inspector', 'site'):
+        value = params.get(name)
+        if value is not None:
+            rollups = rollups.filter(**{name: value})
+
+    start = params.get('start')
+    if start:
+        rollups = rollups.filter(day__gte=_parse_day('start', start))
+
+    end = params.get('end')
+    if end:
+        rollups = rollups.filter(day__lte=_parse_day('end', end))
+
+    return rollups
+
+
+def _sums(fields):
+    # Suffixed, since annotations may not shadow the rollup's own fields
+    return {f'{name}_sum': Sum(name) for name in fields}
+
+
+def _row(row):
+    """A result row with the sums under their field names (0 when empty), plus the pass rate for inspections"""
+    row = {name[:-len('_sum')] if name.endswith('_sum') else name: value for name, value in row.items()}
+    for name in INSPECTION_SUMS + DEFECT_SUMS:
+        if name in row and row[name] is None:
+            row[name] = 0
+    if 'passed' in row:
+        # Percentage of judged inspections (PASS or FAIL) that passed
+        judged = row['passed'] + row['failed']
+        row['pass_rate'] = round(100 * row['passed'] / judged, 1) if judged else None
+    return row
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def inspection_analytics(request):
+    """
+    Pass rate and critical/major/minor trends plus a defect-type Pareto for
+    completed inspections, read from the daily rollups.
+    Query params: template (repeatable), inspector, site, start, end (ISO
+    dates), interval (day (default), week or month) and breakdown (template,
+    inspector or site) for per-value totals.
+    Admins see every template; everyone else the templates they created.
+    """
+    params = request.query_params
+    interval = params.get('interval', 'day')
+    if interval not in INTERVALS:
+        return Response({"detail": f"interval must be one of: {', '.join(INTERVALS)}."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    breakdown = params.get('breakdown')
+    if breakdown and breakdown not in BREAKDOWNS:
+        return Response({"detail": f"breakdown must be one of: {', '.join(BREAKDOWNS)}."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    inspection_rollups = InspectionRollup.objects.all()
+    defect_rollups = DefectTypeRollup.objects.all()
+    if request.user.user_role != 'admin':
+        requested = {parse_id('template', value) for value in params.getlist('template')}
+        if requested - set(Template.objects.filter(id__in=requested, user=request.user).values_list('id', flat=True)):
+            return Response({"detail": "You do not have permission to view results for this template."},
+                            status=status.HTTP_403_FORBIDDEN)
+        inspection_rollups = inspection_rollups.filter(template__user=request.user)
+        defect_rollups = defect_rollups.filter(template__user=request.user)
+    inspection_rollups = filter_rollups(inspection_rollups, params)
+    defect_rollups = filter_rollups(defect_rollups, params)
+
+    totals = _row(inspection_rollups.aggregate(**_sums(INSPECTION_SUMS)))
+    series = [
+        _row(row) for row in
+        inspection_rollups.annotate(period=INTERVALS[interval]())
+        .values('period').annotate(**_sums(INSPECTION_SUMS)).order_by('period')
+    ]
+
+    # Pareto: defect types by total defects, with the running share of all defects
+    defect_types = [
+        _row(row) for row in
+        defect_rollups.values('defect_type').annotate(**_sums(DEFECT_SUMS))
+        .annotate(defects=F('critical_sum') + F('major_sum') + F('minor_sum'))
+        .filter(occurrences_sum__gt=0).order_by('-defects', '-occurrences_sum', 'defect_type')
+    ]
+    all_defects = sum(row['defects'] for row in defect_types)
+    running = 0
+    for row in defect_types:
+        running += row['defects']
+        row['cumulative_percent'] = round(100 * running / all_defects, 1) if all_defects else None
+
+    data = {
+        "interval": interval,
+        "totals": totals,
+        "series": series,
+        "defect_types": defect_types,
+    }
+    if breakdown:
+        field = BREAKDOWNS[breakdown]
+        data["breakdown"] = [
+            _row(row) for row in
+            inspection_rollups.values(field).annotate(**_sums(INSPECTION_SUMS)).order_by('-inspections_sum', field)
+        ]
+    return Response(data)
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
+
+    def ready(self):
+        from . import dashboard_counters, garment_facts, media_blobs, permission_cache
+
+        dashboard_counters.connect_signals()
+        garment_facts.connect_signals()
+        media_blobs.connect_signals()
+        permission_cache.connect_signals()
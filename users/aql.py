@@ -0,0 +1,203 @@
+from bisect import bisect_left
+
+
+# ISO 2859-1 single sampling, normal inspection, as used by the garment
+# template page (frontend/src/utils/aqlTables.ts). Keep the two in step: the
+# server's verdict is the one that is stored.
+
+AQL_LEVELS = ('1.5', '2.5', '4.0', '6.5')
+INSPECTION_LEVELS = ('I', 'II', 'III')
+
+DEFAULT_AQL_LEVEL = '2.5'
+DEFAULT_INSPECTION_LEVEL = 'II'
+DEFAULT_SAMPLING_PLAN = 'Single'
+DEFAULT_SEVERITY = 'Normal'
+
+STATUS_PASS = 'PASS'
+STATUS_FAIL = 'FAIL'
+
+# Upper bound of each lot-size band; lots start at MIN_LOT_SIZE
+MIN_LOT_SIZE = 2
+LOT_SIZE_MAX = (8, 15, 25, 50, 90, 150, 280, 500, 1200, 3200, 10000, 35000)
+
+# Code letter per lot-size band, one string per inspection level
+CODE_LETTERS = {
+    'I': 'ABCDEFGHJKLM',
+    'II': 'BCDEFGHJKLMN',
+    'III': 'CDEFGHJKLMNP',
+}
+
+# (sample size, accept, reject) per code letter, in AQL_LEVELS order
+SAMPLE_PLANS = {
+    'A': ((2, 0, 1), (2, 0, 1), (2, 0, 1), (2, 0, 1)),
+    'B': ((3, 0, 1), (3, 0, 1), (3, 0, 1), (3, 0, 1)),
+    'C': ((5, 0, 1), (5, 0, 1), (5, 0, 1), (5, 0, 1)),
+    'D': ((8, 0, 1), (8, 0, 1), (8, 1, 2), (8, 1, 2)),
+    'E': ((13, 0, 1), (13, 1, 2), (13, 1, 2), (13, 2, 3)),
+    'F': ((20, 0, 1), (20, 1, 2), (20, 1, 2), (20, 3, 4)),
+    'G': ((32, 1, 2), (32, 2, 3), (32, 3, 4), (32, 5, 6)),
+    'H': ((50, 2, 3), (50, 3, 4), (50, 5, 6), (50, 7, 8)),
+    'J': ((80, 3, 4), (80, 5, 6), (80, 7, 8), (80, 10, 11)),
+    'K': ((125, 5, 6), (125, 7, 8), (125, 10, 11), (125, 14, 15)),
+    'L': ((200, 7, 8), (200, 10, 11), (200, 14, 15), (200, 21, 22)),
+    'M': ((315, 10, 11), (315, 14, 15), (315, 21, 22), (315, 21, 22)),
+}
+
+
+def code_letter(lot_size, inspection_level):
+    """The sample size code letter for a lot, or None outside the table"""
+    letters = CODE_LETTERS.get(inspection_level)
+    if letters is None or lot_size < MIN_LOT_SIZE:
+        return None
+    band = bisect_left(LOT_SIZE_MAX, lot_size)
+    return letters[band] if band < len(letters) else None
+
+
+def sample_plan(letter, aql_level):
+    """(sample size, accept, reject) for a code letter and AQL, or None if the table has none"""
+    plans = SAMPLE_PLANS.get(letter)
+    if plans is None or aql_level not in AQL_LEVELS:
+        return None
+    return plans[AQL_LEVELS.index(aql_level)]
+
+
+def _int(value):
+    # parseInt semantics: "12", 12 and 12.0 all count as 12; anything else as 0
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def lot_size(garment_data, sizes=None, colors=None):
+    """
+    Total offered quantity. Only the section's sizes and colors are counted
+    when they are given, the way the page totals its quantity grid.
+    """
+    quantities = (garment_data or {}).get('quantities') or {}
+    if not isinstance(quantities, dict):
+        return 0
+    total = 0
+    for color, by_size in quantities.items():
+        if colors and color not in colors or not isinstance(by_size, dict):
+            continue
+        for size, entry in by_size.items():
+            if sizes and size not in sizes or not isinstance(entry, dict):
+                continue
+            total += _int(entry.get('offeredQty'))
+    return total
+
+
+def defect_totals(garment_data):
+    """Total (critical, major, minor) defects recorded in the garment data"""
+    critical = major = minor = 0.0
+    defects = (garment_data or {}).get('defects') or []
+    for defect in defects if isinstance(defects, list) else []:
+        if isinstance(defect, dict):
+            critical += _float(defect.get('critical'))
+            major += _float(defect.get('major'))
+            minor += _float(defect.get('minor'))
+    return critical, major, minor
+
+
+def _count(value):
+    return int(value) if float(value).is_integer() else value
+
+
+def judge(plan, critical, major, minor):
+    """
+    PASS or FAIL for a sample plan: any critical defect fails, majors may not
+    exceed the accept number and minors twice the accept number.
+    """
+    if plan is None:
+        return STATUS_FAIL
+    accept = plan[1]
+    if critical > 0 or major > accept or minor > accept * 2:
+        return STATUS_FAIL
+    return STATUS_PASS
+
+
+def aql_settings(section=None, garment_data=None):
+    """
+    The AQL settings an inspection is judged by: the template's garment
+    section when there is one, otherwise what was recorded with the data.
+    """
+    if section is not None:
+        return {
+            'aqlLevel': section.aql_level or DEFAULT_AQL_LEVEL,
+            'inspectionLevel': section.inspection_level or DEFAULT_INSPECTION_LEVEL,
+            'samplingPlan': section.sampling_plan or DEFAULT_SAMPLING_PLAN,
+            'severity': section.severity or DEFAULT_SEVERITY,
+        }
+    recorded = (garment_data or {}).get('aqlSettings')
+    if not isinstance(recorded, dict):
+        recorded = {}
+    return {
+        'aqlLevel': recorded.get('aqlLevel') or DEFAULT_AQL_LEVEL,
+        'inspectionLevel': recorded.get('inspectionLevel') or DEFAULT_INSPECTION_LEVEL,
+        'samplingPlan': recorded.get('samplingPlan') or DEFAULT_SAMPLING_PLAN,
+        'severity': recorded.get('severity') or DEFAULT_SEVERITY,
+    }
+
+
+def evaluate(garment_data, section=None, aql_level=None, inspection_level=None):
+    """
+    The AQL verdict for an inspection's garment data: lot size, code letter,
+    sample plan, defect totals and PASS/FAIL. Only single sampling under
+    normal severity is tabulated; other plans are judged by that table too.
+    `aql_level` / `inspection_level` override the settings, e.g. to re-judge
+    history under a new policy.
+    """
+    settings = aql_settings(section, garment_data)
+    if aql_level is not None:
+        settings['aqlLevel'] = aql_level
+    if inspection_level is not None:
+        settings['inspectionLevel'] = inspection_level
+    size = lot_size(garment_data,
+                    sizes=section.sizes if section is not None else None,
+                    colors=section.colors if section is not None else None)
+    letter = code_letter(size, settings['inspectionLevel'])
+    plan = sample_plan(letter, settings['aqlLevel'])
+    critical, major, minor = defect_totals(garment_data)
+    return {
+        'status': judge(plan, critical, major, minor),
+        **settings,
+        'lotSize': size,
+        'codeLetter': letter,
+        'sampleSize': plan[0] if plan else None,
+        'accept': plan[1] if plan else None,
+        'reject': plan[2] if plan else None,
+        'defects': {'critical': _count(critical), 'major': _count(major), 'minor': _count(minor)},
+    }
+
+
+def with_verdict(garment_data, verdict):
+    """Garment data with a verdict written into aqlSettings (other recorded settings are kept)"""
+    recorded = garment_data.get('aqlSettings')
+    aql_settings_data = dict(recorded) if isinstance(recorded, dict) else {}
+    aql_settings_data.update({key: value for key, value in verdict.items() if key != 'defects'})
+    return {**garment_data, 'aqlSettings': aql_settings_data}
+
+
+def apply_verdict(garment_data, section=None):
+    """
+    Garment data with the server's verdict written into aqlSettings, replacing
+    whatever status the client computed. Returns (garment_data, verdict).
+    """
+    verdict = evaluate(garment_data, section)
+    return with_verdict(garment_data, verdict), verdict
+
+
+def garment_section(sections):
+    """The garment details section among a template's sections, if any"""
+    for section in sections:
+        if section.is_garment_section:
+            return section
+    return None
@@ -0,0 +1,287 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .models import PermissionAuditLog
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class _AccessAggregate:
+    """One stored 'allowed' access row standing for every hit in its window"""
+
+    def __init__(self, entry, window_start, window_seconds):
+        self.entry = entry
+        self.window_start = window_start
+        self.window_seconds = window_seconds
+        self.hits = 1
+        self.last_seen = entry.timestamp
+        self.written_hits = 0
+
+    def data(self):
+        data = dict(self.entry.additional_data or {})
+        data.update({
+            'hits': self.hits,
+            'window_start': self.window_start.isoformat(),
+            'window_seconds': self.window_seconds,
+            'last_seen': self.last_seen.isoformat(),
+        })
+        return data
+
+
+class AuditLogWriter:
+    """
+    Writes PermissionAuditLog rows off the request path.
+
+    Requests only put unsaved rows on a bounded in-process queue; a daemon
+    thread drains it and saves them with bulk_create once `batch_size` rows are
+    waiting or `flush_interval` seconds have passed. When the queue is full an
+    event waits at most `enqueue_timeout` seconds and is then dropped and
+    counted, so a slow database never stalls requests or grows memory without
+    bound. Whatever is still queued is flushed when the process exits.
+
+    Allowed 'access' events are collapsed: within an AUDIT_ACCESS_DEDUP_WINDOW
+    only the first hit per (user, template, method) becomes a row, later hits
+    raise additional_data['hits'] on it. Denied accesses are always written one
+    row per event, and grant/revoke/modify rows never go through this writer.
+
+    With AUDIT_LOG_ASYNC = False rows are written immediately (used by tests
+    and management commands that need to read their own rows back).
+    """
+
+    def __init__(self, max_queue_size=None, batch_size=None, flush_interval=None, enqueue_timeout=None,
+                 dedup_window=None):
+        self.dedup_window = dedup_window if dedup_window is not None else _setting('AUDIT_ACCESS_DEDUP_WINDOW', 300)
+        self.max_queue_size = max_queue_size or _setting('AUDIT_LOG_QUEUE_SIZE', 10000)
+        self.batch_size = batch_size or _setting('AUDIT_LOG_BATCH_SIZE', 200)
+        self.flush_interval = flush_interval or _setting('AUDIT_LOG_FLUSH_INTERVAL', 2.0)
+        self.enqueue_timeout = enqueue_timeout if enqueue_timeout is not None else _setting(
+            'AUDIT_LOG_ENQUEUE_TIMEOUT', 0.05
+        )
+
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+        # Open dedup windows: (user, template, method, window index) -> _AccessAggregate
+        self._aggregates = {}
+        self._aggregates_lock = threading.Lock()
+
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            'enqueued': 0,
+            'collapsed': 0,
+            'written': 0,
+            'dropped': 0,
+            'failed': 0,
+            'batches': 0,
+            'max_queue_depth': 0,
+            'last_flush_seconds': None,
+            'last_flush_at': None,
+        }
+
+    # -- request side -------------------------------------------------------
+
+    def log(self, **fields):
+        """Queue one PermissionAuditLog row; returns False if it had to be dropped"""
+        fields.setdefault('timestamp', timezone.now())
+        entry = PermissionAuditLog(**fields)
+        synchronous = not _setting('AUDIT_LOG_ASYNC', True)
+
+        key = self._dedup_key(entry)
+        if key is not None:
+            with self._aggregates_lock:
+                aggregate = self._aggregates.get(key)
+                if aggregate is not None:
+                    aggregate.hits += 1
+                    aggregate.last_seen = max(aggregate.last_seen, entry.timestamp)
+                else:
+                    window_start = datetime.fromtimestamp(key[-1] * self.dedup_window, tz=dt_timezone.utc)
+                    self._aggregates[key] = _AccessAggregate(entry, window_start, self.dedup_window)
+            if aggregate is not None:
+                self._count('collapsed')
+                if synchronous:
+                    self._update_aggregates()
+                return True
+
+        if synchronous:
+            self._write([entry])
+            return True
+
+        self._ensure_worker()
+        try:
+            self._queue.put(entry, timeout=self.enqueue_timeout)
+        except queue.Full:
+            self._count('dropped')
+            if key is not None:
+                # Later hits must not count onto a row that will never exist
+                with self._aggregates_lock:
+                    self._aggregates.pop(key, None)
+            print(f"⚠️ Audit log queue full ({self.max_queue_size}), dropping {entry.action} event")
+            return False
+
+        self._count('enqueued')
+        depth = self._queue.qsize()
+        with self._metrics_lock:
+            if depth > self._metrics['max_queue_depth']:
+                self._metrics['max_queue_depth'] = depth
+        return True
+
+    def _dedup_key(self, entry):
+        """Key of the window an allowed access falls into, or None if it must be kept as is"""
+        data = entry.additional_data or {}
+        if self.dedup_window <= 0 or entry.action != 'access' or data.get('status') != 'allowed':
+            return None
+        window_index = int(entry.timestamp.timestamp() // self.dedup_window)
+        return (entry.user_id, entry.template_id, data.get('method'), window_index)
+
+    def metrics(self):
+        """Counters for monitoring backpressure"""
+        with self._metrics_lock:
+            snapshot = dict(self._metrics)
+        snapshot['queue_depth'] = self._queue.qsize()
+        snapshot['queue_capacity'] = self.max_queue_size
+        snapshot['open_dedup_windows'] = len(self._aggregates)
+        snapshot['worker_alive'] = bool(self._thread and self._thread.is_alive())
+        return snapshot
+
+    # -- worker side --------------------------------------------------------
+
+    def _ensure_worker(self):
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            # After a fork the parent's thread and queue are not ours
+            if self._pid is not None and self._pid != os.getpid():
+                self._queue = queue.Queue(maxsize=self.max_queue_size)
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='audit-log-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if batch or self._aggregates:
+                close_old_connections()
+                if batch:
+                    self._write(batch)
+                self._update_aggregates()
+                # Don't keep a connection open between flushes
+                connection.close()
+
+    def _collect(self):
+        """Block until a batch is full or the flush interval ran out"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _write(self, entries):
+        started = time.monotonic()
+        with self._aggregates_lock:
+            # Collapsed rows are saved with the hit count they have right now
+            for entry in entries:
+                aggregate = self._aggregate_for(entry)
+                if aggregate is not None:
+                    entry.additional_data = aggregate.data()
+                    aggregate.written_hits = aggregate.hits
+        try:
+            PermissionAuditLog.objects.bulk_create(entries, batch_size=self.batch_size)
+        except Exception as e:
+            self._count('failed', len(entries))
+            print(f"❌ Failed to write {len(entries)} audit log entries: {e}")
+            # These rows will never exist; the next hit in their window starts a new one
+            with self._aggregates_lock:
+                for entry in entries:
+                    if self._aggregate_for(entry) is not None:
+                        del self._aggregates[self._dedup_key(entry)]
+            return
+        with self._metrics_lock:
+            self._metrics['written'] += len(entries)
+            self._metrics['batches'] += 1
+            self._metrics['last_flush_seconds'] = round(time.monotonic() - started, 4)
+            self._metrics['last_flush_at'] = timezone.now().isoformat()
+
+    def _aggregate_for(self, entry):
+        key = self._dedup_key(entry)
+        aggregate = self._aggregates.get(key) if key is not None else None
+        return aggregate if aggregate is not None and aggregate.entry is entry else None
+
+    def _update_aggregates(self):
+        """Save new hit counts of already written rows and forget closed windows"""
+        current_index = int(time.time() // self.dedup_window) if self.dedup_window > 0 else 0
+        changed = []
+        with self._aggregates_lock:
+            for key, aggregate in list(self._aggregates.items()):
+                closed = key[-1] < current_index
+                if aggregate.entry.pk is None:
+                    # Not written yet: a queued row carries its final count when
+                    # it is, so closed windows are forgotten either way
+                    if closed:
+                        aggregate.entry.additional_data = aggregate.data()
+                        del self._aggregates[key]
+                    continue
+                if aggregate.hits != aggregate.written_hits:
+                    aggregate.entry.additional_data = aggregate.data()
+                    aggregate.written_hits = aggregate.hits
+                    changed.append(aggregate.entry)
+                if closed:
+                    del self._aggregates[key]
+        if not changed:
+            return
+        try:
+            PermissionAuditLog.objects.bulk_update(changed, ['additional_data'], batch_size=self.batch_size)
+        except Exception as e:
+            self._count('failed', len(changed))
+            print(f"❌ Failed to update hit counts of {len(changed)} audit log entries: {e}")
+
+    def flush(self):
+        """Write everything queued so far from the calling thread"""
+        batch = self._drain()
+        for start in range(0, len(batch), self.batch_size):
+            self._write(batch[start:start + self.batch_size])
+        self._update_aggregates()
+
+    def shutdown(self, timeout=5.0):
+        """Stop the worker and flush what is left (registered with atexit)"""
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self.flush()
+
+    def _count(self, name, amount=1):
+        with self._metrics_lock:
+            self._metrics[name] += amount
+
+
+audit_writer = AuditLogWriter()
+atexit.register(audit_writer.shutdown)
@@ -3,16 +3,99 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
 from django.db.models import Q
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
 
 from .models import (
     Template, TemplateAccess, CustomUser, PermissionAuditLog
 )
 from .serializers import PermissionAuditLogSerializer
-from .permissions import IsTemplateOwner, HasTemplateAccess
+from .permissions import IsTemplateOwner, HasTemplateAccess, IsAdmin
+from .audit import audit_writer
+from .pagination import KeysetPagination
+
+
+def audit_log_pagination():
+    # Newest first, paged on (timestamp, id) so deep pages cost the same as the first
+    return KeysetPagination(timestamp_field='timestamp', page_size=100, max_page_size=500)
+
+
+def parse_bound(name, value, end=False):
+    """An ISO datetime, or a date meaning the start (or, for `end`, the end) of that day"""
+    try:
+        # Well-formed but impossible values (2024-02-30) raise ValueError
+        parsed = parse_datetime(value)
+        day = parse_date(value) if parsed is None else None
+    except ValueError:
+        raise ValidationError({name: "Use an ISO date or datetime."})
+    if parsed is None:
+        if day is None:
+            raise ValidationError({name: "Use an ISO date or datetime."})
+        parsed = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    elif end:
+        # end datetimes are inclusive
+        parsed += timedelta(microseconds=1)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_id(name, value):
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: "Must be an integer."})
+
+
+def filter_audit_logs(audit_logs, params):
+    """
+    Filters shared by the audit log endpoints:
+    action, status (additional_data status, e.g. allowed/denied), performed_by,
+    start / end (ISO date or datetime, inclusive) and the older `days`.
+    Date bounds also let PostgreSQL skip whole monthly partitions.
+    """
+    action_type = params.get('action')
+    if action_type:
+        audit_logs = audit_logs.filter(action=action_type)
+
+    log_status = params.get('status')
+    if log_status:
+        audit_logs = audit_logs.filter(additional_data__status=log_status)
+
+    performed_by = params.get('performed_by')
+    if performed_by:
+        audit_logs = audit_logs.filter(performed_by_id=parse_id('performed_by', performed_by))
+
+    start = params.get('start')
+    if start:
+        audit_logs = audit_logs.filter(timestamp__gte=parse_bound('start', start))
+
+    end = params.get('end')
+    if end:
+        audit_logs = audit_logs.filter(timestamp__lt=parse_bound('end', end, end=True))
+
+    days = params.get('days')
+    if days:
+        try:
+            days = int(days)
+            audit_logs = audit_logs.filter(timestamp__gte=timezone.now() - timedelta(days=days))
+        except ValueError:
+            pass
+
+    return audit_logs.select_related('user', 'performed_by', 'template')
+
+
+def paginated_audit_logs(request, audit_logs, params=None):
+    """One filtered page as {"next": <url or null>, "results": [...]}"""
+    paginator = audit_log_pagination()
+    params = request.query_params if params is None else params
+    page = paginator.paginate_queryset(filter_audit_logs(audit_logs, params), request)
+    serializer = PermissionAuditLogSerializer(page, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 class TemplateAuditLogView(APIView):
@@ -38,34 +121,13 @@ class TemplateAuditLogView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Get query parameters
-        action_type = request.query_params.get('action')
-        user_id = request.query_params.get('user')
-        days = request.query_params.get('days')
-        
-        # Base query
         audit_logs = PermissionAuditLog.objects.filter(template=template)
-        
-        # Apply filters
-        if action_type:
-            audit_logs = audit_logs.filter(action=action_type)
-        
+
+        user_id = request.query_params.get('user')
         if user_id:
-            audit_logs = audit_logs.filter(user_id=user_id)
-        
-        if days:
-            try:
-                days = int(days)
-                start_date = timezone.now() - timedelta(days=days)
-                audit_logs = audit_logs.filter(timestamp__gte=start_date)
-            except ValueError:
-                pass
-        
-        # Order by timestamp descending
-        audit_logs = audit_logs.order_by('-timestamp')
-        
-        serializer = PermissionAuditLogSerializer(audit_logs, many=True)
-        return Response(serializer.data)
+            audit_logs = audit_logs.filter(user_id=parse_id('user', user_id))
+
+        return paginated_audit_logs(request, audit_logs)
 
 
 class UserAuditLogView(APIView):
@@ -89,34 +151,13 @@ class UserAuditLogView(APIView):
                     status=status.HTTP_403_FORBIDDEN
                 )
         
-        # Get query parameters
-        action_type = request.query_params.get('action')
-        template_id = request.query_params.get('template')
-        days = request.query_params.get('days')
-        
-        # Base query
         audit_logs = PermissionAuditLog.objects.filter(user=user)
-        
-        # Apply filters
-        if action_type:
-            audit_logs = audit_logs.filter(action=action_type)
-        
+
+        template_id = request.query_params.get('template')
         if template_id:
-            audit_logs = audit_logs.filter(template_id=template_id)
-        
-        if days:
-            try:
-                days = int(days)
-                start_date = timezone.now() - timedelta(days=days)
-                audit_logs = audit_logs.filter(timestamp__gte=start_date)
-            except ValueError:
-                pass
-        
-        # Order by timestamp descending
-        audit_logs = audit_logs.order_by('-timestamp')
-        
-        serializer = PermissionAuditLogSerializer(audit_logs, many=True)
-        return Response(serializer.data)
+            audit_logs = audit_logs.filter(template_id=parse_id('template', template_id))
+
+        return paginated_audit_logs(request, audit_logs)
 
 
 @api_view(['GET'])
@@ -135,19 +176,19 @@ def recent_audit_logs(request):
           access_permissions__status='active')
     ).distinct()
     
-    # Get recent logs for these templates
-    days = request.query_params.get('days', 7)
-    try:
-        days = int(days)
-    except ValueError:
-        days = 7
-        
-    start_date = timezone.now() - timedelta(days=days)
-    
-    audit_logs = PermissionAuditLog.objects.filter(
-        template__in=accessible_templates,
-        timestamp__gte=start_date
-    ).order_by('-timestamp')[:100]  # Limit to 100 most recent logs
-    
-    serializer = PermissionAuditLogSerializer(audit_logs, many=True)
-    return Response(serializer.data)
+    # Default to the last 7 days unless the client gave its own range
+    params = request.query_params.copy()
+    if not any(params.get(name) for name in ('days', 'start', 'end')):
+        params['days'] = '7'
+
+    audit_logs = PermissionAuditLog.objects.filter(template__in=accessible_templates.values('id'))
+    return paginated_audit_logs(request, audit_logs, params)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def audit_writer_metrics(request):
+    """
+    Backpressure counters of the batched audit log writer in this process
+    """
+    return Response(audit_writer.metrics())
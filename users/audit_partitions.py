@@ -0,0 +1,139 @@
+import gzip
+import json
+import os
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+
+from .models import PermissionAuditLog
+
+
+# users_permissionauditlog is range-partitioned by month on "timestamp"
+# (migration 0015). Partition bounds are UTC month starts.
+PARENT_TABLE = PermissionAuditLog._meta.db_table
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+PARTITION_NAME_RE = re.compile(rf'^{PARENT_TABLE}_p(\d{{4}})_(\d{{2}})$')
+
+ARCHIVE_FETCH_SIZE = 2000
+
+
+def month_start(value):
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(month):
+    return f'{PARENT_TABLE}_p{month.year:04d}_{month.month:02d}'
+
+
+def archive_file_name(month):
+    return f'audit_log_{month.year:04d}_{month.month:02d}.jsonl.gz'
+
+
+def monthly_partitions():
+    """{month start: partition table name} for every monthly partition attached to the parent"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname FROM pg_inherits
+              JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+             WHERE pg_inherits.inhparent = %s::regclass
+            """,
+            [PARENT_TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = {}
+    for name in names:
+        match = PARTITION_NAME_RE.match(name)
+        if match:
+            partitions[datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)] = name
+    return partitions
+
+
+def create_partition(month):
+    """
+    Attach the partition for `month`. Rows that already landed in the DEFAULT
+    partition for that month are moved into it, otherwise the attach fails.
+    """
+    name = partition_name(month)
+    bounds = [month, add_months(month, 1)]
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE "{name}" (LIKE "{PARENT_TABLE}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM "{DEFAULT_PARTITION}" WHERE "timestamp" >= %s AND "timestamp" < %s '
+            f'RETURNING *) INSERT INTO "{name}" SELECT * FROM moved',
+            bounds,
+        )
+        moved = cursor.rowcount
+        cursor.execute(
+            f'ALTER TABLE "{PARENT_TABLE}" ATTACH PARTITION "{name}" FOR VALUES FROM (%s) TO (%s)',
+            bounds,
+        )
+    return moved
+
+
+def archive_rows(table, path, start=None, end=None):
+    """
+    Append the rows of `table` (optionally limited to [start, end)) to a gzip
+    JSON-lines file, one audit row per line. Returns the number of rows written.
+    """
+    sql = f'SELECT row_to_json(t)::text FROM "{table}" t'
+    params = []
+    if start is not None:
+        sql += ' WHERE "timestamp" >= %s AND "timestamp" < %s'
+        params = [start, end]
+    sql += ' ORDER BY "timestamp", "id"'
+
+    written = 0
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Appending adds a new gzip member; readers see one continuous stream
+    with gzip.open(path, 'at', encoding='utf-8') as archive, connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(ARCHIVE_FETCH_SIZE)
+            if not rows:
+                break
+            for (row,) in rows:
+                archive.write(row)
+                archive.write('\n')
+            written += len(rows)
+    return written
+
+
+def drop_partition(name):
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{PARENT_TABLE}" DETACH PARTITION "{name}"')
+        cursor.execute(f'DROP TABLE "{name}"')
+
+
+def delete_default_rows(start, end):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM "{DEFAULT_PARTITION}" WHERE "timestamp" >= %s AND "timestamp" < %s',
+            [start, end],
+        )
+        return cursor.rowcount
+
+
+def default_partition_months(before):
+    """Month starts of the rows sitting in the DEFAULT partition older than `before`"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""SELECT DISTINCT date_trunc('month', "timestamp" AT TIME ZONE 'UTC')
+                  FROM "{DEFAULT_PARTITION}" WHERE "timestamp" < %s ORDER BY 1""",
+            [before],
+        )
+        return [row[0].replace(tzinfo=dt_timezone.utc) for row in cursor.fetchall()]
+
+
+def read_archive(path):
+    """Rows of an archive file, mainly for restores and checks"""
+    with gzip.open(path, 'rt', encoding='utf-8') as archive:
+        return [json.loads(line) for line in archive if line.strip()]
@@ -0,0 +1,176 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Min, Q
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.utils import timezone
+
+from .models import DashboardCounter, Inspection, Template, TemplateAssignment
+
+
+# Dashboard counts live in DashboardCounter rows, one per user and counter plus
+# a global row (user=None), and are served from the cache. Template and
+# inspection writes move them by deltas. Assignment writes recount the users
+# involved instead: assignments are few, and whether one is overdue depends on
+# the clock, so overdue rows carry the next due date as valid_until and are
+# recounted once it passes. Missing rows are counted on first read;
+# reconcile_dashboard_counters repairs drift from writes that skip signals.
+
+TEMPLATES_CREATED = 'templates_created'
+INSPECTIONS_COMPLETED = 'inspections_completed'
+PENDING_ASSIGNMENTS = 'pending_assignments'
+OVERDUE_ASSIGNMENTS = 'overdue_assignments'
+COUNTERS = (TEMPLATES_CREATED, INSPECTIONS_COMPLETED, PENDING_ASSIGNMENTS, OVERDUE_ASSIGNMENTS)
+ASSIGNMENT_COUNTERS = (PENDING_ASSIGNMENTS, OVERDUE_ASSIGNMENTS)
+
+PENDING_STATUSES = ('assigned', 'in_progress')
+
+# Cached counters are served for this long at most
+DASHBOARD_CACHE_TIMEOUT = 60
+
+# Templates being deleted -> users with pending assignments on them. The
+# cascade's inspections and assignments are accounted for once per template.
+_deleting_templates = {}
+
+
+def cache_key(user_id):
+    return f'dashboard:{user_id or "global"}'
+
+
+def counted(name, user_id=None, now=None):
+    """
+    The rows counter `name` counts for a user (None: everyone): templates they
+    own, completed inspections of those templates, and pending / overdue
+    assignments they were given or gave.
+    """
+    if name == TEMPLATES_CREATED:
+        queryset = Template.objects.all()
+        return queryset.filter(user_id=user_id) if user_id else queryset
+    if name == INSPECTIONS_COMPLETED:
+        queryset = Inspection.objects.filter(status='completed')
+        return queryset.filter(template__user_id=user_id) if user_id else queryset
+    queryset = TemplateAssignment.objects.filter(status__in=PENDING_STATUSES)
+    if user_id:
+        queryset = queryset.filter(Q(inspector_id=user_id) | Q(assigned_by_id=user_id))
+    if name == OVERDUE_ASSIGNMENTS:
+        queryset = queryset.filter(due_date__lt=now or timezone.now())
+    return queryset
+
+
+def count(name, user_id=None):
+    """(value, valid_until) of a counter, counted in the database"""
+    now = timezone.now()
+    valid_until = None
+    if name == OVERDUE_ASSIGNMENTS:
+        valid_until = counted(PENDING_ASSIGNMENTS, user_id).filter(due_date__gte=now).aggregate(
+            next_due=Min('due_date')
+        )['next_due']
+    return counted(name, user_id, now).count(), valid_until
+
+
+def invalidate(user_ids):
+    """Drop the cached counters of these users and the global ones"""
+    keys = [cache_key(None)] + [cache_key(user_id) for user_id in set(user_ids) if user_id]
+    cache.delete_many(keys)
+    # Again once committed, so counters cached from the pre-commit state go too
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def add(name, user_ids, delta):
+    """Move a counter of these users and the global one by `delta` (rows not counted yet are left alone)"""
+    if not delta:
+        return
+    user_ids = [user_id for user_id in set(user_ids) if user_id]
+    DashboardCounter.objects.filter(Q(user__isnull=True) | Q(user_id__in=user_ids), name=name).update(
+        value=F('value') + delta
+    )
+    invalidate(user_ids)
+
+
+def recount(names, user_ids):
+    """Recount existing counter rows of these users and the global ones"""
+    user_ids = [user_id for user_id in set(user_ids) if user_id]
+    rows = list(DashboardCounter.objects.filter(Q(user__isnull=True) | Q(user_id__in=user_ids), name__in=names))
+    for row in rows:
+        row.value, row.valid_until = count(row.name, row.user_id)
+    DashboardCounter.objects.bulk_update(rows, ['value', 'valid_until'])
+    invalidate(user_ids)
+
+
+def dashboard_counters(user_id=None):
+    """{counter name: value} for a user (None: everyone), from the cache or the counter rows"""
+    key = cache_key(user_id)
+    counters = cache.get(key)
+    if counters is not None:
+        return counters
+
+    now = timezone.now()
+    rows = {row.name: row for row in DashboardCounter.objects.filter(user_id=user_id)}
+    counters = {}
+    expires = []
+    for name in COUNTERS:
+        row = rows.get(name)
+        if row is None or (row.valid_until is not None and row.valid_until < now):
+            value, valid_until = count(name, user_id)
+            row, _ = DashboardCounter.objects.update_or_create(
+                user_id=user_id, name=name, defaults={'value': value, 'valid_until': valid_until}
+            )
+        counters[name] = row.value
+        if row.valid_until is not None:
+            expires.append((row.valid_until - now).total_seconds())
+
+    cache.set(key, counters, max(1, min([DASHBOARD_CACHE_TIMEOUT] + expires)))
+    return counters
+
+
+def _template_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        add(TEMPLATES_CREATED, [instance.user_id], 1)
+
+
+def _template_deleting(sender, instance, **kwargs):
+    completed = Inspection.objects.filter(template_id=instance.pk, status='completed').count()
+    add(INSPECTIONS_COMPLETED, [instance.user_id], -completed)
+    users = set()
+    for inspector_id, assigned_by_id in TemplateAssignment.objects.filter(
+        template_id=instance.pk, status__in=PENDING_STATUSES
+    ).values_list('inspector_id', 'assigned_by_id'):
+        users.update((inspector_id, assigned_by_id))
+    _deleting_templates[instance.pk] = users
+
+
+def _template_deleted(sender, instance, **kwargs):
+    add(TEMPLATES_CREATED, [instance.user_id], -1)
+    users = _deleting_templates.pop(instance.pk, None)
+    if users:
+        recount(ASSIGNMENT_COUNTERS, users)
+
+
+def _inspection_saved(sender, instance, created, raw=False, **kwargs):
+    # Inspections are submitted completed and keep that status
+    if created and not raw and instance.status == 'completed':
+        add(INSPECTIONS_COMPLETED, [instance.template.user_id], 1)
+
+
+def _inspection_deleted(sender, instance, **kwargs):
+    if instance.status != 'completed' or instance.template_id in _deleting_templates:
+        return
+    owner_id = Template.objects.filter(pk=instance.template_id).values_list('user_id', flat=True).first()
+    add(INSPECTIONS_COMPLETED, [owner_id], -1)
+
+
+def _assignment_changed(sender, instance, raw=False, **kwargs):
+    if raw or instance.template_id in _deleting_templates:
+        return
+    recount(ASSIGNMENT_COUNTERS, [instance.inspector_id, instance.assigned_by_id])
+
+
+def connect_signals():
+    post_save.connect(_template_saved, sender=Template, dispatch_uid='dashboard_counters_template_saved')
+    pre_delete.connect(_template_deleting, sender=Template, dispatch_uid='dashboard_counters_template_deleting')
+    post_delete.connect(_template_deleted, sender=Template, dispatch_uid='dashboard_counters_template_deleted')
+    post_save.connect(_inspection_saved, sender=Inspection, dispatch_uid='dashboard_counters_inspection_saved')
+    post_delete.connect(_inspection_deleted, sender=Inspection, dispatch_uid='dashboard_counters_inspection_deleted')
+    post_save.connect(_assignment_changed, sender=TemplateAssignment,
+                      dispatch_uid='dashboard_counters_assignment_saved')
+    post_delete.connect(_assignment_changed, sender=TemplateAssignment,
+                        dispatch_uid='dashboard_counters_assignment_deleted')
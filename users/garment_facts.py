@@ -0,0 +1,94 @@
+from django.db.models.signals import post_save
+
+from .models import GarmentDefectLine, GarmentQuantityLine, Inspection
+
+
+# Inspection.garment_data stays the source of truth; these rows are its
+# quantity grid and defect list in queryable form. They are rewritten whenever
+# an inspection is saved with garment data, and by backfill_garment_facts.
+
+COLOR_MAX_LENGTH = GarmentQuantityLine._meta.get_field('color').max_length
+SIZE_MAX_LENGTH = GarmentQuantityLine._meta.get_field('size').max_length
+DEFECT_TYPE_MAX_LENGTH = GarmentDefectLine._meta.get_field('defect_type').max_length
+
+
+def _count(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return 0
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+def quantity_lines(inspection):
+    """Unsaved quantity lines for every color/size cell of the garment data"""
+    quantities = (inspection.garment_data or {}).get('quantities') or {}
+    lines = []
+    for color, by_size in quantities.items() if isinstance(quantities, dict) else ():
+        if not isinstance(by_size, dict):
+            continue
+        for size, entry in by_size.items():
+            if not isinstance(entry, dict):
+                continue
+            lines.append(GarmentQuantityLine(
+                inspection_id=inspection.id,
+                color=str(color)[:COLOR_MAX_LENGTH],
+                size=str(size)[:SIZE_MAX_LENGTH],
+                order_qty=_count(entry.get('orderQty')),
+                offered_qty=_count(entry.get('offeredQty')),
+            ))
+    return lines
+
+
+def defect_lines(inspection):
+    """Unsaved defect lines for every entry of the garment data's defect list"""
+    defects = (inspection.garment_data or {}).get('defects') or []
+    return [
+        GarmentDefectLine(
+            inspection_id=inspection.id,
+            defect_type=_text(defect.get('type'))[:DEFECT_TYPE_MAX_LENGTH],
+            remarks=_text(defect.get('remarks')),
+            critical=_count(defect.get('critical')),
+            major=_count(defect.get('major')),
+            minor=_count(defect.get('minor')),
+        )
+        for defect in (defects if isinstance(defects, list) else ())
+        if isinstance(defect, dict)
+    ]
+
+
+def sync_garment_facts(inspections, replace=True):
+    """
+    Rewrite the fact lines of `inspections` from their garment data: one
+    delete per table (skipped with replace=False, for rows known to have
+    none) and one bulk insert per table.
+    """
+    inspections = [inspection for inspection in inspections if inspection.id is not None]
+    if replace:
+        ids = [inspection.id for inspection in inspections]
+        GarmentQuantityLine.objects.filter(inspection_id__in=ids).delete()
+        GarmentDefectLine.objects.filter(inspection_id__in=ids).delete()
+    quantities = [line for inspection in inspections for line in quantity_lines(inspection)]
+    defects = [line for inspection in inspections for line in defect_lines(inspection)]
+    if quantities:
+        GarmentQuantityLine.objects.bulk_create(quantities)
+    if defects:
+        GarmentDefectLine.objects.bulk_create(defects)
+    return len(quantities), len(defects)
+
+
+def _inspection_saved(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return  # fixture loading
+    if update_fields is not None and 'garment_data' not in update_fields:
+        return
+    if created and not instance.garment_data:
+        return  # nothing to project and nothing to remove
+    sync_garment_facts([instance], replace=not created)
+
+
+def connect_signals():
+    post_save.connect(_inspection_saved, sender=Inspection, dispatch_uid='garment_facts_inspection_saved')
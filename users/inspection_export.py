@@ -0,0 +1,166 @@
+import csv
+import json
+import tempfile
+from datetime import datetime
+
+from django.db.models import prefetch_related_objects
+from django.db.models.fields.json import KeyTransform
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+from .audit_log_views import parse_bound
+from .inspection_report import answer_value
+from .models import Inspection, InspectionResponse, Response as ResponseModel
+from .querysets import template_tree_prefetch
+
+
+# Inspections are read through a server-side cursor this many at a time, and
+# the answers of each batch are fetched with one query.
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_TYPES = ('csv', 'xlsx')
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+INSPECTION_COLUMNS = ['Inspection ID', 'Title', 'Conducted By', 'Conducted At', 'Location', 'Site', 'Status']
+GARMENT_COLUMNS = ['AQL Result', 'Critical Defects', 'Major Defects', 'Minor Defects']
+
+
+def export_queryset(template, params):
+    """
+    The template's inspections in conducted_at order, optionally limited by
+    `start` / `end` (ISO dates or datetimes, end inclusive). Only the garment
+    values the export needs are pulled out of the JSON.
+    """
+    inspections = Inspection.objects.filter(template=template)
+    start = params.get('start')
+    if start:
+        inspections = inspections.filter(conducted_at__gte=parse_bound('start', start))
+    end = params.get('end')
+    if end:
+        inspections = inspections.filter(conducted_at__lt=parse_bound('end', end, end=True))
+    return inspections.only(
+        'id', 'title', 'conducted_by', 'conducted_at', 'location', 'site', 'status'
+    ).annotate(
+        export_defects=KeyTransform('defects', 'garment_data'),
+        export_aql_status=KeyTransform('status', KeyTransform('aqlSettings', 'garment_data')),
+    ).order_by('conducted_at', 'id')
+
+
+def template_questions(template):
+    """The template's questions in section/question order"""
+    prefetch_related_objects([template], template_tree_prefetch())
+    return [(section, question) for section in template.sections.all() for question in section.questions.all()]
+
+
+def header_row(questions):
+    return INSPECTION_COLUMNS + [f'{section.title} / {question.text}' for section, question in questions] \
+        + GARMENT_COLUMNS
+
+
+def _cell(value):
+    if isinstance(value, (list, tuple)):
+        return ', '.join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value)
+    return value
+
+
+def _number(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _defect_totals(defects):
+    totals = [0, 0, 0]
+    for defect in defects if isinstance(defects, list) else []:
+        if isinstance(defect, dict):
+            totals = [total + _number(defect.get(kind)) for total, kind in zip(totals, ('critical', 'major', 'minor'))]
+    return totals
+
+
+def _answers_by_inspection(inspection_ids):
+    answers = {inspection_id: {} for inspection_id in inspection_ids}
+    links = InspectionResponse.objects.filter(
+        inspection_id__in=inspection_ids, response__kind=ResponseModel.KIND_ANSWER
+    ).select_related('response__choice_response').order_by('id')
+    for link in links:
+        answers[link.inspection_id][link.response.question_id] = answer_value(link.response)
+    return answers
+
+
+def _batch_rows(batch, question_ids):
+    answers = _answers_by_inspection([inspection.id for inspection in batch])
+    for inspection in batch:
+        inspection_answers = answers[inspection.id]
+        yield [
+            inspection.id,
+            inspection.title,
+            inspection.conducted_by,
+            # Spreadsheets have no time zones; export local wall-clock time
+            timezone.localtime(inspection.conducted_at).replace(tzinfo=None),
+            inspection.location,
+            inspection.site,
+            inspection.status,
+        ] + [_cell(inspection_answers.get(question_id)) for question_id in question_ids] + [
+            inspection.export_aql_status,
+        ] + _defect_totals(inspection.export_defects)
+
+
+def export_rows(template, inspections):
+    """
+    The header and then one row per inspection. Memory is bounded by
+    EXPORT_CHUNK_SIZE inspections however many the export covers.
+    """
+    questions = template_questions(template)
+    question_ids = [question.id for _, question in questions]
+    yield header_row(questions)
+
+    batch = []
+    for inspection in inspections.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        batch.append(inspection)
+        if len(batch) >= EXPORT_CHUNK_SIZE:
+            yield from _batch_rows(batch, question_ids)
+            batch = []
+    if batch:
+        yield from _batch_rows(batch, question_ids)
+
+
+class _Echo:
+    """csv.writer target that hands each written line back instead of buffering it"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(template, inspections):
+    writer = csv.writer(_Echo())
+    # The BOM makes Excel open the file as UTF-8
+    yield '\ufeff'
+    for row in export_rows(template, inspections):
+        yield writer.writerow([value.isoformat(sep=' ') if isinstance(value, datetime) else value
+                               for value in row])
+
+
+def _xlsx_value(value):
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub('', value)
+    return value
+
+
+def write_xlsx(template, inspections):
+    """
+    Write the export to a temporary file with openpyxl's write-only mode, which
+    streams rows to disk instead of keeping the sheet in memory. The file is
+    returned rewound; it is deleted when closed.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Inspections')
+    for row in export_rows(template, inspections):
+        sheet.append([_xlsx_value(value) for value in row])
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
@@ -0,0 +1,170 @@
+import json
+
+from django.db.models import prefetch_related_objects
+
+from .aql import evaluate, garment_section
+from .logo_renditions import logo_url
+from .models import Inspection, InspectionResponse, Response as ResponseModel
+from .querysets import template_tree_prefetch
+
+
+# Text answers are JSON-decoded when they hold JSON (multi-select lists,
+# numbers, booleans); only strings that can start a JSON value are tried.
+_JSON_START = frozenset('[{"-0123456789tfn')
+
+_LOGIC_MAPS = {
+    ResponseModel.KIND_CONDITIONAL_ANSWER: 'conditional_answers',
+    ResponseModel.KIND_EVIDENCE: 'conditional_evidence',
+    ResponseModel.KIND_DISPLAY_MESSAGE: 'display_messages',
+}
+
+
+def report_inspection_queryset():
+    return Inspection.objects.select_related('template')
+
+
+def _decode_text(value):
+    if value and value[0] in _JSON_START:
+        try:
+            return json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            pass  # Keep as string if not valid JSON
+    return value
+
+
+def answer_value(response):
+    """The stored value of an answer, from whichever column holds it"""
+    if response.text_response is not None:
+        return _decode_text(response.text_response)
+    if response.number_response is not None:
+        return response.number_response
+    if response.boolean_response is not None:
+        return response.boolean_response
+    if response.date_response is not None:
+        return response.date_response.isoformat()
+    if response.choice_response is not None:
+        return response.choice_response.text
+    return None
+
+
+def collect_answers(inspection):
+    """
+    Answers keyed by question id plus the logic-rule maps, built in one pass
+    over the inspection's responses (a single query).
+    """
+    maps = {
+        'answers': {},
+        'conditional_answers': {},
+        'conditional_evidence': {},
+        'display_messages': {},
+    }
+    links = InspectionResponse.objects.filter(inspection=inspection).select_related(
+        'response__question', 'response__choice_response'
+    ).order_by('id')
+    for link in links:
+        response = link.response
+        logic_map = _LOGIC_MAPS.get(response.kind)
+        if logic_map is not None:
+            # Logic-rule entries are keyed by the id the client sent
+            maps[logic_map][response.entry_key] = response.text_response
+        else:
+            maps['answers'][str(response.question_id)] = answer_value(response)
+    return maps
+
+
+def _logic_rules(question):
+    try:
+        return json.loads(question.logic_rules) if isinstance(question.logic_rules, str) else question.logic_rules
+    except (json.JSONDecodeError, TypeError):
+        return []
+
+
+def _section_data(section, answers):
+    section_data = {
+        'id': section.id,
+        'title': section.title,
+        'description': section.description,
+        'type': 'garmentDetails' if section.is_garment_section else 'standard',
+        'questions': []
+    }
+
+    # Add garment content if it's a garment section
+    if section.is_garment_section:
+        section_data['content'] = {
+            'aqlSettings': {
+                'aqlLevel': section.aql_level or '2.5',
+                'inspectionLevel': section.inspection_level or 'II',
+                'samplingPlan': section.sampling_plan or 'Single',
+                'severity': section.severity or 'Normal'
+            },
+            'sizes': section.sizes or [],
+            'colors': section.colors or [],
+            'includeCartonOffered': section.include_carton_offered,
+            'includeCartonInspected': section.include_carton_inspected,
+            'defaultDefects': section.default_defects or []
+        }
+
+    for question in section.questions.all():
+        question_data = {
+            'id': question.id,
+            'text': question.text,
+            'responseType': question.response_type,
+            'required': question.required,
+            'options': [option.text for option in question.options.all()],
+            'value': answers.get(str(question.id)),
+            'flagged': question.flagged
+        }
+        # Add logic rules if they exist
+        if question.logic_rules:
+            question_data['logicRules'] = _logic_rules(question)
+        section_data['questions'].append(question_data)
+
+    return section_data
+
+
+def aql_verdict(garment_data, section=None):
+    """The AQL verdict for the garment data (see aql.evaluate), or None for non-garment inspections"""
+    if not garment_data:
+        return None
+    return evaluate(garment_data, section)
+
+
+def build_inspection_report(inspection, request=None):
+    """
+    Everything the report page needs for one inspection. The cost is fixed
+    regardless of size: the template tree is prefetched one level per query
+    and the responses come in one joined query.
+    """
+    template = inspection.template
+    prefetch_related_objects([template], template_tree_prefetch())
+    maps = collect_answers(inspection)
+    sections = template.sections.all()
+
+    template_data = {
+        'id': template.id,
+        'title': template.title,
+        'description': template.description,
+        'logo': logo_url(template, 'report', request),
+        'sections': [_section_data(section, maps['answers']) for section in sections]
+    }
+
+    return {
+        'inspection': {
+            'id': inspection.id,
+            'title': inspection.title,
+            'conducted_by': inspection.conducted_by,
+            'conducted_at': inspection.conducted_at.isoformat(),
+            'location': inspection.location,
+            'site': inspection.site,
+            'status': inspection.status,
+            'created_at': inspection.created_at.isoformat(),
+            'updated_at': inspection.updated_at.isoformat()
+        },
+        'template': template_data,
+        'answers': maps['answers'],
+        'conditional_answers': maps['conditional_answers'],
+        'conditional_evidence': maps['conditional_evidence'],
+        'display_messages': maps['display_messages'],
+        'garment_data': inspection.garment_data or {},
+        'aql_verdict': aql_verdict(inspection.garment_data, garment_section(sections))
+    }
@@ -0,0 +1,182 @@
+from collections import Counter, defaultdict
+
+from django.db import connection
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.fields.json import KeyTextTransform, KeyTransform
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .aql import STATUS_FAIL, STATUS_PASS
+from .garment_facts import defect_lines
+from .models import DefectTypeRollup, GarmentDefectLine, Inspection, InspectionRollup
+
+
+# Completed inspections are counted into InspectionRollup / DefectTypeRollup
+# as they complete, so analytics read a few rows per day instead of scanning
+# inspections. Counters only ever move by deltas (INSERT ... ON CONFLICT DO
+# UPDATE SET n = n + EXCLUDED.n), so concurrent submissions can't lose counts.
+# rebuild_rollups recomputes everything from the inspections when needed.
+
+KEY_FIELDS = ('day', 'template_id', 'inspector', 'site')
+INSPECTION_COUNTERS = ('inspections', 'passed', 'failed', 'critical', 'major', 'minor')
+DEFECT_COUNTERS = ('occurrences', 'critical', 'major', 'minor')
+SEVERITIES = ('critical', 'major', 'minor')
+
+# Rows per INSERT statement
+UPSERT_BATCH_SIZE = 1000
+
+
+def rollup_key(inspection):
+    """(day, template id, inspector, site) an inspection is counted under"""
+    return (
+        timezone.localdate(inspection.conducted_at),
+        inspection.template_id,
+        inspection.conducted_by or '',
+        inspection.site or '',
+    )
+
+
+def verdict(garment_data):
+    """The AQL status stored with the garment data, or None"""
+    settings = garment_data.get('aqlSettings') if isinstance(garment_data, dict) else None
+    return settings.get('status') if isinstance(settings, dict) else None
+
+
+def _count_verdict(counters, status, sign):
+    if status == STATUS_PASS:
+        counters['passed'] += sign
+    elif status == STATUS_FAIL:
+        counters['failed'] += sign
+
+
+def _upsert(model, key_fields, counter_fields, rows):
+    """Add each row's counters to the rollup row with its key, creating it if needed"""
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = [quote(name) for name in key_fields + counter_fields]
+    updates = ', '.join(f'{quote(name)} = {table}.{quote(name)} + EXCLUDED.{quote(name)}' for name in counter_fields)
+    # Keys in a fixed order, so concurrent batches lock rows in the same order
+    values = [key + tuple(counters[name] for name in counter_fields) for key, counters in sorted(rows.items())]
+    row_sql = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    with connection.cursor() as cursor:
+        for start in range(0, len(values), UPSERT_BATCH_SIZE):
+            batch = values[start:start + UPSERT_BATCH_SIZE]
+            cursor.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) VALUES {', '.join([row_sql] * len(batch))} "
+                f"ON CONFLICT ({', '.join(columns[:len(key_fields)])}) DO UPDATE SET {updates}",
+                [value for row in batch for value in row],
+            )
+
+
+def record_inspections(inspections, sign=1):
+    """
+    Count completed inspections into the rollups (sign=-1 takes them back
+    out): one upsert per table for the whole batch.
+    """
+    totals = defaultdict(Counter)
+    defects = defaultdict(Counter)
+    for inspection in inspections:
+        if inspection.status != 'completed':
+            continue
+        key = rollup_key(inspection)
+        counters = totals[key]
+        counters['inspections'] += sign
+        _count_verdict(counters, verdict(inspection.garment_data), sign)
+        for line in defect_lines(inspection) if isinstance(inspection.garment_data, dict) else ():
+            by_type = defects[key + (line.defect_type,)]
+            by_type['occurrences'] += sign
+            for severity in SEVERITIES:
+                counters[severity] += sign * getattr(line, severity)
+                by_type[severity] += sign * getattr(line, severity)
+    _upsert(InspectionRollup, KEY_FIELDS, INSPECTION_COUNTERS, totals)
+    _upsert(DefectTypeRollup, KEY_FIELDS + ('defect_type',), DEFECT_COUNTERS, defects)
+
+
+def record_verdict_changes(changes):
+    """Move re-judged inspections between passed and failed; `changes` is (inspection, old status) pairs"""
+    totals = defaultdict(Counter)
+    for inspection, old_status in changes:
+        if inspection.status != 'completed':
+            continue
+        counters = totals[rollup_key(inspection)]
+        _count_verdict(counters, old_status, -1)
+        _count_verdict(counters, verdict(inspection.garment_data), 1)
+    _upsert(InspectionRollup, KEY_FIELDS, INSPECTION_COUNTERS, totals)
+
+
+def rebuild_rollups(template_ids=None):
+    """
+    Recompute the rollups (of the given templates, or all) from completed
+    inspections and their garment defect lines; run inside a transaction.
+    Defect counts come from the fact tables, so backfill those first if they
+    may be stale. Returns the number of (inspection, defect type) rollup rows.
+    """
+    if connection.vendor == 'postgresql':
+        # Submissions wait for the rebuild instead of counting into rows it replaces
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'LOCK TABLE {InspectionRollup._meta.db_table}, {DefectTypeRollup._meta.db_table} IN EXCLUSIVE MODE'
+            )
+
+    inspections = Inspection.objects.filter(status='completed')
+    inspection_rollups = InspectionRollup.objects.all()
+    defect_rollups = DefectTypeRollup.objects.all()
+    if template_ids:
+        inspections = inspections.filter(template_id__in=template_ids)
+        inspection_rollups = inspection_rollups.filter(template_id__in=template_ids)
+        defect_rollups = defect_rollups.filter(template_id__in=template_ids)
+    inspection_rollups.delete()
+    defect_rollups.delete()
+
+    totals = (
+        inspections
+        .annotate(
+            day=TruncDate('conducted_at'),
+            inspector=Coalesce('conducted_by', Value('')),
+            site_key=Coalesce('site', Value('')),
+            verdict=KeyTextTransform('status', KeyTransform('aqlSettings', 'garment_data')),
+        )
+        .values('day', 'template_id', 'inspector', 'site_key')
+        .annotate(
+            inspection_count=Count('id'),
+            passed=Count('id', filter=Q(verdict=STATUS_PASS)),
+            failed=Count('id', filter=Q(verdict=STATUS_FAIL)),
+        )
+    )
+    by_type = (
+        GarmentDefectLine.objects.filter(inspection__in=inspections)
+        .annotate(
+            day=TruncDate('inspection__conducted_at'),
+            template_key=F('inspection__template_id'),
+            inspector=Coalesce('inspection__conducted_by', Value('')),
+            site_key=Coalesce('inspection__site', Value('')),
+        )
+        .values('day', 'template_key', 'inspector', 'site_key', 'defect_type')
+        .annotate(occurrences=Count('id'), critical_sum=Sum('critical'), major_sum=Sum('major'),
+                  minor_sum=Sum('minor'))
+    )
+
+    severities = defaultdict(Counter)
+    defect_rows = []
+    for row in by_type:
+        key = (row['day'], row['template_key'], row['inspector'], row['site_key'])
+        counts = {severity: row[f'{severity}_sum'] for severity in SEVERITIES}
+        severities[key].update(counts)
+        defect_rows.append(DefectTypeRollup(
+            day=row['day'], template_id=row['template_key'], inspector=row['inspector'], site=row['site_key'],
+            defect_type=row['defect_type'], occurrences=row['occurrences'], **counts,
+        ))
+    inspection_rows = []
+    for row in totals:
+        key = (row['day'], row['template_id'], row['inspector'], row['site_key'])
+        inspection_rows.append(InspectionRollup(
+            day=row['day'], template_id=row['template_id'], inspector=row['inspector'], site=row['site_key'],
+            inspections=row['inspection_count'], passed=row['passed'], failed=row['failed'],
+            **{severity: severities[key][severity] for severity in SEVERITIES},
+        ))
+
+    InspectionRollup.objects.bulk_create(inspection_rows, batch_size=UPSERT_BATCH_SIZE)
+    DefectTypeRollup.objects.bulk_create(defect_rows, batch_size=UPSERT_BATCH_SIZE)
+    return len(inspection_rows), len(defect_rows)
@@ -0,0 +1,105 @@
+import json
+
+from .models import Question, Response as ResponseModel, InspectionResponse
+
+
+TEXT_RESPONSE_TYPES = ['Text', 'Site', 'Inspection location', 'Person']
+BOOLEAN_RESPONSE_TYPES = ['Checkbox', 'Yes/No']
+DATE_RESPONSE_TYPES = ['Date & Time', 'Inspection date']
+CHOICE_RESPONSE_TYPES = ['Multiple choice', 'Slider']
+
+
+def _question_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _conditional_question_id(conditional_id):
+    # Format: {question_id}_{rule_id}_conditional
+    parts = str(conditional_id).split('_')
+    if len(parts) >= 3 and parts[-1] == 'conditional':
+        return _question_id(parts[0])
+    return None
+
+
+def _evidence_question_id(evidence_id):
+    # Format: {question_id}_{rule_id}
+    parts = str(evidence_id).split('_')
+    if len(parts) >= 2:
+        return _question_id(parts[0])
+    return None
+
+
+def _logic_text(value):
+    """Logic entries are stored as text; non-strings as JSON so they read back intact"""
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+def set_answer_value(response, question, answer_value):
+    """Put an answer into the column that matches the question's response type"""
+    if question.response_type in TEXT_RESPONSE_TYPES:
+        response.text_response = str(answer_value) if answer_value is not None else None
+    elif question.response_type == 'Number':
+        try:
+            response.number_response = float(answer_value) if answer_value is not None else None
+        except (ValueError, TypeError):
+            response.text_response = str(answer_value) if answer_value is not None else None
+    elif question.response_type in BOOLEAN_RESPONSE_TYPES:
+        response.boolean_response = bool(answer_value) if answer_value is not None else None
+    elif question.response_type in DATE_RESPONSE_TYPES:
+        response.date_response = answer_value
+    elif question.response_type in CHOICE_RESPONSE_TYPES:
+        # For multiple choice, store as text for now
+        # In a more complete implementation, you would link to QuestionOption
+        response.text_response = str(answer_value) if answer_value is not None else None
+
+
+def build_responses(answers, conditional_answers=None, conditional_evidence=None, display_messages=None):
+    """
+    Turn a submission into unsaved Response objects. Every referenced question
+    is loaded in one query; entries pointing at unknown questions are skipped.
+    """
+    conditional_answers = conditional_answers or {}
+    conditional_evidence = conditional_evidence or {}
+    display_messages = display_messages or {}
+
+    entries = []
+    for question_id, value in answers.items():
+        entries.append((ResponseModel.KIND_ANSWER, _question_id(question_id), None, value))
+    for conditional_id, value in conditional_answers.items():
+        entries.append((ResponseModel.KIND_CONDITIONAL_ANSWER, _conditional_question_id(conditional_id),
+                        conditional_id, value))
+    for evidence_id, value in conditional_evidence.items():
+        entries.append((ResponseModel.KIND_EVIDENCE, _evidence_question_id(evidence_id), evidence_id, value))
+    for question_id, message_text in display_messages.items():
+        entries.append((ResponseModel.KIND_DISPLAY_MESSAGE, _question_id(question_id), str(question_id),
+                        message_text))
+
+    question_ids = {question_id for _, question_id, _, _ in entries if question_id is not None}
+    questions = Question.objects.only('id', 'response_type').in_bulk(question_ids)
+
+    responses = []
+    for kind, question_id, entry_key, value in entries:
+        question = questions.get(question_id)
+        if question is None:
+            continue  # Skip if question doesn't exist
+        response = ResponseModel(question=question, kind=kind, entry_key=entry_key)
+        if kind == ResponseModel.KIND_ANSWER:
+            set_answer_value(response, question, value)
+        else:
+            response.text_response = _logic_text(value)
+        responses.append(response)
+    return responses
+
+
+def save_responses(inspection, responses):
+    """Write the responses and their inspection links with two bulk inserts"""
+    ResponseModel.objects.bulk_create(responses)
+    InspectionResponse.objects.bulk_create(
+        [InspectionResponse(inspection=inspection, response=response) for response in responses]
+    )
+    return responses
@@ -3,16 +3,59 @@ from rest_framework.response import Response as DRFResponse
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.db import IntegrityError, transaction
 from django.utils import timezone
-import json
+from django.utils.text import slugify
 
 from .models import (
-    Template, Inspection, Response as ResponseModel, InspectionResponse,
-    Question, TemplateAssignment, CustomUser
+    Template, Section, Inspection, InspectionReportSnapshot, TemplateAssignment, CustomUser
 )
 from .permissions import IsInspector
 from .serializers import InspectionSerializer
+from .aql import apply_verdict as apply_aql_verdict
+from .inspection_export import EXPORT_TYPES, XLSX_CONTENT_TYPE, export_queryset, stream_csv, write_xlsx
+from .inspection_report import build_inspection_report, report_inspection_queryset
+from .inspection_rollups import record_inspections
+from .inspection_submission import build_responses, save_responses
+from .logic_graph import evaluate_downstream
+from .logic_rules import evaluate_template_rules
+from .permission_resolver import get_permission_resolver
+from .permissions import has_template_permission
+from .pdf_reports import inspection_pdf, pdf_filename, stream_pdf_zip
+from .report_snapshots import (
+    etag_matches, freeze_report, not_modified_response, snapshot_response, write_report_snapshot
+)
+
+
+SUBMISSION_KEY_MAX_LENGTH = Inspection._meta.get_field('submission_key').max_length
+
+
+def _can_view_results(request, template):
+    """Admins, the template's owner and users with viewer access may see its inspections"""
+    if request.user.user_role == 'admin' or template.user_id == request.user.id:
+        return True
+    return has_template_permission(request.user, template.id, required_level='viewer', request=request)
+
+
+def _replayed_submission(submission_key, template_id):
+    """The response for a submission key that already created an inspection, else None"""
+    existing = Inspection.objects.filter(submission_key=submission_key).values('id', 'template_id').first()
+    if existing is None:
+        return None
+    if str(existing['template_id']) != str(template_id):
+        return DRFResponse(
+            {"detail": "This submission key was already used for a different template."},
+            status=status.HTTP_409_CONFLICT
+        )
+    print(f"🔁 Replayed submission {submission_key} -> inspection {existing['id']}")
+    return DRFResponse({
+        "detail": "Inspection already submitted",
+        "inspection_id": existing['id'],
+        "replayed": True
+    }, status=status.HTTP_200_OK)
 
 
 @api_view(['POST'])
@@ -22,9 +65,20 @@ def submit_inspection(request):
     API endpoint to submit inspection data.
     This creates a new Inspection record and associated Response records.
     If the inspection is part of a template assignment, it also updates the assignment status.
+
+    Clients send a key generated once per filled-out form (Idempotency-Key
+    header or `submission_key`); retrying with the same key returns the
+    inspection created by the first attempt without writing anything.
+
+    The template's logic rules are evaluated on the answers: a submission
+    missing evidence a rule requires is rejected with `missing_evidence`, and
+    the stored display messages are the ones the rules produce.
     """
     # Get data from request
     template_id = request.data.get('template_id')
+    submission_key = request.headers.get('Idempotency-Key') or request.data.get('submission_key')
+    if submission_key is not None:
+        submission_key = str(submission_key).strip() or None
     answers = request.data.get('answers', {})
     conditional_answers = request.data.get('conditional_answers', {})
     conditional_evidence = request.data.get('conditional_evidence', {})
@@ -40,6 +94,16 @@ def submit_inspection(request):
             status=status.HTTP_400_BAD_REQUEST
         )
 
+    if submission_key:
+        if len(submission_key) > SUBMISSION_KEY_MAX_LENGTH:
+            return DRFResponse(
+                {"detail": f"Submission key must be at most {SUBMISSION_KEY_MAX_LENGTH} characters."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        replayed = _replayed_submission(submission_key, template_id)
+        if replayed is not None:
+            return replayed
+
     # Get template
     try:
         template = Template.objects.get(id=template_id)
@@ -60,146 +124,67 @@ def submit_inspection(request):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-    # Create inspection record
-    inspection = Inspection.objects.create(
-        template=template,
-        title=f"{template.title} - {timezone.now().strftime('%Y-%m-%d %H:%M')}",
-        conducted_by=inspector.email if inspector else request.user.email,
-        status='completed'
-    )
+    # Logic rules are evaluated here: evidence they require must be attached, and
+    # display messages are derived from the answers instead of taken from the client
+    rule_results = evaluate_template_rules(template.id, answers)
+    missing_evidence = rule_results.missing_evidence(conditional_evidence)
+    if missing_evidence:
+        return DRFResponse({
+            "detail": "Evidence is required for some answers.",
+            "missing_evidence": missing_evidence
+        }, status=status.HTTP_400_BAD_REQUEST)
+    if display_messages and display_messages != rule_results.display_messages:
+        print(f"⚠️ Display messages from client replaced with {len(rule_results.display_messages)} derived ones")
+    display_messages = rule_results.display_messages
+
+    # Build every response in memory first: one query loads all referenced questions
+    responses = build_responses(answers, conditional_answers, conditional_evidence, display_messages)
+    if garment_data:
+        print(f"Received garment data: {garment_data}")
+    if garment_data and isinstance(garment_data, dict):
+        # The AQL verdict is computed here; the client's status is only advisory
+        client_status = (garment_data.get('aqlSettings') or {}).get('status')
+        section = Section.objects.filter(template=template, is_garment_section=True).order_by('order', 'id').first()
+        garment_data, verdict = apply_aql_verdict(garment_data, section)
+        if client_status and client_status != verdict['status']:
+            print(f"⚠️ AQL status from client ({client_status}) overridden with {verdict['status']}")
 
-    # Process answers and create response records
-    for question_id, answer_value in answers.items():
-        try:
-            question = Question.objects.get(id=question_id)
-        except Question.DoesNotExist:
-            continue  # Skip if question doesn't exist
-
-        # Create response based on question type
-        response = ResponseModel(question=question)
-
-        # Set the appropriate field based on response type
-        if question.response_type in ['Text', 'Site', 'Inspection location', 'Person']:
-            response.text_response = str(answer_value) if answer_value is not None else None
-        elif question.response_type == 'Number':
-            try:
-                response.number_response = float(answer_value) if answer_value is not None else None
-            except (ValueError, TypeError):
-                response.text_response = str(answer_value) if answer_value is not None else None
-        elif question.response_type in ['Checkbox', 'Yes/No']:
-            response.boolean_response = bool(answer_value) if answer_value is not None else None
-        elif question.response_type in ['Date & Time', 'Inspection date']:
-            # Handle date format conversion if needed
-            response.date_response = answer_value
-        elif question.response_type in ['Multiple choice', 'Slider']:
-            # For multiple choice, store as text for now
-            # In a more complete implementation, you would link to QuestionOption
-            response.text_response = str(answer_value) if answer_value is not None else None
-
-        # Save the response
-        response.save()
-
-        # Link response to inspection
-        InspectionResponse.objects.create(
-            inspection=inspection,
-            response=response
-        )
+    try:
+        with transaction.atomic():
+            # Create inspection record (garment data is stored directly on it)
+            inspection = Inspection.objects.create(
+                template=template,
+                title=f"{template.title} - {timezone.now().strftime('%Y-%m-%d %H:%M')}",
+                conducted_by=inspector.email if inspector else request.user.email,
+                status='completed',
+                garment_data=garment_data or None,
+                submission_key=submission_key,
+            )
 
-    # Process conditional answers
-    for conditional_id, answer_value in conditional_answers.items():
-        # Create a pseudo-question for conditional answers
-        # We'll store them as text responses with the conditional ID as the question text
-        try:
-            # Try to find the original question from the conditional ID
-            # Format is usually: {question_id}_{rule_id}_conditional
-            parts = conditional_id.split('_')
-            if len(parts) >= 3 and parts[-1] == 'conditional':
-                original_question_id = parts[0]
-                rule_id = parts[1]
+            # Answers, conditional answers, evidence and display messages in two bulk inserts
+            save_responses(inspection, responses)
 
-                try:
-                    original_question = Question.objects.get(id=original_question_id)
-                    # Create a response for the conditional answer
-                    response = ResponseModel(question=original_question)
-                    response.text_response = f"CONDITIONAL_{conditional_id}:{answer_value}"
-                    response.save()
-
-                    # Link response to inspection
-                    InspectionResponse.objects.create(
-                        inspection=inspection,
-                        response=response
-                    )
-                except Question.DoesNotExist:
-                    continue
-        except:
-            continue
-
-    # Process conditional evidence
-    for evidence_id, evidence_value in conditional_evidence.items():
-        # Similar to conditional answers, but mark as evidence
-        try:
-            # Format is usually: {question_id}_{rule_id}
-            parts = evidence_id.split('_')
-            if len(parts) >= 2:
-                original_question_id = parts[0]
-                rule_id = parts[1]
+            # Freeze the report as submitted; later template edits won't change it
+            freeze_report(inspection)
 
-                try:
-                    original_question = Question.objects.get(id=original_question_id)
-                    # Create a response for the evidence
-                    response = ResponseModel(question=original_question)
-                    response.text_response = f"EVIDENCE_{evidence_id}:{evidence_value}"
-                    response.save()
-
-                    # Link response to inspection
-                    InspectionResponse.objects.create(
-                        inspection=inspection,
-                        response=response
-                    )
-                except Question.DoesNotExist:
-                    continue
-        except:
-            continue
-
-    # Process display messages
-    for question_id, message_text in display_messages.items():
-        try:
-            question = Question.objects.get(id=question_id)
-            # Create a response for the display message
-            response = ResponseModel(question=question)
-            response.text_response = f"DISPLAY_MESSAGE_{question_id}:{message_text}"
-            response.save()
-
-            # Link response to inspection
-            InspectionResponse.objects.create(
-                inspection=inspection,
-                response=response
-            )
-        except Question.DoesNotExist:
-            continue
-        except:
-            continue
+            # Count it into the daily analytics rollups
+            record_inspections([inspection])
 
-    # Process garment data if provided
-    if garment_data:
-        try:
-            print(f"Received garment data: {garment_data}")
-            # Store garment data directly in the inspection model
-            inspection.garment_data = garment_data
-            inspection.save()
-            print(f"Successfully stored garment data for inspection {inspection.id}")
-        except Exception as e:
-            print(f"Error storing garment data: {e}")
-
-    # If this is part of an assignment, update the assignment status
-    if assignment_id:
-        try:
-            assignment = TemplateAssignment.objects.get(id=assignment_id)
-            # Only complete if the current user is the assigned inspector
-            if request.user == assignment.inspector:
-                assignment.complete()
-        except TemplateAssignment.DoesNotExist:
-            pass  # Continue even if assignment doesn't exist
+            # If this is part of an assignment, update the assignment status
+            if assignment_id:
+                try:
+                    assignment = TemplateAssignment.objects.get(id=assignment_id)
+                    # Only complete if the current user is the assigned inspector
+                    if request.user == assignment.inspector:
+                        assignment.complete()
+                except TemplateAssignment.DoesNotExist:
+                    pass  # Continue even if assignment doesn't exist
+    except IntegrityError:
+        # A concurrent retry with the same key committed first
+        replayed = _replayed_submission(submission_key, template_id) if submission_key else None
+        if replayed is None:
+            raise
+        return replayed
 
     # Return success response
     return DRFResponse({
@@ -208,185 +193,79 @@ def submit_inspection(request):
     }, status=status.HTTP_201_CREATED)
 
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def validate_logic_rules(request, template_id):
+    """
+    Live validation while an inspection is filled in. Given the answer that
+    changed (`changed`: a question id or a follow-up question's key) and the
+    current answers, re-evaluate only the logic rules downstream of it and
+    return what they trigger, keyed like submit_inspection expects.
+    """
+    changed = request.data.get('changed')
+    if changed in (None, ''):
+        return DRFResponse(
+            {"detail": "The changed question is required."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if not has_template_permission(request.user, template_id, required_level='viewer', request=request):
+        if not get_permission_resolver(request).resolve(template_id).exists:
+            return DRFResponse({"detail": "Template not found."}, status=status.HTTP_404_NOT_FOUND)
+        return DRFResponse(
+            {"detail": "You do not have permission to perform this action."},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    # Follow-up answers are keyed {question}_{rule}_conditional, so both fit in one mapping
+    answers = {}
+    for key in ('answers', 'conditional_answers'):
+        values = request.data.get(key)
+        if isinstance(values, dict):
+            answers.update(values)
+
+    conditional_evidence = request.data.get('conditional_evidence')
+    if not isinstance(conditional_evidence, dict):
+        conditional_evidence = {}
+
+    affected, results = evaluate_downstream(template_id, changed, answers)
+    return DRFResponse({
+        "changed": str(changed),
+        "affected": affected,
+        "display_messages": results.display_messages,
+        "required_evidence": results.required_evidence,
+        "missing_evidence": results.missing_evidence(conditional_evidence),
+        "conditional_questions": results.conditional_questions,
+        "notifications": results.notifications,
+    })
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_inspection(request, inspection_id):
     """
     API endpoint to retrieve inspection data for report generation.
     Returns the inspection with all associated responses and template data.
+    Completed inspections are answered from an immutable snapshot with an
+    ETag, so unchanged reports cost a 304.
     """
-    try:
-        print(f"Getting inspection with ID: {inspection_id}")
-
-        # Get the inspection
-        inspection = get_object_or_404(Inspection, id=inspection_id)
-        print(f"Found inspection: {inspection.title}")
-
-        # Get the template
-        template = inspection.template
+    print(f"Getting inspection with ID: {inspection_id}")
 
-        # Get all responses for this inspection
-        responses = InspectionResponse.objects.filter(inspection=inspection)
-
-        # Organize responses by question ID
-        answers = {}
-        conditional_answers = {}
-        conditional_evidence = {}
-        display_messages = {}  # Add display messages
-
-        # Get garment data directly from inspection
-        garment_data = inspection.garment_data or {}
-
-        for response in responses:
-            question_id = str(response.response.question.id)
-
-            # Get the appropriate response value based on the question type
-            value = None
-            if response.response.text_response is not None:
-                value = response.response.text_response
-            elif response.response.number_response is not None:
-                value = response.response.number_response
-            elif response.response.boolean_response is not None:
-                value = response.response.boolean_response
-            elif response.response.date_response is not None:
-                value = response.response.date_response.isoformat()
-            elif response.response.choice_response is not None:
-                value = response.response.choice_response.text
-
-            # Parse JSON if it's a string that looks like JSON
-            if isinstance(value, str):
-                try:
-                    parsed_value = json.loads(value)
-                    value = parsed_value
-                except (json.JSONDecodeError, TypeError):
-                    pass  # Keep as string if not valid JSON
-
-            # Categorize the response
-            if isinstance(value, str) and value.startswith('CONDITIONAL_'):
-                # Parse conditional answer: CONDITIONAL_{conditional_id}:{answer_value}
-                try:
-                    parts = value.split(':', 1)
-                    if len(parts) == 2:
-                        conditional_id = parts[0].replace('CONDITIONAL_', '')
-                        conditional_value = parts[1]
-                        conditional_answers[conditional_id] = conditional_value
-                except:
-                    pass
-            elif isinstance(value, str) and value.startswith('EVIDENCE_'):
-                # Parse evidence: EVIDENCE_{evidence_id}:{evidence_value}
-                try:
-                    parts = value.split(':', 1)
-                    if len(parts) == 2:
-                        evidence_id = parts[0].replace('EVIDENCE_', '')
-                        evidence_value = parts[1]
-                        conditional_evidence[evidence_id] = evidence_value
-                except:
-                    pass
-            elif isinstance(value, str) and value.startswith('DISPLAY_MESSAGE_'):
-                # Parse display message: DISPLAY_MESSAGE_{question_id}:{message_text}
-                try:
-                    parts = value.split(':', 1)
-                    if len(parts) == 2:
-                        message_question_id = parts[0].replace('DISPLAY_MESSAGE_', '')
-                        message_text = parts[1]
-                        display_messages[message_question_id] = message_text
-                except:
-                    pass
-            else:
-                answers[question_id] = value
-
-        # Try to get conditional answers and evidence from the inspection's metadata
-        # This is a workaround since conditional answers might be stored differently
-        try:
-            # Check if there's a way to get the original submission data
-            # For now, we'll look for any stored conditional data in the inspection
-            pass
-        except:
-            pass
-
-        # Serialize template data
-        template_data = {
-            'id': template.id,
-            'title': template.title,
-            'description': template.description,
-            'logo': template.logo.url if template.logo else None,
-            'sections': []
-        }
+    # Completed inspections are served from their frozen snapshot
+    snapshot = InspectionReportSnapshot.objects.defer('data').filter(inspection_id=inspection_id).first()
+    if snapshot is not None:
+        if etag_matches(request, snapshot.etag):
+            return not_modified_response(snapshot.etag)
+        return snapshot_response(request, snapshot)
 
-        # Add sections and questions
-        for section in template.sections.all():
-            section_data = {
-                'id': section.id,
-                'title': section.title,
-                'description': section.description,
-                'type': 'garmentDetails' if section.is_garment_section else 'standard',
-                'questions': []
-            }
+    inspection = get_object_or_404(report_inspection_queryset(), id=inspection_id)
 
-            # Add garment content if it's a garment section
-            if section.is_garment_section:
-                section_data['content'] = {
-                    'aqlSettings': {
-                        'aqlLevel': section.aql_level or '2.5',
-                        'inspectionLevel': section.inspection_level or 'II',
-                        'samplingPlan': section.sampling_plan or 'Single',
-                        'severity': section.severity or 'Normal'
-                    },
-                    'sizes': section.sizes or [],
-                    'colors': section.colors or [],
-                    'includeCartonOffered': section.include_carton_offered,
-                    'includeCartonInspected': section.include_carton_inspected,
-                    'defaultDefects': section.default_defects or []
-                }
-
-            # Add questions
-            for question in section.questions.all():
-                # Get question options
-                options = [option.text for option in question.options.all()]
-
-                question_data = {
-                    'id': question.id,
-                    'text': question.text,
-                    'responseType': question.response_type,
-                    'required': question.required,
-                    'options': options,
-                    'value': answers.get(str(question.id)),
-                    'flagged': question.flagged
-                }
-
-                # Add logic rules if they exist
-                if question.logic_rules:
-                    try:
-                        question_data['logicRules'] = json.loads(question.logic_rules) if isinstance(question.logic_rules, str) else question.logic_rules
-                    except (json.JSONDecodeError, TypeError):
-                        question_data['logicRules'] = []
-
-                section_data['questions'].append(question_data)
-
-            template_data['sections'].append(section_data)
-
-        # Prepare the response data
-        print(f"Final garment_data being returned: {garment_data}")
-        response_data = {
-            'inspection': {
-                'id': inspection.id,
-                'title': inspection.title,
-                'conducted_by': inspection.conducted_by,
-                'conducted_at': inspection.conducted_at.isoformat(),
-                'location': inspection.location,
-                'site': inspection.site,
-                'status': inspection.status,
-                'created_at': inspection.created_at.isoformat(),
-                'updated_at': inspection.updated_at.isoformat()
-            },
-            'template': template_data,
-            'answers': answers,
-            'conditional_answers': conditional_answers,
-            'conditional_evidence': conditional_evidence,
-            'display_messages': display_messages,  # Add display messages to response
-            'garment_data': garment_data
-        }
+    try:
+        if inspection.status == 'completed':
+            # Completed before snapshots existed: freeze it now
+            return snapshot_response(request, write_report_snapshot(inspection))
 
+        response_data = build_inspection_report(inspection, request)
         return DRFResponse(response_data, status=status.HTTP_200_OK)
 
     except Exception as e:
@@ -395,6 +274,71 @@ def get_inspection(request, inspection_id):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_inspection_pdf(request, inspection_id):
+    """
+    API endpoint returning the inspection report as a server-rendered PDF.
+    Renders run on the PDF worker pool and are cached per inspection updated_at.
+    """
+    inspection = get_object_or_404(report_inspection_queryset(), id=inspection_id)
+    if not _can_view_results(request, inspection.template):
+        return DRFResponse({
+            "detail": "You do not have permission to view results for this template."
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    response = HttpResponse(inspection_pdf(inspection), content_type='application/pdf')
+    response['Content-Disposition'] = f'inline; filename="{pdf_filename(inspection)}"'
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def bulk_inspection_pdfs(request):
+    """
+    API endpoint streaming a ZIP of many inspection PDFs.
+    Body: {"inspection_ids": [1, 2, ...]}. Each report is added to the
+    archive as soon as it is rendered, so the download starts right away.
+    The whole request is refused if any inspection belongs to a template the
+    caller can't view results of.
+    """
+    inspection_ids = request.data.get('inspection_ids')
+    try:
+        inspection_ids = [int(inspection_id) for inspection_id in inspection_ids]
+    except (TypeError, ValueError):
+        return DRFResponse(
+            {"detail": "inspection_ids must be a list of inspection IDs."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    limit = getattr(settings, 'REPORT_PDF_BULK_LIMIT', 500)
+    if not inspection_ids or len(inspection_ids) > limit:
+        return DRFResponse(
+            {"detail": f"Request between 1 and {limit} inspections."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    inspections = list(report_inspection_queryset().filter(id__in=inspection_ids).order_by('id'))
+    if not inspections:
+        return DRFResponse({"detail": "No inspections found."}, status=status.HTTP_404_NOT_FOUND)
+
+    # Checked once per template, not per inspection
+    templates = {inspection.template_id: inspection.template for inspection in inspections}
+    allowed = {template_id for template_id, template in templates.items() if _can_view_results(request, template)}
+    forbidden = [inspection.id for inspection in inspections if inspection.template_id not in allowed]
+    if forbidden:
+        return DRFResponse({
+            "detail": "You do not have permission to view some of these inspections.",
+            "inspection_ids": forbidden
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    response = StreamingHttpResponse(stream_pdf_zip(inspections), content_type='application/zip')
+    response['Content-Disposition'] = (
+        f'attachment; filename="inspection_reports_{timezone.now().strftime("%Y%m%d_%H%M")}.zip"'
+    )
+    return response
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_template_inspections(request, template_id):
@@ -411,7 +355,7 @@ def get_template_inspections(request, template_id):
 
         # Check if user has permission to view this template's results
         # Template creator or admin can view results
-        if request.user.user_role != 'admin' and template.created_by != request.user:
+        if request.user.user_role != 'admin' and template.user != request.user:
             return DRFResponse({
                 "detail": "You do not have permission to view results for this template."
             }, status=status.HTTP_403_FORBIDDEN)
@@ -441,7 +385,7 @@ def get_template_inspections(request, template_id):
                 'id': template.id,
                 'title': template.title,
                 'description': template.description,
-                'created_by': template.created_by.username if template.created_by else None,
+                'created_by': template.user.username if template.user else None,
                 'created_at': template.created_at.isoformat(),
             },
             'inspections': inspection_list,
@@ -456,6 +400,39 @@ def get_template_inspections(request, template_id):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def export_template_inspections(request, template_id):
+    """
+    Export a template's inspections, one row per inspection and one column per
+    question plus the garment defect totals.
+    Query params: type (csv (default) or xlsx), start, end (conducted_at range).
+    CSV is streamed as it is read; XLSX is built in a temporary file first.
+    """
+    template = get_object_or_404(Template, id=template_id)
+    if request.user.user_role != 'admin' and template.user != request.user:
+        return DRFResponse({
+            "detail": "You do not have permission to view results for this template."
+        }, status=status.HTTP_403_FORBIDDEN)
+
+    export_type = request.query_params.get('type', 'csv')
+    if export_type not in EXPORT_TYPES:
+        return DRFResponse({"detail": f"type must be one of: {', '.join(EXPORT_TYPES)}."},
+                           status=status.HTTP_400_BAD_REQUEST)
+
+    inspections = export_queryset(template, request.query_params)
+    filename = f'{slugify(template.title) or "template"}_inspections_{timezone.now().strftime("%Y%m%d_%H%M")}'
+    print(f"📤 Exporting inspections of template {template.id} as {export_type}")
+
+    if export_type == 'xlsx':
+        return FileResponse(write_xlsx(template, inspections), as_attachment=True,
+                            filename=f'{filename}.xlsx', content_type=XLSX_CONTENT_TYPE)
+
+    response = StreamingHttpResponse(stream_csv(template, inspections), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_assignment_inspection(request, assignment_id):
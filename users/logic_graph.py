@@ -0,0 +1,131 @@
+from .logic_rules import TRIGGER_ASK_QUESTIONS, compile_rules, evaluate, rule_versions, template_rules
+
+
+# Which answers a changed answer can affect, so the inspection page can
+# re-check only those while it is being filled in. Nodes are answer keys:
+# question ids, and {key}_{rule_id}_conditional for the follow-up questions
+# ask_questions rules reveal (their own rules nest in subQuestion). Edges run
+# from a question to its follow-ups and to the question a rule targets
+# (targetElementId). Graphs are cached per template until the versions of its
+# rule-bearing questions change; template saves reject target cycles.
+
+# Graphs kept per process; the oldest templates are dropped first
+GRAPH_CACHE_SIZE = 500
+
+# template id -> (question versions, RuleGraph)
+_graphs = {}
+
+
+def conditional_key(key, rule_id):
+    """Answer key of the follow-up question an ask_questions rule reveals"""
+    return f'{key}_{rule_id}_conditional'
+
+
+def _nested_rules(sub_question):
+    return compile_rules(
+        sub_question.get('logicRules') or sub_question.get('logic_rules'),
+        sub_question.get('responseType') or sub_question.get('response_type'),
+    )
+
+
+class RuleGraph:
+    """Answer keys with the rules evaluated on each and the keys they lead to"""
+
+    def __init__(self):
+        # answer key -> compiled rules
+        self.rules = {}
+        # answer key -> downstream answer keys
+        self.children = {}
+
+    def add(self, key, rules):
+        self.rules[key] = rules
+        children = self.children.setdefault(key, [])
+        for rule in rules:
+            if rule.trigger == TRIGGER_ASK_QUESTIONS and isinstance(rule.sub_question, dict):
+                child = conditional_key(key, rule.rule_id)
+                children.append(child)
+                self.add(child, _nested_rules(rule.sub_question))
+            if rule.target is not None:
+                children.append(rule.target)
+                self.rules.setdefault(rule.target, ())
+                self.children.setdefault(rule.target, [])
+
+    def downstream(self, key):
+        """`key` and every answer key reachable from it, parents before children"""
+        order, seen, stack = [], {key}, [key]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            for child in reversed(self.children.get(node, ())):
+                if child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+        return order
+
+    def find_cycle(self):
+        """[a, b, ..., a] for the first cycle found, or None"""
+        visiting, done = set(), set()
+        for root in self.children:
+            if root in done:
+                continue
+            path, stack = [root], [iter(self.children[root])]
+            visiting.add(root)
+            while stack:
+                child = next(stack[-1], None)
+                if child is None:
+                    node = path.pop()
+                    stack.pop()
+                    visiting.discard(node)
+                    done.add(node)
+                elif child in visiting:
+                    return path[path.index(child):] + [child]
+                elif child not in done:
+                    path.append(child)
+                    stack.append(iter(self.children.get(child, ())))
+                    visiting.add(child)
+        return None
+
+
+def build_graph(compiled_questions):
+    """RuleGraph over [(question id, compiled rules)]"""
+    graph = RuleGraph()
+    for question_id, rules in compiled_questions:
+        graph.add(str(question_id), rules)
+    return graph
+
+
+def template_graph(template_id):
+    """A template's RuleGraph, rebuilt only when its questions' rules change"""
+    rows = rule_versions(template_id)
+    versions = tuple((question_id, updated_at) for question_id, _, updated_at in rows)
+    cached = _graphs.get(template_id)
+    if cached is not None and cached[0] == versions:
+        return cached[1]
+
+    graph = build_graph(template_rules(template_id, rows))
+    _graphs.pop(template_id, None)
+    _graphs[template_id] = (versions, graph)
+    while len(_graphs) > GRAPH_CACHE_SIZE:
+        _graphs.pop(next(iter(_graphs)))
+    return graph
+
+
+def evaluate_downstream(template_id, changed, answers):
+    """(affected answer keys, RuleResults for just those) after the answer at `changed` changed"""
+    graph = template_graph(template_id)
+    affected = graph.downstream(str(changed))
+    return affected, evaluate([(key, graph.rules[key]) for key in affected if key in graph.rules], answers)
+
+
+def find_rule_cycle(questions):
+    """
+    The first cycle among a template payload's logic rules, or None.
+    `questions` are (payload id, logic rules, response type); questions
+    without ids can't be targeted and are left out.
+    """
+    graph = build_graph(
+        (question_id, compile_rules(logic_rules, response_type))
+        for question_id, logic_rules, response_type in questions
+        if question_id not in (None, '')
+    )
+    return graph.find_cycle()
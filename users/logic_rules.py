@@ -0,0 +1,253 @@
+import math
+import re
+from collections import namedtuple
+
+from .models import Question
+
+
+# Question.logic_rules, evaluated the way the inspection page does
+# (isConditionMet and the trigger handling in frontend/src/pages/Inspection.tsx),
+# so the server can check required evidence and derive display messages.
+# Each question's rules are compiled once into predicates and cached until the
+# question's updated_at changes.
+
+NUMERIC_RESPONSE_TYPES = ('Number', 'Slider')
+
+TRIGGER_DISPLAY_MESSAGE = 'display_message'
+TRIGGER_REQUIRE_EVIDENCE = 'require_evidence'
+TRIGGER_REQUIRE_ACTION = 'require_action'
+TRIGGER_NOTIFY = 'notify'
+TRIGGER_ASK_QUESTIONS = 'ask_questions'
+TRIGGER_TAKE_ACTION = 'take_action'
+
+# Compiled rules kept per process; the oldest questions are dropped first
+COMPILED_CACHE_SIZE = 5000
+
+CompiledRule = namedtuple('CompiledRule', 'rule_id trigger predicate message sub_question target')
+
+# question id -> (updated_at, compiled rules)
+_compiled = {}
+
+_FLOAT_PREFIX = re.compile(r'\s*([+-]?(?:Infinity|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?))')
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def js_string(value):
+    """String(value) as JavaScript would print it"""
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float):
+        if math.isnan(value):
+            return 'NaN'
+        if math.isinf(value):
+            return 'Infinity' if value > 0 else '-Infinity'
+        if value.is_integer() and abs(value) < 1e21:
+            return str(int(value))
+        return repr(value)
+    if isinstance(value, list):
+        return ','.join('' if item is None else js_string(item) for item in value)
+    if isinstance(value, dict):
+        return '[object Object]'
+    return str(value)
+
+
+def js_number(value):
+    """The page's number coercion: parseFloat for strings, numbers as they are, anything else 0"""
+    if _is_number(value):
+        return float(value)
+    if isinstance(value, str):
+        match = _FLOAT_PREFIX.match(value)
+        return float(match.group(1).replace('Infinity', 'inf')) if match else math.nan
+    return 0.0
+
+
+def _same(left, right):
+    # JavaScript ===: primitives of the same type compare by value, arrays and objects never match
+    if isinstance(left, (list, dict)) or isinstance(right, (list, dict)):
+        return False
+    if _is_number(left) and _is_number(right):
+        return left == right
+    return type(left) is type(right) and left == right
+
+
+def compile_condition(condition, rule_value, numeric):
+    """A predicate over an answer for one rule condition; unknown conditions never match"""
+    coerce = js_number if numeric else (lambda value: value)
+    target = coerce(rule_value)
+    target_text = js_string(target)
+
+    if condition == 'is':
+        return lambda value: js_string(coerce(value)) == target_text
+    if condition == 'is not':
+        return lambda value: js_string(coerce(value)) != target_text
+    if condition in ('contains', 'not contains'):
+        if not isinstance(target, str):
+            return lambda value: False
+        negate = condition == 'not contains'
+        return lambda value: isinstance(value, str) and ((target in value) != negate)
+    if condition == 'equal to':
+        if numeric:
+            return lambda value: coerce(value) == target  # NaN never equals
+        return lambda value: js_string(value) == target_text
+    if condition == 'not equal to':
+        return lambda value: not _same(coerce(value), target)
+
+    compare = {
+        'greater than': lambda left, right: left > right,
+        'less than': lambda left, right: left < right,
+        'greater than or equal to': lambda left, right: left >= right,
+        'less than or equal to': lambda left, right: left <= right,
+    }.get(condition)
+    if compare is None or not _is_number(target):
+        return lambda value: False
+
+    def predicate(value):
+        value = coerce(value)
+        return _is_number(value) and compare(value, target)
+    return predicate
+
+
+def _rule_message(rule, *extra_keys):
+    """The first non-blank message among the places the rule editor has stored it"""
+    candidates = [rule.get('message')]
+    for key in ('triggerConfig', 'trigger_config', 'config'):
+        config = rule.get(key)
+        candidates.append(config.get('message') if isinstance(config, dict) else None)
+    candidates.extend(rule.get(key) for key in extra_keys)
+    for candidate in candidates:
+        if isinstance(candidate, str) and candidate.strip():
+            return candidate.strip()
+    return None
+
+
+def _target(rule):
+    # The editor's targetElementId: another question the rule acts on
+    target = rule.get('targetElementId') or rule.get('target_element_id')
+    return str(target) if target not in (None, '') else None
+
+
+def compile_rules(logic_rules, response_type):
+    """Compile a question's logic rules; malformed rules are skipped"""
+    numeric = response_type in NUMERIC_RESPONSE_TYPES
+    compiled = []
+    for rule in logic_rules if isinstance(logic_rules, list) else ():
+        if not isinstance(rule, dict):
+            continue
+        trigger = rule.get('trigger')
+        compiled.append(CompiledRule(
+            rule_id=rule.get('id'),
+            trigger=trigger,
+            predicate=compile_condition(rule.get('condition'), rule.get('value'), numeric),
+            message=_rule_message(rule, 'Message') if trigger == TRIGGER_DISPLAY_MESSAGE else _rule_message(rule),
+            sub_question=rule.get('subQuestion') or rule.get('sub_question'),
+            target=_target(rule),
+        ))
+    return tuple(compiled)
+
+
+def rule_versions(template_id):
+    """(question id, response type, updated_at) of a template's questions that have logic rules"""
+    return list(
+        Question.objects.filter(section__template_id=template_id, logic_rules__isnull=False)
+        .order_by('section__order', 'section_id', 'order', 'id')
+        .values_list('id', 'response_type', 'updated_at')
+    )
+
+
+def template_rules(template_id, rows=None):
+    """
+    [(question id, compiled rules)] for a template's questions that have logic
+    rules. One query reads ids and updated_at (unless `rows` from
+    rule_versions are given); rules are only loaded for questions that changed
+    since they were compiled.
+    """
+    if rows is None:
+        rows = rule_versions(template_id)
+    stale = [question_id for question_id, _, updated_at in rows
+             if _compiled.get(question_id, (None,))[0] != updated_at]
+    if stale:
+        logic_rules = dict(Question.objects.filter(id__in=stale).values_list('id', 'logic_rules'))
+        for question_id, response_type, updated_at in rows:
+            if question_id in logic_rules:
+                _compiled.pop(question_id, None)
+                _compiled[question_id] = (updated_at, compile_rules(logic_rules[question_id], response_type))
+        while len(_compiled) > COMPILED_CACHE_SIZE:
+            _compiled.pop(next(iter(_compiled)))
+    return [(question_id, _compiled[question_id][1]) for question_id, _, _ in rows if question_id in _compiled]
+
+
+class RuleResults:
+    """What a set of answers triggers, keyed the way the inspection page submits it"""
+
+    def __init__(self):
+        # question id -> message shown under the question (the last matching rule's)
+        self.display_messages = {}
+        # {question_id}_{rule_id} -> message, for evidence that must be attached
+        self.required_evidence = {}
+        # {question_id}_{rule_id}_conditional -> follow-up question text
+        self.conditional_questions = {}
+        # question id -> notification text
+        self.notifications = {}
+
+    def missing_evidence(self, conditional_evidence):
+        """{evidence key: message} for required evidence that wasn't attached"""
+        conditional_evidence = conditional_evidence or {}
+        return {key: message for key, message in self.required_evidence.items() if not conditional_evidence.get(key)}
+
+
+def evaluate(compiled_questions, answers):
+    """
+    Run every compiled rule against the answers in one pass. Keys are question
+    ids, or the keys of revealed sub-questions with their answers merged in.
+    """
+    results = RuleResults()
+    for question_id, rules in compiled_questions:
+        key = str(question_id)
+        value = answers.get(key, answers.get(question_id))
+        if value is None:
+            continue
+        answer_text = js_string(value)
+        for rule in rules:
+            if not rule.predicate(value):
+                continue
+            trigger, message = rule.trigger, rule.message
+            if trigger == TRIGGER_DISPLAY_MESSAGE:
+                results.display_messages[key] = message or f'✅ Condition met! You entered {answer_text}.'
+            elif trigger == TRIGGER_REQUIRE_EVIDENCE:
+                results.required_evidence[f'{key}_{rule.rule_id}'] = rule.message or 'Please upload proof'
+                results.display_messages[key] = (
+                    f'📸 EVIDENCE REQUIRED: {message or f"Please upload proof for answer: {answer_text}"}'
+                )
+            elif trigger == TRIGGER_REQUIRE_ACTION:
+                results.display_messages[key] = (
+                    f'⚠️ ACTION REQUIRED: {message or f"Please take action for answer: {answer_text}"}'
+                )
+            elif trigger == TRIGGER_NOTIFY:
+                message = message or f'Admin has been notified about answer: {answer_text}'
+                results.notifications[key] = message
+                results.display_messages[key] = f'🔔 NOTIFICATION: {message}'
+            elif trigger == TRIGGER_ASK_QUESTIONS:
+                sub_question = rule.sub_question
+                if isinstance(sub_question, dict):
+                    text = sub_question.get('text')
+                    results.conditional_questions[f'{key}_{rule.rule_id}_conditional'] = (
+                        text.strip() if isinstance(text, str) and text.strip() else
+                        message or f'Please provide additional information about your answer: {answer_text}'
+                    )
+                else:
+                    results.display_messages[key] = (
+                        message or f'Additional information required for answer: {answer_text}'
+                    )
+            elif trigger == TRIGGER_TAKE_ACTION and message:
+                results.display_messages[key] = f'🎯 TAKE ACTION: {message}'
+    return results
+
+
+def evaluate_template_rules(template_id, answers):
+    """RuleResults for a submission's answers against a template's logic rules"""
+    return evaluate(template_rules(template_id), answers if isinstance(answers, dict) else {})
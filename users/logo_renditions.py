@@ -0,0 +1,119 @@
+import base64
+import hashlib
+import io
+import mimetypes
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, UnidentifiedImageError
+
+
+# Bounding boxes for the resized logos. Aspect ratio is kept.
+LOGO_RENDITION_SIZES = {
+    'thumbnail': (96, 96),   # template lists and dashboard cards
+    'report': (480, 160),    # report / PDF header
+}
+
+# Renditions are stored under their content hash, so a file name never changes
+# meaning and can be cached by browsers and nginx forever.
+RENDITION_ROOT = 'logos/renditions'
+
+# Query parameter that brings back the old inline `data:` URI representation
+LOGO_FORMAT_PARAM = 'logo_format'
+
+
+def build_logo_renditions(logo):
+    """
+    Write the thumbnail and report renditions of an uploaded logo and return the
+    mapping stored on Template.logo_renditions. The original rendition is the
+    uploaded file itself. Identical content maps to the same paths, so
+    re-uploads don't write anything.
+    """
+    with logo.open('rb') as logo_file:
+        content = logo_file.read()
+
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    renditions = {
+        'source': logo.name,
+        'hash': digest,
+        'original': logo.name,
+    }
+
+    try:
+        image = Image.open(io.BytesIO(content))
+        image.load()
+    except (UnidentifiedImageError, OSError) as e:
+        # Not something Pillow can resize (e.g. SVG) - serve the original only
+        print(f"⚠️ Could not create logo renditions for {logo.name}: {e}")
+        return renditions
+
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+
+    for name, size in LOGO_RENDITION_SIZES.items():
+        path = f'{RENDITION_ROOT}/{digest}/{name}.png'
+        if not default_storage.exists(path):
+            resized = image.copy()
+            resized.thumbnail(size, Image.LANCZOS)
+            buffer = io.BytesIO()
+            resized.save(buffer, format='PNG', optimize=True)
+            _save_once(path, buffer.getvalue())
+        renditions[name] = path
+
+    return renditions
+
+
+def _save_once(path, content):
+    if not default_storage.exists(path):
+        default_storage.save(path, ContentFile(content))
+    return path
+
+
+def logo_name(template, rendition='original'):
+    """Storage name of a logo rendition, falling back to the uploaded file for templates without renditions"""
+    if not template.logo:
+        return None
+    renditions = template.logo_renditions or {}
+    return renditions.get(rendition) or renditions.get('original') or template.logo.name
+
+
+def stored_logo_url(name, request=None):
+    """URL of a storage name returned by logo_name"""
+    if not name:
+        return None
+    url = default_storage.url(name)
+    return request.build_absolute_uri(url) if request else url
+
+
+def logo_url(template, rendition='original', request=None):
+    """URL of a logo rendition, falling back to the uploaded file for templates without renditions"""
+    return stored_logo_url(logo_name(template, rendition), request)
+
+
+def logo_urls(template, request=None):
+    if not template.logo:
+        return None
+    return {
+        name: logo_url(template, name, request)
+        for name in ('original', *LOGO_RENDITION_SIZES)
+    }
+
+
+def logo_data_uri(template):
+    """The original logo inlined as a base64 `data:` URI (opt-in only)"""
+    if not template.logo:
+        return None
+    try:
+        with template.logo.open('rb') as image_file:
+            encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
+    except Exception:
+        return None
+    mime_type = mimetypes.guess_type(template.logo.name)[0] or 'image/png'
+    return f"data:{mime_type};base64,{encoded_string}"
+
+
+def wants_inline_logo(request):
+    """True when the client explicitly asked for `?logo_format=base64`"""
+    if request is None:
+        return False
+    return request.GET.get(LOGO_FORMAT_PARAM) == 'base64'
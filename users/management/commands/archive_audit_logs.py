@@ -0,0 +1,103 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from users import audit_partitions
+from users.audit_partitions import add_months, archive_file_name, month_start
+
+
+class Command(BaseCommand):
+    help = (
+        'Maintain the monthly partitions of the permission audit log: create upcoming months and '
+        'move months past the retention period into gzip JSON-lines archives'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            default=getattr(settings, 'AUDIT_LOG_RETENTION_MONTHS', 12),
+            help='Keep this many whole months in the database besides the current one (default: AUDIT_LOG_RETENTION_MONTHS)',
+        )
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=3,
+            help='Create partitions this many months into the future (default: 3)',
+        )
+        parser.add_argument(
+            '--archive-dir',
+            default=getattr(settings, 'AUDIT_LOG_ARCHIVE_DIR', None),
+            help='Directory for the audit_log_YYYY_MM.jsonl.gz files (default: AUDIT_LOG_ARCHIVE_DIR)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be created and archived without changing anything',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Audit log partitions need PostgreSQL')
+        if options['retention_months'] < 0:
+            raise CommandError('--retention-months must be 0 or more')
+        archive_dir = options['archive_dir']
+        if not archive_dir:
+            raise CommandError('Set AUDIT_LOG_ARCHIVE_DIR or pass --archive-dir')
+
+        dry_run = options['dry_run']
+        now = timezone.now()
+        partitions = audit_partitions.monthly_partitions()
+
+        # Upcoming months
+        created = 0
+        for offset in range(options['months_ahead'] + 1):
+            month = add_months(month_start(now), offset)
+            if month in partitions:
+                continue
+            created += 1
+            name = audit_partitions.partition_name(month)
+            if dry_run:
+                self.stdout.write(f"Would create partition {name}")
+                continue
+            moved = audit_partitions.create_partition(month)
+            self.stdout.write(f"Created partition {name} (moved {moved} rows out of the default partition)")
+
+        # Months past retention: everything before this is archived
+        cutoff = add_months(month_start(now), -options['retention_months'])
+        archived_rows = 0
+        archived_months = 0
+
+        for month, name in sorted(partitions.items()):
+            if month >= cutoff:
+                continue
+            path = os.path.join(archive_dir, archive_file_name(month))
+            archived_months += 1
+            if dry_run:
+                self.stdout.write(f"Would archive partition {name} to {path} and drop it")
+                continue
+            rows = audit_partitions.archive_rows(name, path)
+            audit_partitions.drop_partition(name)
+            archived_rows += rows
+            self.stdout.write(f"Archived {rows} rows of {name} to {path}")
+
+        # Old rows that were written before their month had a partition
+        for month in audit_partitions.default_partition_months(cutoff):
+            end = add_months(month, 1)
+            path = os.path.join(archive_dir, archive_file_name(month))
+            if dry_run:
+                self.stdout.write(f"Would archive default partition rows of {month:%Y-%m} to {path}")
+                continue
+            rows = audit_partitions.archive_rows(audit_partitions.DEFAULT_PARTITION, path, month, end)
+            audit_partitions.delete_default_rows(month, end)
+            archived_rows += rows
+            self.stdout.write(f"Archived {rows} default partition rows of {month:%Y-%m} to {path}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Would create' if dry_run else 'Created'} {created} partitions, "
+            f"{'would archive' if dry_run else 'archived'} {archived_months} monthly partitions "
+            f"({archived_rows} rows) older than {cutoff:%Y-%m}"
+        ))
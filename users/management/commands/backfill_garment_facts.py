@@ -0,0 +1,69 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.garment_facts import sync_garment_facts
+from users.models import GarmentDefectLine, GarmentQuantityLine, Inspection
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the garment quantity and defect lines from Inspection.garment_data in batches, '
+        'e.g. for inspections stored before the fact tables existed'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--template',
+            type=int,
+            action='append',
+            dest='templates',
+            help='Only inspections of this template (repeatable; default: all templates)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Inspections read and rewritten per batch (default: 2000)',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(options['chunk_size'], 1)
+
+        inspections = Inspection.objects.only('id', 'garment_data').order_by('id')
+        if options['templates']:
+            inspections = inspections.filter(template_id__in=options['templates'])
+
+        # Lines left behind by inspections whose garment data was cleared
+        stale = inspections.filter(garment_data__isnull=True).values('id')
+        removed = GarmentQuantityLine.objects.filter(inspection_id__in=stale).delete()[0]
+        removed += GarmentDefectLine.objects.filter(inspection_id__in=stale).delete()[0]
+
+        self.totals = {'inspections': 0, 'quantity_lines': 0, 'defect_lines': 0}
+        started = time.perf_counter()
+
+        # Streamed through a server-side cursor; each chunk is one delete + insert per table
+        batch = []
+        for inspection in inspections.filter(garment_data__isnull=False).iterator(chunk_size=chunk_size):
+            batch.append(inspection)
+            if len(batch) >= chunk_size:
+                self.process(batch)
+                batch = []
+        if batch:
+            self.process(batch)
+
+        elapsed = time.perf_counter() - started
+        totals = self.totals
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {totals['quantity_lines']} quantity lines and {totals['defect_lines']} defect lines "
+            f"for {totals['inspections']} inspections in {elapsed:.2f}s "
+            f"({removed} stale lines removed)"
+        ))
+
+    def process(self, batch):
+        with transaction.atomic():
+            quantity_lines, defect_lines = sync_garment_facts(batch)
+        self.totals['inspections'] += len(batch)
+        self.totals['quantity_lines'] += quantity_lines
+        self.totals['defect_lines'] += defect_lines
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from users.models import Template
+
+
+class Command(BaseCommand):
+    help = 'Build the resized, content-hashed logo renditions for templates uploaded before renditions existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Rebuild renditions for every template with a logo, not just the missing ones',
+        )
+
+    def handle(self, *args, **options):
+        templates = Template.objects.exclude(logo='').exclude(logo__isnull=True).only('id', 'logo', 'logo_renditions')
+        if not options['all']:
+            templates = templates.filter(logo_renditions={})
+
+        built = failed = 0
+        for template in templates.iterator(chunk_size=200):
+            try:
+                template.refresh_logo_renditions()
+                built += 1
+            except Exception as e:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f'Template {template.id}: {e}'))
+
+        self.stdout.write(self.style.SUCCESS(f'Built logo renditions for {built} templates ({failed} failed)'))
@@ -188,8 +188,12 @@ class Command(BaseCommand):
 
             # Add some conditional responses to simulate triggered logic rules
             # Conditional answer for the first question (quality not acceptable)
-            conditional_response = Response(question=questions[0])
-            conditional_response.text_response = f"CONDITIONAL_{questions[0].id}_rule2_conditional:Poor stitching and loose threads observed throughout the garment"
+            conditional_response = Response(
+                question=questions[0],
+                kind=Response.KIND_CONDITIONAL_ANSWER,
+                entry_key=f"{questions[0].id}_rule2_conditional",
+            )
+            conditional_response.text_response = "Poor stitching and loose threads observed throughout the garment"
             conditional_response.save()
 
             InspectionResponse.objects.create(
@@ -199,8 +203,12 @@ class Command(BaseCommand):
             self.stdout.write("Created conditional answer for quality question")
 
             # Evidence for the first question
-            evidence_response = Response(question=questions[0])
-            evidence_response.text_response = f"EVIDENCE_{questions[0].id}_rule1:data:image/jpeg;base64,/9j/4AAQSkZJRgABAQAAAQABAAD/2wBDAAYEBQYFBAYGBQYHBwYIChAKCgkJChQODwwQFxQYGBcUFhYaHSUfGhsjHBYWICwgIyYnKSopGR8tMC0oMCUoKSj/2wBDAQcHBwoIChMKChMoGhYaKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCj/wAARCAABAAEDASIAAhEBAxEB/8QAFQABAQAAAAAAAAAAAAAAAAAAAAv/xAAUEAEAAAAAAAAAAAAAAAAAAAAA/8QAFQEBAQAAAAAAAAAAAAAAAAAAAAX/xAAUEQEAAAAAAAAAAAAAAAAAAAAA/9oADAMBAAIRAxEAPwCdABmX/9k="
+            evidence_response = Response(
+                question=questions[0],
+                kind=Response.KIND_EVIDENCE,
+                entry_key=f"{questions[0].id}_rule1",
+            )
+            evidence_response.text_response = "data:image/jpeg;base64,/9j/4AAQSkZJRgABAQAAAQABAAD/2wBDAAYEBQYFBAYGBQYHBwYIChAKCgkJChQODwwQFxQYGBcUFhYaHSUfGhsjHBYWICwgIyYnKSopGR8tMC0oMCUoKSj/2wBDAQcHBwoIChMKChMoGhYaKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCgoKCj/wAARCAABAAEDASIAAhEBAxEB/8QAFQABAQAAAAAAAAAAAAAAAAAAAAv/xAAUEAEAAAAAAAAAAAAAAAAAAAAA/8QAFQEBAQAAAAAAAAAAAAAAAAAAAAX/xAAUEQEAAAAAAAAAAAAAAAAAAAAA/9oADAMBAAIRAxEAPwCdABmX/9k="
             evidence_response.save()
 
             InspectionResponse.objects.create(
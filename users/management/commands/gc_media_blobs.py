@@ -0,0 +1,113 @@
+import posixpath
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.logo_renditions import RENDITION_ROOT
+from users.media_blobs import BLOB_FIELDS, recount, referenced_names
+from users.models import MediaBlob, Template
+from users.storage import ContentAddressedStorage, content_addressed_storage
+
+
+class Command(BaseCommand):
+    help = 'Delete content-addressed media files (logos, attachments, logo renditions) that nothing references'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-hours',
+            type=int,
+            default=24,
+            help='Only collect files unreferenced for at least this long, so in-flight uploads are kept (default: 24)',
+        )
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help='Rebuild reference counts from the database before collecting',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be deleted without deleting anything',
+        )
+
+    def handle(self, *args, **options):
+        storage = content_addressed_storage
+        dry_run = options['dry_run']
+        cutoff = timezone.now() - timedelta(hours=options['grace_hours'])
+
+        if options['recount']:
+            counts = recount()
+            self.stdout.write(f"Recounted references for {len(counts)} blobs")
+
+        # Candidates: blobs counted down to zero plus hashed files that were
+        # written but never counted (e.g. the saving transaction rolled back)
+        candidates = set(
+            MediaBlob.objects.filter(ref_count=0, updated_at__lt=cutoff).values_list('name', flat=True)
+        )
+        tracked = set(MediaBlob.objects.values_list('name', flat=True))
+        for directory in self.blob_directories():
+            for name in self.walk(storage, directory):
+                if (ContentAddressedStorage.is_hashed_name(name) and name not in tracked
+                        and storage.get_modified_time(name) < cutoff):
+                    candidates.add(name)
+
+        # The tables are the source of truth; never delete anything still in use
+        candidates -= referenced_names()
+
+        freed = 0
+        for name in sorted(candidates):
+            size = storage.size(name) if storage.exists(name) else 0
+            freed += size
+            self.stdout.write(f"{'Would delete' if dry_run else 'Deleting'} {name} ({size} bytes)")
+            if not dry_run:
+                storage.purge(name)
+                MediaBlob.objects.filter(name=name, ref_count=0).delete()
+
+        renditions = self.collect_renditions(storage, cutoff, dry_run)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Would free' if dry_run else 'Freed'} {freed} bytes from {len(candidates)} blobs "
+            f"and {renditions} logo rendition sets"
+        ))
+
+    def blob_directories(self):
+        directories = set()
+        for model, field_name in BLOB_FIELDS:
+            upload_to = model._meta.get_field(field_name).upload_to
+            if callable(upload_to):
+                upload_to = upload_to(None, 'probe')
+            directories.add(posixpath.dirname(upload_to.rstrip('/') + '/'))
+        return sorted(directories)
+
+    def walk(self, storage, directory):
+        if not storage.exists(directory):
+            return
+        dirs, files = storage.listdir(directory)
+        for filename in files:
+            yield posixpath.join(directory, filename)
+        for sub in dirs:
+            yield from self.walk(storage, posixpath.join(directory, sub))
+
+    def collect_renditions(self, storage, cutoff, dry_run):
+        """Rendition directories are keyed by logo hash; drop those no template points at"""
+        if not storage.exists(RENDITION_ROOT):
+            return 0
+        in_use = {
+            renditions.get('hash')
+            for renditions in Template.objects.exclude(logo_renditions={}).values_list('logo_renditions', flat=True)
+        }
+        removed = 0
+        for digest in storage.listdir(RENDITION_ROOT)[0]:
+            if digest in in_use:
+                continue
+            directory = posixpath.join(RENDITION_ROOT, digest)
+            files = [posixpath.join(directory, f) for f in storage.listdir(directory)[1]]
+            if any(storage.get_modified_time(name) >= cutoff for name in files):
+                continue
+            removed += 1
+            self.stdout.write(f"{'Would delete' if dry_run else 'Deleting'} renditions {directory}/")
+            if not dry_run:
+                for name in files:
+                    storage.purge(name)
+        return removed
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.inspection_rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the daily inspection and defect-type analytics rollups from completed inspections, '
+        'e.g. after importing inspections or editing them outside the app'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--template',
+            type=int,
+            action='append',
+            dest='templates',
+            help='Only rollups of this template (repeatable; default: all templates)',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            inspection_rows, defect_rows = rebuild_rollups(options['templates'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {inspection_rows} inspection rollups and {defect_rows} defect-type rollups '
+            f'in {time.perf_counter() - started:.2f}s'
+        ))
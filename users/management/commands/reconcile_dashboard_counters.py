@@ -0,0 +1,78 @@
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from users.dashboard_counters import (
+    INSPECTIONS_COMPLETED, OVERDUE_ASSIGNMENTS, PENDING_ASSIGNMENTS, PENDING_STATUSES, TEMPLATES_CREATED,
+    cache_key,
+)
+from users.models import DashboardCounter, Inspection, Template, TemplateAssignment
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount every stored dashboard counter and fix the ones that drifted, e.g. after bulk '
+        'updates or deletes that bypass signals'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report drifted counters without fixing them',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expected = self.expected_counts(now)
+
+        drifted = []
+        for row in DashboardCounter.objects.order_by('id'):
+            value, valid_until = expected[row.name].get(row.user_id, 0), None
+            if row.name == OVERDUE_ASSIGNMENTS:
+                valid_until = self.next_due.get(row.user_id)
+            if (row.value, row.valid_until) == (value, valid_until):
+                continue
+            self.stdout.write(f'{row.name} for {row.user_id or "everyone"}: {row.value} -> {value}')
+            row.value, row.valid_until = value, valid_until
+            drifted.append(row)
+
+        if drifted and not options['dry_run']:
+            with transaction.atomic():
+                DashboardCounter.objects.bulk_update(drifted, ['value', 'valid_until'])
+            cache.delete_many({cache_key(row.user_id) for row in drifted})
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Would fix' if options['dry_run'] else 'Fixed'} {len(drifted)} drifted dashboard counters"
+        ))
+
+    def expected_counts(self, now):
+        """{counter name: {user id (None: everyone): value}} with one grouped query per table"""
+        expected = defaultdict(Counter)
+
+        for user_id, total in Template.objects.values_list('user_id').annotate(total=Count('id')).order_by():
+            expected[TEMPLATES_CREATED][user_id] = total
+        for user_id, total in (Inspection.objects.filter(status='completed').values_list('template__user_id')
+                               .annotate(total=Count('id')).order_by()):
+            expected[INSPECTIONS_COMPLETED][user_id] = total
+        for name in (TEMPLATES_CREATED, INSPECTIONS_COMPLETED):
+            expected[name][None] = sum(expected[name].values())
+
+        # Pending assignments are few; each counts once for everyone and for each user involved
+        self.next_due = {}
+        for inspector_id, assigned_by_id, due_date in TemplateAssignment.objects.filter(
+            status__in=PENDING_STATUSES
+        ).values_list('inspector_id', 'assigned_by_id', 'due_date'):
+            for user_id in {None, inspector_id, assigned_by_id}:
+                expected[PENDING_ASSIGNMENTS][user_id] += 1
+                if due_date is None:
+                    continue
+                if due_date < now:
+                    expected[OVERDUE_ASSIGNMENTS][user_id] += 1
+                elif user_id not in self.next_due or due_date < self.next_due[user_id]:
+                    self.next_due[user_id] = due_date
+        return expected
@@ -0,0 +1,126 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from users import aql
+from users.inspection_rollups import record_verdict_changes, verdict as recorded_verdict
+from users.models import Inspection, Section
+from users.report_snapshots import rewrite_verdicts
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-judge the AQL verdict of stored garment inspections in batches, e.g. after an AQL policy '
+        'change, and write the changed verdicts back (into frozen reports too)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--template',
+            type=int,
+            action='append',
+            dest='templates',
+            help='Only inspections of this template (repeatable; default: all templates)',
+        )
+        parser.add_argument(
+            '--aql-level',
+            choices=aql.AQL_LEVELS,
+            help="Judge every inspection at this AQL instead of its template's setting",
+        )
+        parser.add_argument(
+            '--inspection-level',
+            choices=aql.INSPECTION_LEVELS,
+            help="Judge every inspection at this inspection level instead of its template's setting",
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Inspections read, evaluated and written per batch (default: 2000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report how many verdicts would change without writing them',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = max(options['chunk_size'], 1)
+        dry_run = options['dry_run']
+
+        # The garment section each template is judged by (the first one, as on the page)
+        sections = {}
+        for section in Section.objects.filter(is_garment_section=True).order_by('order', 'id'):
+            sections.setdefault(section.template_id, section)
+
+        # Rollup key fields are loaded too, to move changed verdicts between passed and failed
+        inspections = Inspection.objects.filter(garment_data__isnull=False).only(
+            'id', 'template_id', 'garment_data', 'status', 'conducted_at', 'conducted_by', 'site'
+        ).order_by('id')
+        if options['templates']:
+            inspections = inspections.filter(template_id__in=options['templates'])
+
+        self.totals = {'read': 0, 'changed': 0, 'to_pass': 0, 'to_fail': 0}
+        self.timings = {'evaluate': 0.0, 'write': 0.0}
+        started = time.perf_counter()
+
+        # Streamed through a server-side cursor; each chunk is written with one bulk_update
+        batch = []
+        for inspection in inspections.iterator(chunk_size=chunk_size):
+            if inspection.garment_data and isinstance(inspection.garment_data, dict):
+                batch.append(inspection)
+            if len(batch) >= chunk_size:
+                self.process(batch, sections, options, dry_run)
+                batch = []
+        if batch:
+            self.process(batch, sections, options, dry_run)
+
+        elapsed = time.perf_counter() - started
+        totals, timings = self.totals, self.timings
+        read_seconds = elapsed - timings['evaluate'] - timings['write']
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Would change' if dry_run else 'Changed'} {totals['changed']} of {totals['read']} verdicts "
+            f"({totals['to_pass']} now PASS, {totals['to_fail']} now FAIL) in {elapsed:.2f}s, "
+            f"{totals['read'] / elapsed if elapsed else 0:,.0f} inspections/s "
+            f"(read {read_seconds:.2f}s, evaluate {timings['evaluate']:.2f}s, write {timings['write']:.2f}s)"
+        ))
+
+    def process(self, batch, sections, options, dry_run):
+        """
+        Re-judge one chunk and write back the inspections whose verdict changed,
+        with their report snapshots. updated_at moves so cached PDFs are re-rendered.
+        """
+        started = time.perf_counter()
+        changed = []
+        rejudged = []
+        verdict_changes = []
+        for inspection in batch:
+            verdict = aql.evaluate(inspection.garment_data, sections.get(inspection.template_id),
+                                   aql_level=options['aql_level'], inspection_level=options['inspection_level'])
+            garment_data = aql.with_verdict(inspection.garment_data, verdict)
+            if garment_data == inspection.garment_data:
+                continue
+            old_status = recorded_verdict(inspection.garment_data)
+            if old_status != verdict['status']:
+                self.totals['to_pass' if verdict['status'] == aql.STATUS_PASS else 'to_fail'] += 1
+                verdict_changes.append((inspection, old_status))
+            inspection.garment_data = garment_data
+            changed.append(inspection)
+            rejudged.append((inspection, verdict))
+        self.timings['evaluate'] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        if changed and not dry_run:
+            now = timezone.now()
+            for inspection in changed:
+                inspection.updated_at = now
+            with transaction.atomic():
+                Inspection.objects.bulk_update(changed, ['garment_data', 'updated_at'])
+                rewrite_verdicts(rejudged)
+                record_verdict_changes(verdict_changes)
+        self.timings['write'] += time.perf_counter() - started
+
+        self.totals['read'] += len(batch)
+        self.totals['changed'] += len(changed)
@@ -0,0 +1,95 @@
+from django.db.models import F
+from django.db.models.signals import pre_save, post_save, post_delete
+
+from .models import Template, MediaAttachment, MediaBlob
+from .storage import ContentAddressedStorage
+
+
+# Every (model, file field) stored in ContentAddressedStorage
+BLOB_FIELDS = [
+    (Template, 'logo'),
+    (MediaAttachment, 'file'),
+]
+
+
+def acquire(name, storage):
+    """Count one more reference to a stored file"""
+    if not ContentAddressedStorage.is_hashed_name(name):
+        return
+    if MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1):
+        return
+    try:
+        size = storage.size(name)
+    except OSError:
+        size = 0
+    MediaBlob.objects.get_or_create(name=name, defaults={'size': size})
+    MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1)
+
+
+def release(name):
+    """Drop one reference; the file stays until gc_media_blobs collects it"""
+    if not ContentAddressedStorage.is_hashed_name(name):
+        return
+    MediaBlob.objects.filter(name=name, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+
+
+def referenced_names():
+    """Every file name currently referenced by a row, straight from the tables"""
+    names = set()
+    for model, field_name in BLOB_FIELDS:
+        names.update(
+            model._base_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+            .values_list(field_name, flat=True)
+        )
+    return names
+
+
+def recount():
+    """Rebuild every MediaBlob.ref_count from the referencing tables"""
+    counts = {}
+    for model, field_name in BLOB_FIELDS:
+        for name in model._base_manager.values_list(field_name, flat=True).iterator():
+            if ContentAddressedStorage.is_hashed_name(name):
+                counts[name] = counts.get(name, 0) + 1
+
+    MediaBlob.objects.exclude(name__in=counts).update(ref_count=0)
+    for name, count in counts.items():
+        MediaBlob.objects.update_or_create(name=name, defaults={'ref_count': count})
+    return counts
+
+
+def _remember_previous_name(sender, instance, update_fields=None, **kwargs):
+    field_name = _blob_field(sender)
+    instance._previous_blob_name = None
+    if instance.pk is None or (update_fields is not None and field_name not in update_fields):
+        return
+    instance._previous_blob_name = sender._base_manager.filter(pk=instance.pk).values_list(
+        field_name, flat=True
+    ).first()
+
+
+def _count_saved_blob(sender, instance, created, update_fields=None, **kwargs):
+    field_name = _blob_field(sender)
+    if not created and update_fields is not None and field_name not in update_fields:
+        return
+    field_file = getattr(instance, field_name)
+    previous = getattr(instance, '_previous_blob_name', None)
+    if (field_file.name or None) == (previous or None):
+        return
+    acquire(field_file.name, field_file.storage)
+    release(previous)
+
+
+def _release_deleted_blob(sender, instance, **kwargs):
+    release(getattr(instance, _blob_field(sender)).name)
+
+
+def _blob_field(sender):
+    return next(field_name for model, field_name in BLOB_FIELDS if model is sender)
+
+
+def connect_signals():
+    for model, _ in BLOB_FIELDS:
+        pre_save.connect(_remember_previous_name, sender=model, dispatch_uid=f'media_blob_pre_save_{model.__name__}')
+        post_save.connect(_count_saved_blob, sender=model, dispatch_uid=f'media_blob_post_save_{model.__name__}')
+        post_delete.connect(_release_deleted_blob, sender=model, dispatch_uid=f'media_blob_post_delete_{model.__name__}')
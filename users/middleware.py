@@ -4,8 +4,9 @@ from django.http import HttpResponseForbidden
 from django.urls import resolve
 from django.utils.deprecation import MiddlewareMixin
 from django.conf import settings
-from .models import Template, TemplateAccess, PermissionAuditLog
+from .audit import audit_writer
 from .permissions import has_template_permission
+from .permission_resolver import get_permission_resolver
 
 
 class AccessVerificationMiddleware(MiddlewareMixin):
@@ -122,17 +123,20 @@ class AccessVerificationMiddleware(MiddlewareMixin):
         has_permission = has_template_permission(
             request.user,
             template_id,
-            required_level=required_permission
+            required_level=required_permission,
+            request=request
         )
         print(f"🔍 Middleware: Permission result={has_permission}")
 
+        # Resolved once above and memoized on the request
+        template_exists = get_permission_resolver(request).resolve(template_id).exists
+
         if not has_permission:
-            # Log the failed access attempt
-            try:
-                template = Template.objects.get(id=template_id)
-                PermissionAuditLog.objects.create(
+            # Queue the failed access attempt for the audit log
+            if template_exists:
+                audit_writer.log(
                     user=request.user,
-                    template=template,
+                    template_id=template_id,
                     action='access',
                     performed_by=request.user,
                     old_permission=None,
@@ -146,20 +150,17 @@ class AccessVerificationMiddleware(MiddlewareMixin):
                         'status': 'denied'
                     }
                 )
-            except Template.DoesNotExist:
-                pass
 
             return HttpResponseForbidden(
                 json.dumps({'detail': 'You do not have permission to perform this action.'}),
                 content_type='application/json'
             )
 
-        # Log the successful access
-        try:
-            template = Template.objects.get(id=template_id)
-            PermissionAuditLog.objects.create(
+        # Queue the successful access for the audit log (written in batches)
+        if template_exists:
+            audit_writer.log(
                 user=request.user,
-                template=template,
+                template_id=template_id,
                 action='access',
                 performed_by=request.user,
                 old_permission=None,
@@ -173,8 +174,6 @@ class AccessVerificationMiddleware(MiddlewareMixin):
                     'status': 'allowed'
                 }
             )
-        except Template.DoesNotExist:
-            pass
 
         # Proceed to the view
         return None
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_inspection_garment_data'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='template',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='templates_user_updated_idx'),
+        ),
+    ]
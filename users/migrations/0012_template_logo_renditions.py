@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_template_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='template',
+            name='logo_renditions',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
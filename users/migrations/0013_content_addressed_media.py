@@ -0,0 +1,40 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:19
+
+import users.models
+import users.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0012_template_logo_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mediaattachment',
+            name='file',
+            field=models.FileField(storage=users.storage.ContentAddressedStorage(), upload_to=users.models.MediaAttachment.upload_to),
+        ),
+        migrations.AlterField(
+            model_name='template',
+            name='logo',
+            field=models.ImageField(blank=True, null=True, storage=users.storage.ContentAddressedStorage(), upload_to='logos/'),
+        ),
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField(default=0)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'media_blobs',
+                'indexes': [models.Index(fields=['ref_count', 'updated_at'], name='media_blobs_ref_cou_5a80b2_idx')],
+            },
+        ),
+    ]
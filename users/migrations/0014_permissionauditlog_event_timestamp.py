@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-18 16:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0013_content_addressed_media'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='permissionauditlog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
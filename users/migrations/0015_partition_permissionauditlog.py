@@ -0,0 +1,138 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+# Rebuilds users_permissionauditlog as a table partitioned by month on
+# "timestamp" (PostgreSQL declarative partitioning). Existing rows are copied
+# into monthly partitions; a DEFAULT partition catches anything outside the
+# pre-created months until archive_audit_logs creates the missing partition.
+#
+# The primary key has to include the partition key, so it becomes
+# (id, timestamp). id keeps its own sequence; identity columns are not
+# supported on partitioned tables before PostgreSQL 17.
+PARTITION_SQL = [
+    'ALTER TABLE "users_permissionauditlog" RENAME TO "users_permissionauditlog_unpartitioned"',
+    'ALTER TABLE "users_permissionauditlog_unpartitioned" DROP CONSTRAINT "users_permissionauditlog_pkey"',
+    '''
+    DO $$
+    DECLARE
+        idx record;
+    BEGIN
+        FOR idx IN SELECT indexname FROM pg_indexes WHERE tablename = 'users_permissionauditlog_unpartitioned' LOOP
+            EXECUTE format('DROP INDEX %I', idx.indexname);
+        END LOOP;
+    END
+    $$
+    ''',
+    '''
+    CREATE TABLE "users_permissionauditlog" (
+        LIKE "users_permissionauditlog_unpartitioned" INCLUDING DEFAULTS,
+        PRIMARY KEY ("id", "timestamp")
+    ) PARTITION BY RANGE ("timestamp")
+    ''',
+    'CREATE TABLE "users_permissionauditlog_default" PARTITION OF "users_permissionauditlog" DEFAULT',
+    '''
+    DO $$
+    DECLARE
+        month_start timestamp;
+        last_month timestamp := date_trunc('month', now() AT TIME ZONE 'UTC') + interval '3 months';
+    BEGIN
+        SELECT date_trunc('month', coalesce(min("timestamp"), now()) AT TIME ZONE 'UTC')
+          INTO month_start FROM "users_permissionauditlog_unpartitioned";
+        WHILE month_start <= last_month LOOP
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF "users_permissionauditlog" FOR VALUES FROM (%L) TO (%L)',
+                'users_permissionauditlog_p' || to_char(month_start, 'YYYY_MM'),
+                month_start::text || '+00',
+                (month_start + interval '1 month')::text || '+00'
+            );
+            month_start := month_start + interval '1 month';
+        END LOOP;
+    END
+    $$
+    ''',
+    'INSERT INTO "users_permissionauditlog" SELECT * FROM "users_permissionauditlog_unpartitioned"',
+    'DROP TABLE "users_permissionauditlog_unpartitioned"',
+    'CREATE SEQUENCE "users_permissionauditlog_id_seq" OWNED BY "users_permissionauditlog"."id"',
+    '''ALTER TABLE "users_permissionauditlog" ALTER COLUMN "id" SET DEFAULT nextval('users_permissionauditlog_id_seq')''',
+    '''SELECT setval('users_permissionauditlog_id_seq', coalesce(max("id"), 0) + 1, false) FROM "users_permissionauditlog"''',
+    '''
+    ALTER TABLE "users_permissionauditlog"
+        ADD CONSTRAINT "users_permissionaudi_performed_by_id_ce347725_fk_users_cus"
+        FOREIGN KEY ("performed_by_id") REFERENCES "users_customuser" ("id") DEFERRABLE INITIALLY DEFERRED,
+        ADD CONSTRAINT "users_permissionauditlog_template_id_aadeca2d_fk_templates_id"
+        FOREIGN KEY ("template_id") REFERENCES "templates" ("id") DEFERRABLE INITIALLY DEFERRED,
+        ADD CONSTRAINT "users_permissionaudi_user_id_3e82e003_fk_users_cus"
+        FOREIGN KEY ("user_id") REFERENCES "users_customuser" ("id") DEFERRABLE INITIALLY DEFERRED
+    ''',
+    'CREATE INDEX "users_permissionauditlog_performed_by_id_ce347725" ON "users_permissionauditlog" ("performed_by_id")',
+    'CREATE INDEX "users_permissionauditlog_template_id_aadeca2d" ON "users_permissionauditlog" ("template_id")',
+    'CREATE INDEX "users_permissionauditlog_user_id_3e82e003" ON "users_permissionauditlog" ("user_id")',
+    'CREATE INDEX "users_permi_action_9cfbd0_idx" ON "users_permissionauditlog" ("action")',
+    'CREATE INDEX "users_permi_timesta_04c6d9_idx" ON "users_permissionauditlog" ("timestamp")',
+    'CREATE INDEX "audit_template_ts_idx" ON "users_permissionauditlog" ("template_id", "timestamp")',
+    'CREATE INDEX "audit_user_ts_idx" ON "users_permissionauditlog" ("user_id", "timestamp")',
+]
+
+UNPARTITION_SQL = [
+    'ALTER TABLE "users_permissionauditlog" RENAME TO "users_permissionauditlog_partitioned"',
+    'CREATE TABLE "users_permissionauditlog" (LIKE "users_permissionauditlog_partitioned")',
+    'INSERT INTO "users_permissionauditlog" SELECT * FROM "users_permissionauditlog_partitioned"',
+    'DROP TABLE "users_permissionauditlog_partitioned" CASCADE',
+    'ALTER TABLE "users_permissionauditlog" ADD CONSTRAINT "users_permissionauditlog_pkey" PRIMARY KEY ("id")',
+    'ALTER TABLE "users_permissionauditlog" ALTER COLUMN "id" ADD GENERATED BY DEFAULT AS IDENTITY',
+    '''
+    SELECT setval(pg_get_serial_sequence('"users_permissionauditlog"', 'id'), coalesce(max("id"), 0) + 1, false)
+      FROM "users_permissionauditlog"
+    ''',
+    '''
+    ALTER TABLE "users_permissionauditlog"
+        ADD CONSTRAINT "users_permissionaudi_performed_by_id_ce347725_fk_users_cus"
+        FOREIGN KEY ("performed_by_id") REFERENCES "users_customuser" ("id") DEFERRABLE INITIALLY DEFERRED,
+        ADD CONSTRAINT "users_permissionauditlog_template_id_aadeca2d_fk_templates_id"
+        FOREIGN KEY ("template_id") REFERENCES "templates" ("id") DEFERRABLE INITIALLY DEFERRED,
+        ADD CONSTRAINT "users_permissionaudi_user_id_3e82e003_fk_users_cus"
+        FOREIGN KEY ("user_id") REFERENCES "users_customuser" ("id") DEFERRABLE INITIALLY DEFERRED
+    ''',
+    'CREATE INDEX "users_permissionauditlog_performed_by_id_ce347725" ON "users_permissionauditlog" ("performed_by_id")',
+    'CREATE INDEX "users_permissionauditlog_template_id_aadeca2d" ON "users_permissionauditlog" ("template_id")',
+    'CREATE INDEX "users_permissionauditlog_user_id_3e82e003" ON "users_permissionauditlog" ("user_id")',
+    'CREATE INDEX "users_permi_user_id_63fe22_idx" ON "users_permissionauditlog" ("user_id")',
+    'CREATE INDEX "users_permi_templat_74bddb_idx" ON "users_permissionauditlog" ("template_id")',
+    'CREATE INDEX "users_permi_action_9cfbd0_idx" ON "users_permissionauditlog" ("action")',
+    'CREATE INDEX "users_permi_timesta_04c6d9_idx" ON "users_permissionauditlog" ("timestamp")',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0014_permissionauditlog_event_timestamp'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(PARTITION_SQL, UNPARTITION_SQL),
+            ],
+            state_operations=[
+                migrations.RemoveIndex(
+                    model_name='permissionauditlog',
+                    name='users_permi_user_id_63fe22_idx',
+                ),
+                migrations.RemoveIndex(
+                    model_name='permissionauditlog',
+                    name='users_permi_templat_74bddb_idx',
+                ),
+                migrations.AddIndex(
+                    model_name='permissionauditlog',
+                    index=models.Index(fields=['template', 'timestamp'], name='audit_template_ts_idx'),
+                ),
+                migrations.AddIndex(
+                    model_name='permissionauditlog',
+                    index=models.Index(fields=['user', 'timestamp'], name='audit_user_ts_idx'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.1.6 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+# Logic-rule rows used to be answers whose text carried the kind and key:
+# "CONDITIONAL_{key}:{value}", "EVIDENCE_{key}:{value}", "DISPLAY_MESSAGE_{key}:{value}"
+LEGACY_PREFIXES = [
+    ('CONDITIONAL_', 'conditional_answer'),
+    ('EVIDENCE_', 'evidence'),
+    ('DISPLAY_MESSAGE_', 'display_message'),
+]
+
+
+def split_legacy_prefixes(apps, schema_editor):
+    Response = apps.get_model('users', 'Response')
+    for prefix, kind in LEGACY_PREFIXES:
+        batch = []
+        for response in Response.objects.filter(kind='answer', text_response__startswith=prefix).iterator(chunk_size=1000):
+            key, separator, value = response.text_response[len(prefix):].partition(':')
+            if not separator:
+                continue
+            response.kind = kind
+            response.entry_key = key
+            response.text_response = value
+            batch.append(response)
+            if len(batch) >= 1000:
+                Response.objects.bulk_update(batch, ['kind', 'entry_key', 'text_response'])
+                batch = []
+        Response.objects.bulk_update(batch, ['kind', 'entry_key', 'text_response'])
+
+
+def join_legacy_prefixes(apps, schema_editor):
+    Response = apps.get_model('users', 'Response')
+    for prefix, kind in LEGACY_PREFIXES:
+        batch = []
+        for response in Response.objects.filter(kind=kind).iterator(chunk_size=1000):
+            response.text_response = f"{prefix}{response.entry_key}:{response.text_response or ''}"
+            batch.append(response)
+        Response.objects.bulk_update(batch, ['text_response'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0015_partition_permissionauditlog'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='response',
+            name='entry_key',
+            field=models.CharField(blank=True, max_length=255, null=True),
+        ),
+        migrations.AddField(
+            model_name='response',
+            name='kind',
+            field=models.CharField(choices=[('answer', 'Answer'), ('conditional_answer', 'Conditional Answer'), ('evidence', 'Evidence'), ('display_message', 'Display Message')], default='answer', max_length=20),
+        ),
+        migrations.RunPython(split_legacy_prefixes, join_legacy_prefixes),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0016_response_kind'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inspection',
+            name='submission_key',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.6 on 2026-10-18 18:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0017_inspection_submission_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InspectionReportSnapshot',
+            fields=[
+                ('inspection', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='report_snapshot', serialize=False, to='users.inspection')),
+                ('data', models.BinaryField()),
+                ('etag', models.CharField(max_length=64)),
+                ('size', models.PositiveIntegerField(help_text='Uncompressed size in bytes')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'inspection_report_snapshots',
+            },
+        ),
+    ]
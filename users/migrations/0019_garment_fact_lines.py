@@ -0,0 +1,45 @@
+# Generated by Django 5.1.6 on 2026-10-18 19:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0018_inspectionreportsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GarmentDefectLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('defect_type', models.CharField(blank=True, max_length=255)),
+                ('remarks', models.TextField(blank=True)),
+                ('critical', models.IntegerField(default=0)),
+                ('major', models.IntegerField(default=0)),
+                ('minor', models.IntegerField(default=0)),
+                ('inspection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='defect_lines', to='users.inspection')),
+            ],
+            options={
+                'db_table': 'garment_defect_lines',
+                'indexes': [models.Index(fields=['defect_type'], name='garment_def_defect__ddaf55_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='GarmentQuantityLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('color', models.CharField(max_length=100)),
+                ('size', models.CharField(max_length=50)),
+                ('order_qty', models.IntegerField(default=0)),
+                ('offered_qty', models.IntegerField(default=0)),
+                ('inspection', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quantity_lines', to='users.inspection')),
+            ],
+            options={
+                'db_table': 'garment_quantity_lines',
+                'indexes': [models.Index(fields=['color', 'size'], name='garment_qua_color_bf59fb_idx')],
+            },
+        ),
+    ]
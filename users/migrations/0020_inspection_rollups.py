@@ -0,0 +1,55 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0019_garment_fact_lines'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DefectTypeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('inspector', models.CharField(blank=True, max_length=255)),
+                ('site', models.CharField(blank=True, max_length=255)),
+                ('defect_type', models.CharField(blank=True, max_length=255)),
+                ('occurrences', models.IntegerField(default=0)),
+                ('critical', models.IntegerField(default=0)),
+                ('major', models.IntegerField(default=0)),
+                ('minor', models.IntegerField(default=0)),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='defect_type_rollups', to='users.template')),
+            ],
+            options={
+                'db_table': 'defect_type_daily_rollups',
+                'indexes': [models.Index(fields=['template', 'day'], name='defect_type_templat_42d46f_idx')],
+                'unique_together': {('day', 'template', 'inspector', 'site', 'defect_type')},
+            },
+        ),
+        migrations.CreateModel(
+            name='InspectionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('inspector', models.CharField(blank=True, max_length=255)),
+                ('site', models.CharField(blank=True, max_length=255)),
+                ('inspections', models.IntegerField(default=0)),
+                ('passed', models.IntegerField(default=0)),
+                ('failed', models.IntegerField(default=0)),
+                ('critical', models.IntegerField(default=0)),
+                ('major', models.IntegerField(default=0)),
+                ('minor', models.IntegerField(default=0)),
+                ('template', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inspection_rollups', to='users.template')),
+            ],
+            options={
+                'db_table': 'inspection_daily_rollups',
+                'indexes': [models.Index(fields=['template', 'day'], name='inspection__templat_74aca5_idx')],
+                'unique_together': {('day', 'template', 'inspector', 'site')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.6 on 2026-10-18 20:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0020_inspection_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(choices=[('templates_created', 'Templates created'), ('inspections_completed', 'Inspections completed'), ('pending_assignments', 'Pending assignments'), ('overdue_assignments', 'Overdue assignments')], max_length=40)),
+                ('value', models.IntegerField(default=0)),
+                ('valid_until', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_counters', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'dashboard_counters',
+                'constraints': [models.UniqueConstraint(fields=('user', 'name'), name='dashboard_counter_user_name'), models.UniqueConstraint(condition=models.Q(('user__isnull', True)), fields=('name',), name='dashboard_counter_global_name')],
+            },
+        ),
+    ]
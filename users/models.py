@@ -2,9 +2,11 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.contrib.postgres.fields import ArrayField
 from django.utils import timezone
-import uuid
 import os
 
+from .logo_renditions import build_logo_renditions
+from .storage import content_addressed_storage
+
 
 class CustomUser(AbstractUser):
     ROLE_CHOICES = [
@@ -47,7 +49,9 @@ class Template(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
-    logo = models.ImageField(upload_to='logos/', null=True, blank=True)
+    logo = models.ImageField(upload_to='logos/', storage=content_addressed_storage, null=True, blank=True)
+    # Content-hashed original/thumbnail/report paths built from `logo` on upload
+    logo_renditions = models.JSONField(default=dict, blank=True)
     template_type = models.CharField(max_length=20,choices=TEMPLATE_TYPE_CHOICES,default='standard')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -61,11 +65,24 @@ class Template(models.Model):
         self.last_published = timezone.now()
         self.save()
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # The logo file is only written during save(), so renditions follow it
+        if (self.logo.name or None) != (self.logo_renditions or {}).get('source'):
+            self.refresh_logo_renditions()
+
+    def refresh_logo_renditions(self):
+        """Rebuild the resized logo renditions without touching updated_at"""
+        self.logo_renditions = build_logo_renditions(self.logo) if self.logo else {}
+        Template.objects.filter(pk=self.pk).update(logo_renditions=self.logo_renditions)
+
     class Meta:
         db_table = 'templates'
         indexes = [
             models.Index(fields=['created_at']),
             models.Index(fields=['updated_at']),
+            # Keyset pagination of a user's templates on (updated_at, id)
+            models.Index(fields=['user', 'updated_at', 'id'], name='templates_user_updated_idx'),
         ]
 
 
@@ -178,11 +195,11 @@ class MediaAttachment(models.Model):
     ]
 
     def upload_to(instance, filename):
-        ext = filename.split('.')[-1]
-        return f'template_media/{uuid.uuid4()}.{ext}'
+        # The storage replaces the base name with the content hash
+        return f'template_media/{filename}'
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='media_attachments')
-    file = models.FileField(upload_to=upload_to)
+    file = models.FileField(upload_to=upload_to, storage=content_addressed_storage)
     file_type = models.CharField(max_length=20, choices=FILE_TYPE_CHOICES, default=IMAGE)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -198,9 +215,47 @@ class MediaAttachment(models.Model):
         ]
 
 
+class MediaBlob(models.Model):
+    """
+    A content-addressed file in media storage and how many rows reference it.
+    Counts are kept by users.media_blobs; blobs at zero are removed by the
+    gc_media_blobs command.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    size = models.BigIntegerField(default=0)
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} refs)"
+
+    class Meta:
+        db_table = 'media_blobs'
+        indexes = [
+            models.Index(fields=['ref_count', 'updated_at']),
+        ]
+
+
 class Response(models.Model):
     """Model to store actual responses to questions when templates are filled out"""
+    KIND_ANSWER = 'answer'
+    KIND_CONDITIONAL_ANSWER = 'conditional_answer'
+    KIND_EVIDENCE = 'evidence'
+    KIND_DISPLAY_MESSAGE = 'display_message'
+    KIND_CHOICES = [
+        (KIND_ANSWER, 'Answer'),
+        (KIND_CONDITIONAL_ANSWER, 'Conditional Answer'),
+        (KIND_EVIDENCE, 'Evidence'),
+        (KIND_DISPLAY_MESSAGE, 'Display Message'),
+    ]
+
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='responses')
+    # What the row holds: the answer to `question` or something a logic rule on
+    # it produced. `entry_key` is the key the client used for logic entries
+    # (e.g. "{question_id}_{rule_id}_conditional"); the value is in text_response.
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=KIND_ANSWER)
+    entry_key = models.CharField(max_length=255, blank=True, null=True)
 
     # Different types of responses stored in separate fields
     text_response = models.TextField(blank=True, null=True)
@@ -354,7 +409,8 @@ class PermissionAuditLog(models.Model):
         blank=True
     )
     action = models.CharField(max_length=20, choices=ACTION_CHOICES)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the event happens, not when the batched writer saves it
+    timestamp = models.DateTimeField(default=timezone.now)
     performed_by = models.ForeignKey(
         CustomUser,
         on_delete=models.CASCADE,
@@ -369,11 +425,14 @@ class PermissionAuditLog(models.Model):
     class Meta:
         verbose_name = "Permission Audit Log"
         verbose_name_plural = "Permission Audit Logs"
+        # The table is range-partitioned by month on timestamp (migration 0015,
+        # maintained by the archive_audit_logs command), so the primary key in
+        # the database is (id, timestamp).
         indexes = [
-            models.Index(fields=['user']),
-            models.Index(fields=['template']),
             models.Index(fields=['action']),
             models.Index(fields=['timestamp']),
+            models.Index(fields=['template', 'timestamp'], name='audit_template_ts_idx'),
+            models.Index(fields=['user', 'timestamp'], name='audit_user_ts_idx'),
         ]
 
     def __str__(self):
@@ -401,6 +460,10 @@ class Inspection(models.Model):
     # Garment inspection data stored as JSON
     garment_data = models.JSONField(blank=True, null=True)
 
+    # Client-generated key of the submission that created this inspection;
+    # a retried submit with the same key returns this inspection instead of a copy
+    submission_key = models.CharField(max_length=64, unique=True, blank=True, null=True)
+
     def __str__(self):
         return self.title
 
@@ -413,6 +476,133 @@ class Inspection(models.Model):
         ]
 
 
+class InspectionReportSnapshot(models.Model):
+    """
+    The fully assembled report of a completed inspection, written once when it
+    completes, so later template edits don't change it. Only a re-judged AQL
+    verdict (reevaluate_aql) is written into it afterwards.
+    Stored as gzip-compressed JSON; `etag` is the SHA-256 of the JSON.
+    """
+    inspection = models.OneToOneField(
+        Inspection, on_delete=models.CASCADE, primary_key=True, related_name='report_snapshot'
+    )
+    data = models.BinaryField()
+    etag = models.CharField(max_length=64)
+    size = models.PositiveIntegerField(help_text="Uncompressed size in bytes")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'inspection_report_snapshots'
+
+
+class GarmentQuantityLine(models.Model):
+    """
+    One color/size cell of an inspection's garment quantity grid, projected
+    from Inspection.garment_data (see garment_facts.py) so it can be queried.
+    """
+    inspection = models.ForeignKey(Inspection, on_delete=models.CASCADE, related_name='quantity_lines')
+    color = models.CharField(max_length=100)
+    size = models.CharField(max_length=50)
+    order_qty = models.IntegerField(default=0)
+    offered_qty = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'garment_quantity_lines'
+        indexes = [
+            models.Index(fields=['color', 'size']),
+        ]
+
+
+class GarmentDefectLine(models.Model):
+    """One entry of an inspection's garment defect list, projected from Inspection.garment_data"""
+    inspection = models.ForeignKey(Inspection, on_delete=models.CASCADE, related_name='defect_lines')
+    defect_type = models.CharField(max_length=255, blank=True)
+    remarks = models.TextField(blank=True)
+    critical = models.IntegerField(default=0)
+    major = models.IntegerField(default=0)
+    minor = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'garment_defect_lines'
+        indexes = [
+            models.Index(fields=['defect_type']),
+        ]
+
+
+class InspectionRollup(models.Model):
+    """
+    Completed-inspection counters per day, template, inspector and site,
+    incremented as inspections complete (see inspection_rollups.py).
+    """
+    day = models.DateField()
+    template = models.ForeignKey(Template, on_delete=models.CASCADE, related_name='inspection_rollups')
+    inspector = models.CharField(max_length=255, blank=True)
+    site = models.CharField(max_length=255, blank=True)
+    inspections = models.IntegerField(default=0)
+    passed = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    critical = models.IntegerField(default=0)
+    major = models.IntegerField(default=0)
+    minor = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'inspection_daily_rollups'
+        unique_together = ('day', 'template', 'inspector', 'site')
+        indexes = [
+            models.Index(fields=['template', 'day']),
+        ]
+
+
+class DefectTypeRollup(models.Model):
+    """Garment defect sums per defect type on the keys of InspectionRollup"""
+    day = models.DateField()
+    template = models.ForeignKey(Template, on_delete=models.CASCADE, related_name='defect_type_rollups')
+    inspector = models.CharField(max_length=255, blank=True)
+    site = models.CharField(max_length=255, blank=True)
+    defect_type = models.CharField(max_length=255, blank=True)
+    occurrences = models.IntegerField(default=0)
+    critical = models.IntegerField(default=0)
+    major = models.IntegerField(default=0)
+    minor = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'defect_type_daily_rollups'
+        unique_together = ('day', 'template', 'inspector', 'site', 'defect_type')
+        indexes = [
+            models.Index(fields=['template', 'day']),
+        ]
+
+
+class DashboardCounter(models.Model):
+    """
+    One dashboard count for a user, or for everyone when user is null, kept
+    current by signals (see dashboard_counters.py) so dashboards don't COUNT.
+    """
+    COUNTER_CHOICES = [
+        ('templates_created', 'Templates created'),
+        ('inspections_completed', 'Inspections completed'),
+        ('pending_assignments', 'Pending assignments'),
+        ('overdue_assignments', 'Overdue assignments'),
+    ]
+
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, null=True, blank=True, related_name='dashboard_counters'
+    )
+    name = models.CharField(max_length=40, choices=COUNTER_CHOICES)
+    value = models.IntegerField(default=0)
+    # Recounted once this passes (the next assignment due date, for overdue counts)
+    valid_until = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'dashboard_counters'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='dashboard_counter_user_name'),
+            models.UniqueConstraint(fields=['name'], condition=models.Q(user__isnull=True),
+                                    name='dashboard_counter_global_name'),
+        ]
+
+
 class InspectionResponse(models.Model):
     """Links responses to a specific inspection"""
     inspection = models.ForeignKey(Inspection, on_delete=models.CASCADE, related_name='inspection_responses')
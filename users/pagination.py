@@ -0,0 +1,97 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination:
+    """
+    Cursor pagination over a (timestamp, id) pair, newest first.
+
+    Each page is fetched with `WHERE (ts, id) < (cursor_ts, cursor_id)` instead of
+    an OFFSET, so page N costs the same as page 1 and rows inserted while a
+    client is paging never shift or duplicate results. The cursor is an opaque
+    base64 token holding the last row's timestamp and id.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, timestamp_field='updated_at', id_field='id', page_size=100, max_page_size=500):
+        self.timestamp_field = timestamp_field
+        self.id_field = id_field
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        self.request = None
+        self.next_cursor = None
+
+    def encode_cursor(self, timestamp, pk):
+        raw = json.dumps([timestamp.isoformat(), pk]).encode('utf-8')
+        return base64.urlsafe_b64encode(raw).decode('ascii')
+
+    def decode_cursor(self, cursor):
+        try:
+            timestamp, pk = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+            return datetime.fromisoformat(timestamp), int(pk)
+        except (ValueError, TypeError, UnicodeError):
+            raise ValidationError({"cursor": "Invalid cursor."})
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value is None:
+            return self.page_size
+        try:
+            page_size = int(value)
+        except ValueError:
+            raise ValidationError({self.page_size_query_param: "Must be an integer."})
+        if page_size < 1:
+            raise ValidationError({self.page_size_query_param: "Must be at least 1."})
+        return min(page_size, self.max_page_size)
+
+    def paginate_queryset(self, queryset, request):
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(f'-{self.timestamp_field}', f'-{self.id_field}')
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            timestamp, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(**{f'{self.timestamp_field}__lt': timestamp})
+                | Q(**{self.timestamp_field: timestamp, f'{self.id_field}__lt': pk})
+            )
+
+        # Fetch one extra row to know whether there is a next page
+        page = list(queryset[:page_size + 1])
+        if len(page) > page_size:
+            page = page[:page_size]
+            last = page[-1]
+            self.next_cursor = self.encode_cursor(
+                getattr(last, self.timestamp_field), getattr(last, self.id_field)
+            )
+        else:
+            self.next_cursor = None
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def add_link_header(self, response):
+        """Advertise the next page on a plain list response (RFC 8288 Link header)"""
+        next_link = self.get_next_link()
+        if next_link:
+            response['Link'] = f'<{next_link}>; rel="next"'
+        return response
@@ -0,0 +1,294 @@
+import io
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import mm
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .inspection_report import build_inspection_report
+from .models import InspectionReportSnapshot
+from .report_snapshots import decode_report
+
+
+# Rendered PDFs are kept in storage under the inspection's updated_at, so a
+# changed inspection gets a fresh file and an unchanged one is never re-rendered.
+PDF_CACHE_ROOT = 'reports/pdf'
+
+TABLE_STYLE = TableStyle([
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#f1f5f9')),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+])
+
+
+# -- rendering (runs in worker processes: plain dict in, bytes out) ----------
+
+def _number(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _text(value):
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        return ', '.join(str(item) for item in value)
+    return str(value)
+
+
+def _garment_section(report):
+    for section in report['template']['sections']:
+        if section.get('type') == 'garmentDetails':
+            return section
+    return None
+
+
+def _quantity_table(garment_data, content):
+    sizes = content.get('sizes') or []
+    color_names = content.get('colors') or []
+    quantities = garment_data.get('quantities') or {}
+    if not sizes or not color_names:
+        return None
+
+    rows = [['Color/Size'] + [f'{size} {label}' for size in sizes for label in ('Order', 'Offered')]
+            + ['Total Order', 'Total Offered']]
+    column_totals = [0] * (len(sizes) * 2)
+    for color in color_names:
+        cells = []
+        for size in sizes:
+            entry = (quantities.get(color) or {}).get(size) or {}
+            cells += [_number(entry.get('orderQty')), _number(entry.get('offeredQty'))]
+        column_totals = [total + cell for total, cell in zip(column_totals, cells)]
+        rows.append([color] + cells + [sum(cells[0::2]), sum(cells[1::2])])
+    rows.append(['Total'] + column_totals + [sum(column_totals[0::2]), sum(column_totals[1::2])])
+    return rows
+
+
+def _defect_table(garment_data, styles):
+    defects = garment_data.get('defects') or []
+    if not defects:
+        return None
+    rows = [['Defect', 'Remarks', 'Critical', 'Major', 'Minor']]
+    totals = [0, 0, 0]
+    for defect in defects:
+        counts = [_number(defect.get(kind)) for kind in ('critical', 'major', 'minor')]
+        totals = [total + count for total, count in zip(totals, counts)]
+        rows.append([_text(defect.get('type')), Paragraph(escape(_text(defect.get('remarks'))), styles['BodyText'])]
+                    + counts)
+    rows.append(['Total', ''] + totals)
+    return rows
+
+
+def render_report_pdf(report):
+    """Render an assembled inspection report (see build_inspection_report) to PDF bytes"""
+    styles = getSampleStyleSheet()
+    inspection = report['inspection']
+    template = report['template']
+    answers = report.get('answers') or {}
+    story = [
+        Paragraph(escape(inspection['title']), styles['Title']),
+        Paragraph(escape(f"Template: {template['title']}"), styles['Normal']),
+        Paragraph(escape(f"Conducted by: {_text(inspection.get('conducted_by'))}"), styles['Normal']),
+        Paragraph(escape(f"Conducted at: {inspection['conducted_at']}"), styles['Normal']),
+        Paragraph(escape(f"Status: {inspection['status']}"), styles['Normal']),
+        Spacer(1, 6 * mm),
+    ]
+
+    verdict = report.get('aql_verdict')
+    if verdict:
+        story.append(Paragraph('AQL Result', styles['Heading2']))
+        story.append(Table([
+            ['Result', 'AQL Level', 'Inspection Level', 'Lot Size', 'Code Letter', 'Sample Size', 'Accept', 'Reject'],
+            [_text(verdict.get(key)) for key in ('status', 'aqlLevel', 'inspectionLevel', 'lotSize', 'codeLetter',
+                                                  'sampleSize', 'accept', 'reject')],
+        ], style=TABLE_STYLE, hAlign='LEFT'))
+
+    garment_data = report.get('garment_data') or {}
+    garment_section = _garment_section(report)
+    if garment_data and garment_section:
+        quantity_rows = _quantity_table(garment_data, garment_section.get('content') or {})
+        if quantity_rows:
+            story += [Paragraph('Quantity Breakdown', styles['Heading2']),
+                      Table(quantity_rows, style=TABLE_STYLE, hAlign='LEFT', repeatRows=1)]
+        story.append(Paragraph(escape(
+            f"Cartons offered: {_text(garment_data.get('cartonOffered'))}   "
+            f"to inspect: {_text(garment_data.get('cartonToInspect'))}   "
+            f"inspected: {_text(garment_data.get('cartonInspected'))}"
+        ), styles['Normal']))
+        defect_rows = _defect_table(garment_data, styles)
+        if defect_rows:
+            story += [Paragraph('Defects', styles['Heading2']),
+                      Table(defect_rows, style=TABLE_STYLE, hAlign='LEFT', repeatRows=1,
+                            colWidths=[35 * mm, 85 * mm, 18 * mm, 18 * mm, 18 * mm])]
+
+    conditional_answers = report.get('conditional_answers') or {}
+    display_messages = report.get('display_messages') or {}
+    for section in template['sections']:
+        rows = [['Question', 'Response']]
+        for question in section['questions']:
+            question_id = str(question['id'])
+            if question_id not in answers:
+                continue
+            response = escape(_text(answers[question_id]))
+            follow_ups = [escape(_text(value)) for key, value in conditional_answers.items()
+                          if key.startswith(f'{question_id}_')]
+            if follow_ups:
+                response += '<br/>' + '<br/>'.join(f'Follow-up: {value}' for value in follow_ups)
+            if display_messages.get(question_id):
+                response += f"<br/><i>{escape(_text(display_messages[question_id]))}</i>"
+            rows.append([Paragraph(escape(question['text']), styles['BodyText']),
+                         Paragraph(response, styles['BodyText'])])
+        if len(rows) > 1:
+            story += [Paragraph(escape(section['title']), styles['Heading2']),
+                      Table(rows, style=TABLE_STYLE, hAlign='LEFT', repeatRows=1, colWidths=[80 * mm, 95 * mm])]
+
+    buffer = io.BytesIO()
+    document = SimpleDocTemplate(buffer, pagesize=A4, title=inspection['title'],
+                                 leftMargin=15 * mm, rightMargin=15 * mm, topMargin=15 * mm, bottomMargin=15 * mm)
+    document.build(story)
+    return buffer.getvalue()
+
+
+# -- worker pool --------------------------------------------------------------
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _worker_count():
+    return getattr(settings, 'REPORT_PDF_WORKERS', 2)
+
+
+def render_pool():
+    """
+    Process pool for rendering (reportlab is CPU-bound pure Python, so threads
+    would serialize on the GIL). Created lazily per process; None means render
+    inline (REPORT_PDF_WORKERS = 0).
+    """
+    global _pool, _pool_pid
+    if _worker_count() <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(max_workers=_worker_count())
+            _pool_pid = os.getpid()
+        return _pool
+
+
+# -- cache ----------------------------------------------------------------------
+
+def cache_name(inspection):
+    return f'{PDF_CACHE_ROOT}/{inspection.id}/{inspection.updated_at.strftime("%Y%m%dT%H%M%S%f")}.pdf'
+
+
+def _read_cached(name):
+    if not default_storage.exists(name):
+        return None
+    with default_storage.open(name, 'rb') as cached:
+        return cached.read()
+
+
+def _store(name, pdf):
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(pdf))
+
+
+def report_data(inspection):
+    """The snapshot of a completed inspection, the live report otherwise"""
+    snapshot = InspectionReportSnapshot.objects.filter(inspection=inspection).first()
+    if snapshot is not None:
+        return decode_report(snapshot)
+    return build_inspection_report(inspection)
+
+
+def inspection_pdf(inspection):
+    """PDF bytes for one inspection, rendered at most once per updated_at"""
+    name = cache_name(inspection)
+    pdf = _read_cached(name)
+    if pdf is None:
+        pool = render_pool()
+        report = report_data(inspection)
+        pdf = pool.submit(render_report_pdf, report).result() if pool else render_report_pdf(report)
+        _store(name, pdf)
+    return pdf
+
+
+def iter_inspection_pdfs(inspections):
+    """
+    Yield (inspection, pdf bytes) in order. Uncached reports are rendered on the
+    pool with a bounded look-ahead, so memory stays flat for large batches.
+    """
+    pool = render_pool()
+    window = max(_worker_count(), 1) * 2
+    pending = []
+
+    def start(inspection):
+        name = cache_name(inspection)
+        pdf = _read_cached(name)
+        if pdf is not None or pool is None:
+            return inspection, name, pdf, None
+        return inspection, name, None, pool.submit(render_report_pdf, report_data(inspection))
+
+    for inspection in inspections:
+        pending.append(start(inspection))
+        if len(pending) >= window:
+            yield _finish(*pending.pop(0))
+    while pending:
+        yield _finish(*pending.pop(0))
+
+
+def _finish(inspection, name, pdf, future):
+    if pdf is None:
+        pdf = future.result() if future is not None else render_report_pdf(report_data(inspection))
+        _store(name, pdf)
+    return inspection, pdf
+
+
+# -- streaming ZIP ------------------------------------------------------------
+
+class _ZipStream:
+    """Write-only file object whose contents are handed out as they are written"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def pdf_filename(inspection):
+    return f'inspection_{inspection.id}.pdf'
+
+
+def stream_pdf_zip(inspections):
+    """Yield a ZIP archive of the inspections' PDFs chunk by chunk, one report at a time"""
+    stream = _ZipStream()
+    # PDFs are compressed already; deflating them again only costs CPU
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for inspection, pdf in iter_inspection_pdfs(inspections):
+            info = zipfile.ZipInfo(pdf_filename(inspection), date_time=inspection.updated_at.timetuple()[:6])
+            archive.writestr(info, pdf)
+            yield stream.take()
+    yield stream.take()
@@ -0,0 +1,93 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from .models import Template, TemplateAccess, GranularPermission, TemplateAssignment
+
+
+# Resolved permissions are shared between requests for this long at most
+PERMISSION_CACHE_TIMEOUT = 300
+
+# Version counters must outlive the entries they guard
+VERSION_TIMEOUT = None
+
+
+def _version_key(template_id):
+    return f'perm:version:{template_id}'
+
+
+def template_version(template_id):
+    """
+    Current permission version of a template. Entries are keyed by it, so a
+    bump makes every cached entry for the template unreachable. A missing
+    counter (first use or evicted) restarts from the clock rather than zero so
+    an old entry can never match again.
+    """
+    key = _version_key(template_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), VERSION_TIMEOUT)
+        version = cache.get(key)
+    return version
+
+
+def bump_template_version(template_id):
+    _bump(template_id)
+    # Bump again once the change is visible to other connections, so an entry
+    # cached from the pre-commit state in between is dropped as well
+    transaction.on_commit(lambda: _bump(template_id))
+
+
+def _bump(template_id):
+    key = _version_key(template_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # No counter yet; anything cached was stored under an older clock value
+        cache.set(key, int(time.time() * 1000), VERSION_TIMEOUT)
+
+
+def entry_key(user_id, template_id, version):
+    return f'perm:{template_id}:{version}:{user_id}'
+
+
+def get_cached(user_id, template_id):
+    """Returns (cached dict or None, key to store a fresh value under)"""
+    # Read the version before the database: a revoke landing mid-load bumps it,
+    # and the stale value we then store is already unreachable.
+    key = entry_key(user_id, template_id, template_version(template_id))
+    return cache.get(key), key
+
+
+def store(key, value):
+    cache.set(key, value, PERMISSION_CACHE_TIMEOUT)
+
+
+def _template_changed(sender, instance, **kwargs):
+    # Covers ownership (Template.user) changes as well as creates and deletes
+    bump_template_version(instance.pk)
+
+
+def _access_changed(sender, instance, **kwargs):
+    bump_template_version(instance.template_id)
+
+
+def _granular_permission_changed(sender, instance, **kwargs):
+    template_id = TemplateAccess.objects.filter(pk=instance.template_access_id).values_list(
+        'template_id', flat=True
+    ).first()
+    if template_id is not None:
+        bump_template_version(template_id)
+
+
+def connect_signals():
+    for model, receiver in [
+        (Template, _template_changed),
+        (TemplateAccess, _access_changed),
+        (TemplateAssignment, _access_changed),
+        (GranularPermission, _granular_permission_changed),
+    ]:
+        post_save.connect(receiver, sender=model, dispatch_uid=f'permission_cache_save_{model.__name__}')
+        post_delete.connect(receiver, sender=model, dispatch_uid=f'permission_cache_delete_{model.__name__}')
@@ -0,0 +1,145 @@
+from dataclasses import dataclass, field
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from . import permission_cache
+from .models import Template, TemplateAccess, GranularPermission, TemplateAssignment
+
+
+PERMISSION_HIERARCHY = {
+    'owner': 4,
+    'admin': 3,
+    'editor': 2,
+    'viewer': 1,
+}
+
+
+@dataclass
+class EffectivePermissions:
+    """Everything that decides what a user may do with one template"""
+    template_id: int
+    exists: bool = False
+    owner_id: int = None
+    user_id: int = None
+    role: str = None
+    assignment_statuses: frozenset = field(default_factory=frozenset)
+    access_id: int = None
+    access_level: str = None
+    codenames: frozenset = field(default_factory=frozenset)
+
+    @property
+    def is_owner(self):
+        return self.exists and self.owner_id == self.user_id
+
+    @property
+    def has_access(self):
+        return self.access_id is not None
+
+    def has_assignment(self, statuses=('assigned', 'in_progress', 'completed')):
+        return not self.assignment_statuses.isdisjoint(statuses)
+
+    def has_level(self, required_level):
+        """Whether the TemplateAccess level is at least `required_level`"""
+        user_level = PERMISSION_HIERARCHY.get(self.access_level, 0)
+        return user_level >= PERMISSION_HIERARCHY.get(required_level, 0)
+
+    def has_codename(self, codename):
+        return codename in self.codenames
+
+
+class PermissionResolver:
+    """
+    Loads a user's effective permissions for a template in a single query and
+    remembers them, so every check made while handling one request (middleware,
+    permission classes, view body) shares the same lookup. Across requests the
+    query result is shared through users.permission_cache.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._resolved = {}
+        self._recorded_access = set()
+
+    def resolve(self, template_id):
+        template_id = int(template_id)
+        if template_id not in self._resolved:
+            self._resolved[template_id] = self._load(template_id)
+        return self._resolved[template_id]
+
+    def _load(self, template_id):
+        cached, cache_key = permission_cache.get_cached(self.user.pk, template_id)
+        if cached is None:
+            cached = self._query(template_id)
+            permission_cache.store(cache_key, cached)
+
+        if not cached['exists']:
+            return EffectivePermissions(template_id=template_id, user_id=self.user.pk, role=self.user.user_role)
+
+        # The role always comes from the current user object, never the cache
+        return EffectivePermissions(
+            template_id=template_id,
+            exists=True,
+            owner_id=cached['owner_id'],
+            user_id=self.user.pk,
+            role=self.user.user_role,
+            assignment_statuses=frozenset(cached['assignment_statuses']),
+            access_id=cached['access_id'],
+            access_level=cached['access_level'],
+            codenames=frozenset(cached['codenames']),
+        )
+
+    def _query(self, template_id):
+        """One query for everything template-specific; returns a cacheable dict"""
+        user = self.user
+        active_access = TemplateAccess.objects.filter(template=OuterRef('pk'), user=user, status='active')
+
+        row = Template.objects.filter(pk=template_id).values('user_id').annotate(
+            access_id=Subquery(active_access.values('id')[:1]),
+            access_level=Subquery(active_access.values('permission_level')[:1]),
+            assignment_statuses=ArraySubquery(
+                TemplateAssignment.objects.filter(template=OuterRef('pk'), inspector=user).values('status')
+            ),
+            codenames=ArraySubquery(
+                GranularPermission.objects.filter(
+                    template_access__template=OuterRef('pk'),
+                    template_access__user=user,
+                    template_access__status='active',
+                ).values('permission_type__codename')
+            ),
+        ).first()
+
+        if row is None:
+            return {'exists': False}
+
+        return {
+            'exists': True,
+            'owner_id': row['user_id'],
+            'assignment_statuses': list(row['assignment_statuses']),
+            'access_id': row['access_id'],
+            'access_level': row['access_level'],
+            'codenames': list(row['codenames']),
+        }
+
+    def record_access(self, permissions):
+        """Stamp TemplateAccess.last_accessed, at most once per template per request"""
+        if not permissions.has_access or permissions.access_id in self._recorded_access:
+            return
+        self._recorded_access.add(permissions.access_id)
+        TemplateAccess.objects.filter(pk=permissions.access_id).update(last_accessed=timezone.now())
+
+
+def get_permission_resolver(request, user=None):
+    """
+    The resolver memoized on the request. DRF's Request wraps the Django
+    HttpRequest, so the memo is kept on the underlying HttpRequest and shared
+    between middleware and views.
+    """
+    http_request = getattr(request, '_request', request)
+    user = user or request.user
+    resolver = getattr(http_request, '_permission_resolver', None)
+    if resolver is None or resolver.user.pk != user.pk:
+        resolver = PermissionResolver(user)
+        http_request._permission_resolver = resolver
+    return resolver
@@ -1,6 +1,6 @@
 from rest_framework import permissions
-from django.shortcuts import get_object_or_404
-from .models import Template, TemplateAccess, GranularPermission, PermissionType, TemplateAssignment
+from .models import Template
+from .permission_resolver import PermissionResolver, get_permission_resolver
 
 
 class IsTemplateOwner(permissions.BasePermission):
@@ -11,74 +11,65 @@ class IsTemplateOwner(permissions.BasePermission):
     def has_object_permission(self, request, view, obj):
         # Check if the object is a Template
         if isinstance(obj, Template):
-            return obj.user == request.user
+            return obj.user_id == request.user.id
 
         # If the object has a template attribute, check if the user is the owner
         if hasattr(obj, 'template'):
-            return obj.template.user == request.user
+            return get_permission_resolver(request).resolve(obj.template_id).is_owner
 
         return False
 
 
+def _template_id(obj):
+    """The template a permission check is about, or None"""
+    if isinstance(obj, Template):
+        return obj.pk
+    if hasattr(obj, 'template_id'):
+        return obj.template_id
+    return None
+
+
 class HasTemplateAccess(permissions.BasePermission):
     """
     Custom permission to allow access based on the user's permission level for a template.
     """
 
     def has_object_permission(self, request, view, obj):
-        # Get the template object
-        template = None
-        if isinstance(obj, Template):
-            template = obj
-        elif hasattr(obj, 'template'):
-            template = obj.template
-        else:
+        template_id = _template_id(obj)
+        if template_id is None:
             return False
 
+        resolver = get_permission_resolver(request)
+        perms = resolver.resolve(template_id)
+
         # Check if user is the template owner
-        if template.user == request.user:
+        if perms.is_owner:
             return True
 
         # Check if user is an inspector assigned to this template
-        if request.user.user_role == 'inspector':
-            assignment_exists = TemplateAssignment.objects.filter(
-                template=template,
-                inspector=request.user,
-                status__in=['assigned', 'in_progress']
-            ).exists()
-
-            if assignment_exists:
-                # Inspectors can only view and update (not delete) assigned templates
-                if request.method in permissions.SAFE_METHODS or request.method in ['PUT', 'PATCH']:
-                    return True
-                return False
+        if perms.role == 'inspector' and perms.has_assignment(('assigned', 'in_progress')):
+            # Inspectors can only view and update (not delete) assigned templates
+            return request.method in permissions.SAFE_METHODS or request.method in ['PUT', 'PATCH']
 
         # Check if user has access through TemplateAccess
-        try:
-            access = TemplateAccess.objects.get(
-                template=template,
-                user=request.user,
-                status='active'
-            )
-
-            # Record this access
-            access.record_access()
+        if not perms.has_access:
+            return False
 
-            # For safe methods (GET, HEAD, OPTIONS), any access level is sufficient
-            if request.method in permissions.SAFE_METHODS:
-                return True
+        # Record this access
+        resolver.record_access(perms)
 
-            # For unsafe methods, check permission level
-            if request.method in ['PUT', 'PATCH']:
-                return access.permission_level in ['owner', 'admin', 'editor']
+        # For safe methods (GET, HEAD, OPTIONS), any access level is sufficient
+        if request.method in permissions.SAFE_METHODS:
+            return True
 
-            if request.method == 'DELETE':
-                return access.permission_level in ['owner', 'admin']
+        # For unsafe methods, check permission level
+        if request.method in ['PUT', 'PATCH']:
+            return perms.access_level in ['owner', 'admin', 'editor']
 
-            return False
+        if request.method == 'DELETE':
+            return perms.access_level in ['owner', 'admin']
 
-        except TemplateAccess.DoesNotExist:
-            return False
+        return False
 
 
 class HasGranularPermission(permissions.BasePermission):
@@ -91,48 +82,27 @@ class HasGranularPermission(permissions.BasePermission):
         super().__init__()
 
     def has_object_permission(self, request, view, obj):
-        # Get the template object
-        template = None
-        if isinstance(obj, Template):
-            template = obj
-        elif hasattr(obj, 'template'):
-            template = obj.template
-        else:
+        template_id = _template_id(obj)
+        if template_id is None:
             return False
 
+        perms = get_permission_resolver(request).resolve(template_id)
+
         # Check if user is the template owner (owners have all permissions)
-        if template.user == request.user:
+        if perms.is_owner:
             return True
 
-        # Check if user has admin access (admins have all permissions)
-        try:
-            access = TemplateAccess.objects.get(
-                template=template,
-                user=request.user,
-                status='active'
-            )
-
-            if access.permission_level in ['owner', 'admin']:
-                return True
-
-            # For other permission levels, check granular permissions
-            try:
-                permission_type = PermissionType.objects.get(codename=self.required_permission_codename)
-                has_permission = GranularPermission.objects.filter(
-                    template_access=access,
-                    permission_type=permission_type
-                ).exists()
-
-                return has_permission
+        if not perms.has_access:
+            return False
 
-            except PermissionType.DoesNotExist:
-                return False
+        # Admin access includes every granular permission
+        if perms.access_level in ['owner', 'admin']:
+            return True
 
-        except TemplateAccess.DoesNotExist:
-            return False
+        return perms.has_codename(self.required_permission_codename)
 
 
-def has_template_permission(user, template_id, required_level=None, permission_codename=None):
+def has_template_permission(user, template_id, required_level=None, permission_codename=None, request=None):
     """
     Utility function to check if a user has the required permission level or granular permission
     for a template. This can be used in views or other functions.
@@ -142,98 +112,64 @@ def has_template_permission(user, template_id, required_level=None, permission_c
         template_id: The ID of the template
         required_level: The minimum required permission level (owner, admin, editor, viewer)
         permission_codename: A specific granular permission codename to check
+        request: When given, the permissions are resolved once and memoized on the request
 
     Returns:
         bool: True if the user has the required permission, False otherwise
     """
     print(f"🔍 has_template_permission: user={user}, template_id={template_id}, required_level={required_level}")
 
-    try:
-        template = Template.objects.get(id=template_id)
-        print(f"🔍 Template found: {template.title}")
+    if request is not None:
+        resolver = get_permission_resolver(request, user)
+    else:
+        resolver = PermissionResolver(user)
+    perms = resolver.resolve(template_id)
 
-        # Check if user is the template owner
-        if template.user == user:
-            print(f"🔍 User is template owner, granting access")
-            return True
+    if not perms.exists:
+        print(f"🔍 Template {template_id} does not exist")
+        return False
 
-        # Check if user is admin - admin users have access to all templates
-        if user.user_role == 'admin':
-            print(f"🔍 User is admin, granting access to all templates")
+    # Check if user is the template owner
+    if perms.is_owner:
+        print(f"🔍 User is template owner, granting access")
+        return True
+
+    # Check if user is admin - admin users have access to all templates
+    if perms.role == 'admin':
+        print(f"🔍 User is admin, granting access to all templates")
+        return True
+
+    # Check if user is an inspector with an assignment for this template
+    if perms.role == 'inspector' and perms.has_assignment():
+        # For inspectors with assignments, they have at least viewer access
+        if required_level in ['viewer', None]:
+            print(f"🔍 Inspector has assignment and required level is viewer/None, granting access")
             return True
+        # Inspectors can't have higher permissions through assignments
+        print(f"🔍 Inspector has assignment but required level ({required_level}) is higher than viewer")
+        return False
 
-        # Check if user is an inspector with an assignment for this template
-        if user.user_role == 'inspector':
-            print(f"🔍 User is inspector, checking assignments...")
-            assignment_exists = TemplateAssignment.objects.filter(
-                template=template,
-                inspector=user,
-                status__in=['assigned', 'in_progress', 'completed']
-            ).exists()
-
-            print(f"🔍 Assignment exists: {assignment_exists}")
-
-            if assignment_exists:
-                # For inspectors with assignments, they have at least viewer access
-                if required_level in ['viewer', None]:
-                    print(f"🔍 Inspector has assignment and required level is viewer/None, granting access")
-                    return True
-                # Inspectors can't have higher permissions through assignments
-                print(f"🔍 Inspector has assignment but required level ({required_level}) is higher than viewer")
-                return False
+    # Check if user has access through TemplateAccess
+    if not perms.has_access:
+        print(f"🔍 No TemplateAccess found for user")
+        return False
 
-        # Check if user has access through TemplateAccess
-        try:
-            access = TemplateAccess.objects.get(
-                template=template,
-                user=user,
-                status='active'
-            )
-
-            # Record this access
-            access.record_access()
-
-            # Check permission level if required
-            if required_level:
-                permission_hierarchy = {
-                    'owner': 4,
-                    'admin': 3,
-                    'editor': 2,
-                    'viewer': 1
-                }
-
-                user_level = permission_hierarchy.get(access.permission_level, 0)
-                required_level_value = permission_hierarchy.get(required_level, 0)
-
-                if user_level >= required_level_value:
-                    return True
-            else:
-                # If no specific level is required, any access is sufficient
-                return True
-
-            # Check granular permission if required
-            if permission_codename:
-                try:
-                    permission_type = PermissionType.objects.get(codename=permission_codename)
-                    has_permission = GranularPermission.objects.filter(
-                        template_access=access,
-                        permission_type=permission_type
-                    ).exists()
-
-                    return has_permission
-
-                except PermissionType.DoesNotExist:
-                    return False
+    # Record this access
+    resolver.record_access(perms)
 
-            return False
+    # Check permission level if required
+    if required_level:
+        if perms.has_level(required_level):
+            return True
+    else:
+        # If no specific level is required, any access is sufficient
+        return True
 
-        except TemplateAccess.DoesNotExist:
-            print(f"🔍 No TemplateAccess found for user")
-            return False
+    # Check granular permission if required
+    if permission_codename:
+        return perms.has_codename(permission_codename)
 
-    except Template.DoesNotExist:
-        print(f"🔍 Template {template_id} does not exist")
-        return False
+    return False
 
 
 class IsAdmin(permissions.BasePermission):
@@ -260,13 +196,8 @@ class IsAssignedInspector(permissions.BasePermission):
     """
 
     def has_object_permission(self, request, view, obj):
-        # Get the template object
-        template = None
-        if isinstance(obj, Template):
-            template = obj
-        elif hasattr(obj, 'template'):
-            template = obj.template
-        else:
+        template_id = _template_id(obj)
+        if template_id is None:
             return False
 
         # Check if user is an inspector
@@ -274,11 +205,7 @@ class IsAssignedInspector(permissions.BasePermission):
             return False
 
         # Check if user is assigned to this template
-        return TemplateAssignment.objects.filter(
-            template=template,
-            inspector=request.user,
-            status__in=['assigned', 'in_progress']
-        ).exists()
+        return get_permission_resolver(request).resolve(template_id).has_assignment(('assigned', 'in_progress'))
 
 
 class CanManageAssignments(permissions.BasePermission):
@@ -297,6 +224,6 @@ class CanManageAssignments(permissions.BasePermission):
 
         # For template owners, check if they own the template
         if hasattr(obj, 'template'):
-            return obj.template.user == request.user
+            return get_permission_resolver(request).resolve(obj.template_id).is_owner
 
         return False
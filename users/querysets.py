@@ -0,0 +1,71 @@
+from django.db.models import Count, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Template, Section, Question, QuestionOption, TemplateAccess
+
+
+def plan_template_queryset(queryset=None):
+    """
+    Attach everything TemplateSerializer reads so that serializing any number of
+    templates costs a constant number of queries: the owner is joined, the
+    section -> question -> option tree is prefetched one level per query and the
+    number of access grants is annotated as `access_count`.
+    """
+    if queryset is None:
+        queryset = Template.objects.all()
+
+    return queryset.select_related('user').annotate(
+        access_count=Count('access_permissions', distinct=True)
+    ).prefetch_related(template_tree_prefetch())
+
+
+def template_tree_prefetch():
+    """The ordered section -> question -> option tree, one query per level"""
+    return Prefetch(
+        'sections',
+        queryset=Section.objects.order_by('order', 'id').prefetch_related(
+            Prefetch(
+                'questions',
+                queryset=Question.objects.order_by('order', 'id').prefetch_related(
+                    Prefetch('options', queryset=QuestionOption.objects.order_by('order', 'id'))
+                )
+            )
+        )
+    )
+
+
+def _count_subquery(queryset, template_lookup):
+    """Correlated COUNT(*) of `queryset` rows belonging to the outer template"""
+    counts = queryset.filter(**{template_lookup: OuterRef('pk')}).order_by().values(
+        template_lookup
+    ).annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def plan_template_summary_queryset(queryset=None):
+    """
+    Queryset for list views that only show a template's headline data. Nothing
+    below the template is fetched; section, question and access counts are
+    computed in the database as `section_count`, `question_count` and
+    `access_count`. Correlated subqueries are used instead of joins so the
+    counts don't multiply each other.
+    """
+    if queryset is None:
+        queryset = Template.objects.all()
+
+    return queryset.select_related('user').only(
+        'id', 'title', 'template_type', 'logo', 'logo_renditions', 'created_at', 'updated_at', 'user__email'
+    ).annotate(
+        section_count=_count_subquery(Section.objects.all(), 'template'),
+        question_count=_count_subquery(Question.objects.all(), 'section__template'),
+        access_count=_count_subquery(TemplateAccess.objects.all(), 'template'),
+    )
+
+
+def shared_template_queryset(user):
+    """Templates shared with the user through an active TemplateAccess grant"""
+    # Filter through a subquery so the access_count annotation still counts
+    # every grant on the template, not just the user's own.
+    return Template.objects.filter(
+        id__in=user.template_accesses.filter(status='active').values('template_id')
+    )
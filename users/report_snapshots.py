@@ -0,0 +1,121 @@
+import gzip
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .inspection_report import build_inspection_report
+from .logo_renditions import logo_name, stored_logo_url
+from .models import InspectionReportSnapshot
+
+
+def encode_report(report):
+    """Compact JSON, its gzip (fixed mtime, so equal reports give equal bytes) and its ETag"""
+    raw = json.dumps(report, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8')
+    return gzip.compress(raw, mtime=0), hashlib.sha256(raw).hexdigest(), len(raw)
+
+
+def decode_report(snapshot):
+    return json.loads(gzip.decompress(bytes(snapshot.data)))
+
+
+def freeze_report(inspection):
+    """Write the snapshot of an inspection that was just completed in this transaction"""
+    report = build_inspection_report(inspection)
+    # The host a report is viewed from isn't known yet: store the logo's
+    # storage name and build its URL when the snapshot is served
+    report['template']['logo'] = logo_name(inspection.template, 'report')
+    data, etag, size = encode_report(report)
+    return InspectionReportSnapshot.objects.create(inspection=inspection, data=data, etag=etag, size=size)
+
+
+def write_report_snapshot(inspection):
+    """
+    Freeze the report of a completed inspection. Snapshots are immutable: if
+    one exists already it is returned unchanged.
+    """
+    existing = InspectionReportSnapshot.objects.filter(inspection=inspection).first()
+    if existing is not None:
+        return existing
+    try:
+        with transaction.atomic():
+            return freeze_report(inspection)
+    except IntegrityError:
+        # Written concurrently by another request; theirs is just as good
+        return InspectionReportSnapshot.objects.get(inspection=inspection)
+
+
+def rewrite_verdicts(rejudged):
+    """
+    Put re-judged garment data into the frozen reports of [(inspection, verdict)].
+    Only garment_data, aql_verdict and the inspection's updated_at change; the
+    rest of each report stays as it was frozen. Returns the number rewritten.
+    """
+    by_id = {inspection.id: (inspection, verdict) for inspection, verdict in rejudged}
+    snapshots = list(InspectionReportSnapshot.objects.filter(inspection_id__in=by_id))
+    for snapshot in snapshots:
+        inspection, verdict = by_id[snapshot.inspection_id]
+        report = decode_report(snapshot)
+        report['garment_data'] = inspection.garment_data
+        report['aql_verdict'] = verdict
+        report['inspection']['updated_at'] = inspection.updated_at.isoformat()
+        snapshot.data, snapshot.etag, snapshot.size = encode_report(report)
+    InspectionReportSnapshot.objects.bulk_update(snapshots, ['data', 'etag', 'size'])
+    return len(snapshots)
+
+
+def quoted_etag(etag):
+    return f'"{etag}"'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match', '')
+    candidates = {value.strip().removeprefix('W/') for value in header.split(',')}
+    return '*' in candidates or quoted_etag(etag) in candidates
+
+
+def not_modified_response(etag):
+    response = HttpResponse(status=304)
+    response['ETag'] = quoted_etag(etag)
+    return response
+
+
+def _with_logo_url(request, raw):
+    """
+    The report JSON with its stored logo name turned into an absolute URL for
+    this request, or None when there is no logo name to turn
+    """
+    report = json.loads(raw)
+    name = report['template'].get('logo')
+    # Snapshots frozen before logos were stored by name hold the URL itself
+    if not name or '://' in name or name.startswith('/'):
+        return None
+    report['template']['logo'] = stored_logo_url(name, request)
+    return json.dumps(report, cls=DjangoJSONEncoder, separators=(',', ':')).encode('utf-8')
+
+
+def snapshot_response(request, snapshot):
+    """
+    Serve a snapshot: the gzip bytes go out as stored to clients that accept
+    gzip, everyone else gets them decompressed. Only reports with a logo are
+    re-encoded, to put in its URL.
+    """
+    compressed = bytes(snapshot.data)
+    raw = gzip.decompress(compressed)
+    resolved = _with_logo_url(request, raw)
+    if resolved is not None:
+        raw = resolved
+        compressed = gzip.compress(raw, mtime=0)
+    if 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = HttpResponse(compressed, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(raw, content_type='application/json')
+    response['ETag'] = quoted_etag(snapshot.etag)
+    # Completed reports never change, but the browser must still ask (cheaply) each time
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
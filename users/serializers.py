@@ -5,6 +5,7 @@ from .models import (
     PermissionType, GranularPermission, PermissionAuditLog,
     TemplateAssignment, Inspection, Response, InspectionResponse
 )
+from .logo_renditions import logo_url, logo_urls, logo_data_uri, wants_inline_logo
 from django.core.files.base import ContentFile
 import base64
 from rest_framework.views import APIView
@@ -141,16 +142,12 @@ class BasicTemplateSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         representation = super().to_representation(instance)
 
-        # Include base64 encoded image in response
-        if instance.logo:
-            try:
-                with instance.logo.open('rb') as image_file:
-                    encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-                    representation['logo'] = f"data:image/png;base64,{encoded_string}"
-            except Exception:
-                representation['logo'] = None
+        # Logo as a URL; the inline base64 form only when explicitly requested
+        request = self.context.get('request')
+        if wants_inline_logo(request):
+            representation['logo'] = logo_data_uri(instance)
         else:
-            representation['logo'] = None
+            representation['logo'] = logo_url(instance, request=request)
 
         return representation
 
@@ -313,16 +310,14 @@ class TemplateSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         representation = super().to_representation(instance)
 
-        # Include base64 encoded logo in response
-        if instance.logo:
-            try:
-                with instance.logo.open('rb') as image_file:
-                    encoded_string = base64.b64encode(image_file.read()).decode('utf-8')
-                    representation['logo'] = f"data:image/png;base64,{encoded_string}"
-            except Exception:
-                representation['logo'] = None
+        # Logo as URLs to its cached renditions; the inline base64 form
+        # (`?logo_format=base64`) only when explicitly requested
+        request = self.context.get('request')
+        if wants_inline_logo(request):
+            representation['logo'] = logo_data_uri(instance)
         else:
-            representation['logo'] = None
+            representation['logo'] = logo_url(instance, request=request)
+        representation['logoRenditions'] = logo_urls(instance, request)
 
         return representation
 
@@ -332,8 +327,10 @@ class TemplateSerializer(serializers.ModelSerializer):
     def get_access(self, obj):
         # Check if there are any access permissions for this template
         if hasattr(obj, 'access_permissions'):
-            # Count the number of users with access
-            access_count = obj.access_permissions.count()
+            # Count the number of users with access (annotated by plan_template_queryset)
+            access_count = getattr(obj, 'access_count', None)
+            if access_count is None:
+                access_count = obj.access_permissions.count()
             if access_count == 0:
                 return "Only you"
             elif access_count == 1:
@@ -346,6 +343,55 @@ class TemplateSerializer(serializers.ModelSerializer):
         return obj.user.email if hasattr(obj, 'user') and obj.user else "Unknown"
 
 
+class TemplateSummarySerializer(serializers.ModelSerializer):
+    """
+    Lightweight representation for template lists: no section tree and the logo
+    as a URL. Expects a queryset from plan_template_summary_queryset.
+    """
+    logo = serializers.SerializerMethodField()
+    lastModified = serializers.SerializerMethodField()
+    updatedAt = serializers.DateTimeField(source='updated_at', read_only=True)
+    sectionCount = serializers.IntegerField(source='section_count', read_only=True)
+    questionCount = serializers.IntegerField(source='question_count', read_only=True)
+    accessCount = serializers.IntegerField(source='access_count', read_only=True)
+    access = serializers.SerializerMethodField()
+    createdBy = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Template
+        fields = [
+            'id',
+            'title',
+            'template_type',
+            'logo',
+            'lastModified',
+            'created_at',
+            'updatedAt',
+            'sectionCount',
+            'questionCount',
+            'accessCount',
+            'access',
+            'createdBy',
+        ]
+        read_only_fields = fields
+
+    def get_logo(self, obj):
+        return logo_url(obj, 'thumbnail', self.context.get('request'))
+
+    def get_lastModified(self, obj):
+        return obj.updated_at.strftime("%B %d, %Y") if obj.updated_at else "Unknown"
+
+    def get_access(self, obj):
+        if obj.access_count == 0:
+            return "Only you"
+        elif obj.access_count == 1:
+            return "You and 1 other"
+        return f"You and {obj.access_count} others"
+
+    def get_createdBy(self, obj):
+        return obj.user.email if obj.user else "Unknown"
+
+
 class UserBasicSerializer(serializers.ModelSerializer):
     """Simplified user serializer for template access permissions"""
     class Meta:
@@ -9,7 +9,10 @@ from django.db.models import Q
 from django.utils import timezone
 
 from .models import Template, TemplateAccess
-from .serializers import TemplateSerializer
+from .serializers import TemplateSerializer, TemplateSummarySerializer
+from .querysets import plan_template_queryset, plan_template_summary_queryset, shared_template_queryset
+from .pagination import KeysetPagination
+from .permission_resolver import get_permission_resolver
 
 
 class CsrfExemptSessionAuthentication(SessionAuthentication):
@@ -31,20 +34,12 @@ def shared_templates(request):
     user = request.user
 
     # Get templates where the user has explicit access
-    template_access = TemplateAccess.objects.filter(
-        user=user,
-        status='active'
-    ).select_related('template')
-
-    # Extract the templates and update last_accessed
-    templates = []
-    for access in template_access:
-        templates.append(access.template)
-        # Record this access
-        access.last_accessed = timezone.now()
-        access.save(update_fields=['last_accessed'])
-
-    serializer = TemplateSerializer(templates, many=True)
+    templates = plan_template_queryset(shared_template_queryset(user))
+
+    # Record this access
+    TemplateAccess.objects.filter(user=user, status='active').update(last_accessed=timezone.now())
+
+    serializer = TemplateSerializer(templates, many=True, context={'request': request})
     return Response(serializer.data)
 
 
@@ -57,25 +52,18 @@ def all_accessible_templates(request):
     user = request.user
 
     # Get templates owned by the user
-    owned_templates = Template.objects.filter(user=user)
+    owned_templates = plan_template_queryset(Template.objects.filter(user=user))
 
     # Get templates shared with the user
-    shared_access = TemplateAccess.objects.filter(
-        user=user,
-        status='active'
-    ).select_related('template')
-
-    shared_templates = [access.template for access in shared_access]
+    shared_templates = plan_template_queryset(shared_template_queryset(user))
 
     # Combine both sets
-    all_templates = list(owned_templates) + shared_templates
+    all_templates = list(owned_templates) + list(shared_templates)
 
     # Update last_accessed for shared templates
-    for access in shared_access:
-        access.last_accessed = timezone.now()
-        access.save(update_fields=['last_accessed'])
+    TemplateAccess.objects.filter(user=user, status='active').update(last_accessed=timezone.now())
 
-    serializer = TemplateSerializer(all_templates, many=True)
+    serializer = TemplateSerializer(all_templates, many=True, context={'request': request})
     response = Response(serializer.data)
 
     # Add cache-control headers to ensure fresh data
@@ -94,23 +82,18 @@ def template_detail_with_access_check(request, template_id):
     """
     user = request.user
     template = get_object_or_404(Template, id=template_id)
+    resolver = get_permission_resolver(request)
+    perms = resolver.resolve(template.id)
 
     # Check if user owns the template
-    if template.user == user:
-        serializer = TemplateSerializer(template)
+    if perms.is_owner:
+        serializer = TemplateSerializer(template, context={'request': request})
         return Response(serializer.data)
 
     # If user is inspector, check if template is assigned to them
     if user.user_role == 'inspector':
-        from .models import TemplateAssignment
-        has_assignment = TemplateAssignment.objects.filter(
-            template=template,
-            inspector=user,
-            status__in=['assigned', 'in_progress']
-        ).exists()
-
-        if has_assignment:
-            serializer = TemplateSerializer(template)
+        if perms.has_assignment(('assigned', 'in_progress')):
+            serializer = TemplateSerializer(template, context={'request': request})
             return Response(serializer.data)
         else:
             return Response(
@@ -119,25 +102,18 @@ def template_detail_with_access_check(request, template_id):
             )
 
     # Check if user has access to the template (for non-inspectors)
-    try:
-        access = TemplateAccess.objects.get(
-            template=template,
-            user=user,
-            status='active'
-        )
-
-        # Record this access
-        access.last_accessed = timezone.now()
-        access.save(update_fields=['last_accessed'])
-
-        serializer = TemplateSerializer(template)
-        return Response(serializer.data)
-    except TemplateAccess.DoesNotExist:
+    if not perms.has_access:
         return Response(
             {"detail": "You don't have access to this template."},
             status=status.HTTP_403_FORBIDDEN
         )
 
+    # Record this access
+    resolver.record_access(perms)
+
+    serializer = TemplateSerializer(template, context={'request': request})
+    return Response(serializer.data)
+
 
 @api_view(["GET"])
 @authentication_classes([SessionAuthentication])
@@ -145,7 +121,8 @@ def template_detail_with_access_check(request, template_id):
 def user_templates_with_shared(request):
     """
     Get templates owned by the user and templates shared with the user
-    Returns them as separate lists
+    Returns them as separate lists of summaries, each paged with its own cursor
+    (`owned_cursor` / `shared_cursor`, next pages in `owned_next` / `shared_next`)
     """
     # Debug authentication
     print(f"🔍 user_templates_with_shared called")
@@ -165,27 +142,29 @@ def user_templates_with_shared(request):
     print(f"✅ Authenticated user: {user.email} (ID: {user.id})")
 
     # Get templates owned by the user
-    owned_templates = Template.objects.filter(user=user)
-    print(f"📋 Found {owned_templates.count()} owned templates")
+    owned_paginator = KeysetPagination()
+    owned_paginator.cursor_query_param = 'owned_cursor'
+    owned_templates = owned_paginator.paginate_queryset(
+        plan_template_summary_queryset(Template.objects.filter(user=user)), request
+    )
 
     # Get templates shared with the user
-    shared_access = TemplateAccess.objects.filter(
-        user=user,
-        status='active'
-    ).select_related('template')
-
-    shared_templates = [access.template for access in shared_access]
-    print(f"🤝 Found {len(shared_templates)} shared templates")
+    shared_paginator = KeysetPagination()
+    shared_paginator.cursor_query_param = 'shared_cursor'
+    shared_templates = shared_paginator.paginate_queryset(
+        plan_template_summary_queryset(shared_template_queryset(user)), request
+    )
 
     # Update last_accessed for shared templates
-    for access in shared_access:
-        access.last_accessed = timezone.now()
-        access.save(update_fields=['last_accessed'])
+    TemplateAccess.objects.filter(user=user, status='active').update(last_accessed=timezone.now())
 
-    owned_serializer = TemplateSerializer(owned_templates, many=True)
-    shared_serializer = TemplateSerializer(shared_templates, many=True)
+    context = {'request': request}
+    owned_serializer = TemplateSummarySerializer(owned_templates, many=True, context=context)
+    shared_serializer = TemplateSummarySerializer(shared_templates, many=True, context=context)
 
     return Response({
         "owned_templates": owned_serializer.data,
-        "shared_templates": shared_serializer.data
+        "shared_templates": shared_serializer.data,
+        "owned_next": owned_paginator.get_next_link(),
+        "shared_next": shared_paginator.get_next_link(),
     })
@@ -0,0 +1,68 @@
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+# <upload dir>/<first two hex chars>/<sha256><ext>
+HASHED_NAME_RE = re.compile(r'^(?P<directory>.+)/[0-9a-f]{2}/(?P<digest>[0-9a-f]{64})(?P<ext>\.[A-Za-z0-9]+)?$')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File system storage that names every file by the SHA-256 of its content.
+
+    The upload_to directory and the extension are kept, the base name is
+    replaced by the digest. Saving content that is already stored writes
+    nothing and returns the existing name, so identical logos and attachments
+    share one file. Which rows point at a file is tracked by MediaBlob reference
+    counts (see users.media_blobs); unreferenced files are removed by the
+    `gc_media_blobs` management command, never by deleting a field's file.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+
+        name = self.hashed_name(name, self.content_hash(content))
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+    def delete(self, name):
+        # A stored file may back many rows, so FieldFile.delete() must not
+        # remove it. Files are only removed by gc_media_blobs through purge().
+        pass
+
+    def purge(self, name):
+        """Really remove a file; callers must have checked nothing references it"""
+        super().delete(name)
+
+    def content_hash(self, content):
+        digest = hashlib.sha256()
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        return digest.hexdigest()
+
+    def hashed_name(self, name, digest):
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        ext = os.path.splitext(filename)[1].lower()
+        return posixpath.join(directory, digest[:2], f'{digest}{ext}')
+
+    @staticmethod
+    def is_hashed_name(name):
+        return bool(name and HASHED_NAME_RE.match(name))
+
+
+content_addressed_storage = ContentAddressedStorage()
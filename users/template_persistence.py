@@ -0,0 +1,587 @@
+import re
+
+from django.db import transaction
+from django.utils import timezone
+
+from .logic_graph import find_rule_cycle
+from .models import Section, Question, QuestionOption, Response
+
+
+# Rows per INSERT/UPDATE statement. Large templates are written in a handful of
+# batches instead of one statement per section/question/option.
+BULK_BATCH_SIZE = 500
+
+SECTION_UPDATE_FIELDS = ['title', 'description', 'order', 'is_collapsed', 'updated_at']
+QUESTION_UPDATE_FIELDS = [
+    'text', 'response_type', 'required', 'order', 'logic_rules',
+    'flagged', 'multiple_selection', 'updated_at',
+]
+
+
+class TemplatePayloadError(Exception):
+    """
+    Raised when a nested template payload is invalid. Nothing has been written
+    to the database when this is raised.
+    """
+    pass
+
+
+def _db_id(value):
+    """Return the integer id for database ids, None for frontend-generated ids"""
+    if value is not None and str(value).isdigit():
+        return int(value)
+    return None
+
+
+def _payload_value(data, key, default=None):
+    """data[key], also accepting the snake_case spelling the garment builder sends"""
+    if key in data:
+        return data[key]
+    return data.get(re.sub(r'([A-Z])', r'_\1', key).lower(), default)
+
+
+def _option_plan(option):
+    """Options arrive as plain strings or as {id, text} objects"""
+    if isinstance(option, dict):
+        return _db_id(option.get('id')), option.get('text', '')
+    return None, option
+
+
+class SectionPlan:
+    """A validated section from the payload, waiting to be written"""
+
+    def __init__(self, db_id, fields, explicit_fields, questions):
+        self.db_id = db_id
+        self.fields = fields
+        # Fields the client actually sent; only these overwrite existing rows
+        self.explicit_fields = explicit_fields
+        self.questions = questions
+        self.instance = None
+
+
+class QuestionPlan:
+    """A validated question from the payload, waiting to be written"""
+
+    def __init__(self, db_id, fields, explicit_fields, options, payload_id=None):
+        self.db_id = db_id
+        self.fields = fields
+        self.explicit_fields = explicit_fields
+        self.options = options
+        # The id the builder sent, which logic rules may target
+        self.payload_id = payload_id
+        self.instance = None
+
+
+def _check_rule_cycles(rule_questions):
+    """Reject logic rules whose targets lead back to where they started"""
+    cycle = find_rule_cycle(rule_questions)
+    if cycle:
+        raise TemplatePayloadError(f"Logic rules form a cycle: {' -> '.join(cycle)}")
+
+
+def parse_standard_sections(sections):
+    """
+    Validate the section/question payload sent by the standard template builder
+    (TemplateCreateView and TemplateDetailView) and turn it into write plans.
+    """
+    if not isinstance(sections, list):
+        raise TemplatePayloadError("Sections must be a list")
+
+    plans = []
+    rule_questions = []
+    for section_data in sections:
+        if not isinstance(section_data, dict):
+            raise TemplatePayloadError("Each section must be an object")
+
+        explicit = set()
+        for key, field in (("title", "title"), ("description", "description"),
+                           ("order", "order"), ("isCollapsed", "is_collapsed")):
+            if key in section_data:
+                explicit.add(field)
+
+        questions_data = section_data.get("questions", []) or []
+        if not isinstance(questions_data, list):
+            raise TemplatePayloadError("Section questions must be a list")
+
+        questions = []
+        for question_data in questions_data:
+            if not isinstance(question_data, dict):
+                raise TemplatePayloadError("Each question must be an object")
+
+            # Check for response_type or responseType (handle both for compatibility)
+            response_type = question_data.get("response_type") or question_data.get("responseType")
+            if not response_type:
+                raise TemplatePayloadError(f"response_type is required for question: {question_data}")
+
+            # Handle both camelCase and snake_case for logic_rules
+            logic_rules = question_data.get("logic_rules") or question_data.get("logicRules")
+
+            options = question_data.get("options", []) or []
+            if not isinstance(options, list):
+                raise TemplatePayloadError("Question options must be a list")
+
+            q_explicit = {'response_type'}
+            for key, field in (("text", "text"), ("required", "required"), ("order", "order"),
+                               ("flagged", "flagged"), ("multipleSelection", "multiple_selection")):
+                if key in question_data:
+                    q_explicit.add(field)
+            if logic_rules is not None:
+                q_explicit.add('logic_rules')
+                rule_questions.append((question_data.get("id"), logic_rules, response_type))
+
+            questions.append(QuestionPlan(
+                db_id=_db_id(question_data.get("id")),
+                payload_id=question_data.get("id"),
+                fields={
+                    'text': question_data.get("text"),
+                    'response_type': response_type,
+                    'required': question_data.get("required", False),
+                    'order': question_data.get("order", 0),
+                    'logic_rules': logic_rules,
+                    'flagged': question_data.get("flagged", False),
+                    'multiple_selection': question_data.get("multipleSelection", False),
+                },
+                explicit_fields=q_explicit,
+                options=[_option_plan(option) for option in options],
+            ))
+
+        plans.append(SectionPlan(
+            db_id=_db_id(section_data.get("id")),
+            fields={
+                'title': section_data.get("title"),
+                'description': section_data.get("description", ""),
+                'order': section_data.get("order", 0),
+                'is_collapsed': section_data.get("isCollapsed", False),
+            },
+            explicit_fields=explicit,
+            questions=questions,
+        ))
+
+    _check_rule_cycles(rule_questions)
+    return plans
+
+
+def parse_garment_sections(sections):
+    """
+    Validate the payload sent by the garment template builder. Garment sections
+    carry their settings under `content` and are ordered by their position in
+    the payload. The builder sends the whole template, so every field of a
+    stored section or question is overwritten.
+    """
+    if not isinstance(sections, list):
+        raise TemplatePayloadError("Sections must be a list")
+
+    plans = []
+    rule_questions = []
+    for index, section_data in enumerate(sections):
+        if not isinstance(section_data, dict):
+            raise TemplatePayloadError("Each section must be an object")
+
+        section_type = section_data.get("type", "standard")
+        content = section_data.get("content", {}) or {}
+        aql = _payload_value(content, "aqlSettings", {}) or {}
+
+        questions = []
+        # Only standard sections carry questions
+        if section_type == "standard":
+            for q_index, question_data in enumerate(content.get("questions", []) or []):
+                if not isinstance(question_data, dict):
+                    raise TemplatePayloadError("Each question must be an object")
+                options = question_data.get("options", []) or []
+                if not isinstance(options, list):
+                    raise TemplatePayloadError("Question options must be a list")
+
+                # Ensure response_type is never null
+                response_type = question_data.get("response_type") or question_data.get("responseType") or "Text"
+                logic_rules = question_data.get("logic_rules") or question_data.get("logicRules")
+                if logic_rules is not None:
+                    rule_questions.append((question_data.get("id"), logic_rules, response_type))
+
+                fields = {
+                    'text': question_data.get("text", "Type question"),
+                    'response_type': response_type,
+                    'required': question_data.get("required", False),
+                    'order': q_index,
+                    'logic_rules': logic_rules,
+                    'flagged': question_data.get("flagged", False),
+                    'multiple_selection': question_data.get("multiple_selection") or question_data.get("multipleSelection", False),
+                }
+                questions.append(QuestionPlan(
+                    db_id=_db_id(question_data.get("id")),
+                    payload_id=question_data.get("id"),
+                    fields=fields,
+                    explicit_fields=set(fields),
+                    options=[_option_plan(option) for option in options],
+                ))
+
+        fields = {
+            'title': section_data.get("title"),
+            'description': content.get("description", ""),
+            'order': index,
+            'is_collapsed': _payload_value(section_data, "isCollapsed", False),
+            'is_garment_section': (section_type == "garmentDetails"),
+            'aql_level': _payload_value(aql, "aqlLevel"),
+            'inspection_level': _payload_value(aql, "inspectionLevel"),
+            'sampling_plan': _payload_value(aql, "samplingPlan"),
+            'severity': aql.get("severity"),
+            'sizes': content.get("sizes", []),
+            'colors': content.get("colors", []),
+            'default_defects': _payload_value(content, "defaultDefects", []),
+            'include_carton_offered': _payload_value(content, "includeCartonOffered", True),
+            'include_carton_inspected': _payload_value(content, "includeCartonInspected", True),
+        }
+        plans.append(SectionPlan(
+            db_id=_db_id(section_data.get("id")),
+            fields=fields,
+            explicit_fields=set(fields),
+            questions=questions,
+        ))
+
+    _check_rule_cycles(rule_questions)
+    return plans
+
+
+def _retarget(logic_rules, ids):
+    """
+    Logic rules with targets (targetElementId) given as payload ids replaced by
+    database ids, follow-up questions' rules included; None if nothing changed.
+    """
+    if not isinstance(logic_rules, list):
+        return None
+    changed = False
+    rules = []
+    for rule in logic_rules:
+        if isinstance(rule, dict):
+            rule = dict(rule)
+            for key in ('targetElementId', 'target_element_id'):
+                target = rule.get(key)
+                if target not in (None, '') and ids.get(str(target), str(target)) != str(target):
+                    rule[key] = ids[str(target)]
+                    changed = True
+            for key in ('subQuestion', 'sub_question'):
+                sub_question = rule.get(key)
+                if not isinstance(sub_question, dict):
+                    continue
+                for rules_key in ('logicRules', 'logic_rules'):
+                    nested = _retarget(sub_question.get(rules_key), ids)
+                    if nested is not None:
+                        sub_question = rule[key] = {**sub_question, rules_key: nested}
+                        changed = True
+        rules.append(rule)
+    return rules if changed else None
+
+
+class TemplateDiff:
+    """
+    The minimal set of row changes needed to bring a stored template tree in
+    line with a payload, per level (sections, questions, options).
+    """
+
+    LEVELS = ('sections', 'questions', 'options')
+
+    def __init__(self):
+        self.created = {level: [] for level in self.LEVELS}
+        # instance -> set of changed field names
+        self.updated = {level: {} for level in self.LEVELS}
+        self.deleted = {level: [] for level in self.LEVELS}
+
+    def mark_updated(self, level, instance, fields):
+        self.updated[level].setdefault(instance, set()).update(fields)
+
+    def summary(self):
+        summary = {}
+        for level in self.LEVELS:
+            changed_fields = [fields for fields in self.updated[level].values()]
+            summary[level] = {
+                'created': len(self.created[level]),
+                'updated': len(changed_fields),
+                'deleted': len(self.deleted[level]),
+                'reordered': sum(1 for fields in changed_fields if 'order' in fields),
+            }
+        return summary
+
+
+def _changed_fields(instance, values, fields):
+    """Apply values to instance and return the names of fields whose value changed"""
+    changed = set()
+    for name in fields:
+        value = instance._meta.get_field(name).to_python(values[name])
+        if getattr(instance, name) != value:
+            setattr(instance, name, value)
+            changed.add(name)
+    return changed
+
+
+def _diff_options(question, stored, payload, diff, answered):
+    """
+    Reconcile one question's stored options with the payload options. Options
+    are matched by id, then by text, so reordering keeps existing rows (and the
+    responses pointing at them). A renamed option is a new row: renaming the
+    old one in place would change what past answers say. Unmatched options are
+    deleted unless they have been answered.
+    """
+    by_id = {option.id: option for option in stored}
+    unmatched = list(stored)
+    matches = [None] * len(payload)
+
+    for index, (option_id, text) in enumerate(payload):
+        if option_id in by_id and by_id[option_id] in unmatched:
+            matches[index] = by_id[option_id]
+            unmatched.remove(matches[index])
+    for index, (option_id, text) in enumerate(payload):
+        if matches[index] is None:
+            for option in unmatched:
+                if option.text == text:
+                    matches[index] = option
+                    unmatched.remove(option)
+                    break
+
+    for index, (option_id, text) in enumerate(payload):
+        option = matches[index]
+        if option is None:
+            diff.created['options'].append(QuestionOption(question=question, text=text, order=index))
+            continue
+        changed = _changed_fields(option, {'text': text, 'order': index}, ['text', 'order'])
+        if changed:
+            diff.mark_updated('options', option, changed)
+
+    diff.deleted['options'].extend(option for option in unmatched if option.id not in answered)
+
+
+class TemplateWriter:
+    """
+    Writes a validated section/question/option tree for a template using a
+    fixed number of bulk statements per level, inside a single transaction.
+
+    Existing sections and questions are matched by id and updated in place;
+    everything else is inserted. Call one of the parse_* functions first so the
+    whole payload is checked before anything is written.
+    """
+
+    def __init__(self, template):
+        self.template = template
+
+    def resolve(self, plans):
+        """
+        Load the existing rows referenced by the plans (one query per level) and
+        check that every referenced question exists in its section.
+        """
+        section_ids = {plan.db_id for plan in plans if plan.db_id}
+        existing_sections = {}
+        if section_ids:
+            existing_sections = {
+                section.id: section
+                for section in Section.objects.filter(template=self.template, id__in=section_ids)
+            }
+
+        question_ids = {q.db_id for plan in plans for q in plan.questions if q.db_id}
+        existing_questions = {}
+        if question_ids:
+            existing_questions = {
+                question.id: question
+                for question in Question.objects.filter(section__template=self.template, id__in=question_ids)
+            }
+
+        for plan in plans:
+            # Unknown section ids fall back to creating a new section
+            plan.instance = existing_sections.get(plan.db_id)
+            for question_plan in plan.questions:
+                if not question_plan.db_id:
+                    continue
+                question = existing_questions.get(question_plan.db_id)
+                if question is None or plan.instance is None or question.section_id != plan.instance.id:
+                    raise TemplatePayloadError(f"Question with id {question_plan.db_id} not found.")
+                question_plan.instance = question
+
+    def write(self, plans):
+        """
+        Persist the plans. Existing questions keep their options; only new
+        questions get options written.
+        """
+        with transaction.atomic():
+            self.resolve(plans)
+            now = timezone.now()
+
+            new_sections = []
+            updated_sections = []
+            for plan in plans:
+                if plan.instance is None:
+                    plan.instance = Section(template=self.template, **plan.fields)
+                    new_sections.append(plan.instance)
+                else:
+                    for field in plan.explicit_fields:
+                        setattr(plan.instance, field, plan.fields[field])
+                    plan.instance.updated_at = now
+                    updated_sections.append(plan.instance)
+
+            if new_sections:
+                Section.objects.bulk_create(new_sections, batch_size=BULK_BATCH_SIZE)
+            if updated_sections:
+                Section.objects.bulk_update(updated_sections, SECTION_UPDATE_FIELDS, batch_size=BULK_BATCH_SIZE)
+
+            new_questions = []
+            updated_questions = []
+            for plan in plans:
+                for question_plan in plan.questions:
+                    if question_plan.instance is None:
+                        question_plan.instance = Question(section=plan.instance, **question_plan.fields)
+                        new_questions.append(question_plan)
+                    else:
+                        question = question_plan.instance
+                        for field in question_plan.explicit_fields:
+                            setattr(question, field, question_plan.fields[field])
+                        question.updated_at = now
+                        updated_questions.append(question)
+
+            if new_questions:
+                Question.objects.bulk_create([q.instance for q in new_questions], batch_size=BULK_BATCH_SIZE)
+            if updated_questions:
+                Question.objects.bulk_update(updated_questions, QUESTION_UPDATE_FIELDS, batch_size=BULK_BATCH_SIZE)
+            self._write_targets(plans)
+
+            options = [
+                QuestionOption(question=question_plan.instance, text=text, order=o_index)
+                for question_plan in new_questions
+                for o_index, (option_id, text) in enumerate(question_plan.options)
+            ]
+            if options:
+                QuestionOption.objects.bulk_create(options, batch_size=BULK_BATCH_SIZE)
+
+        return plans
+
+    def diff(self, plans, prune=False):
+        """
+        Compare the stored tree with the plans and return a TemplateDiff. The
+        stored tree is loaded with one query per level. With prune, sections and
+        questions missing from the payload are scheduled for deletion. Answered
+        questions and options are never deleted (nor the sections holding them),
+        since their responses would go with them.
+        """
+        diff = TemplateDiff()
+        answered = Response.objects.filter(question__section__template=self.template)
+        answered_questions = set(answered.values_list('question_id', flat=True).distinct())
+        answered_options = set(
+            answered.filter(choice_response__isnull=False).values_list('choice_response_id', flat=True).distinct()
+        )
+        sections = {section.id: section for section in Section.objects.filter(template=self.template)}
+        questions = {
+            question.id: question
+            for question in Question.objects.filter(section__template=self.template)
+        }
+        options = {}
+        for option in QuestionOption.objects.filter(question__section__template=self.template).order_by('order', 'id'):
+            options.setdefault(option.question_id, []).append(option)
+
+        seen_sections = set()
+        seen_questions = set()
+        for plan in plans:
+            section = sections.get(plan.db_id)
+            if section is not None and section.id in seen_sections:
+                raise TemplatePayloadError(f"Section with id {section.id} appears more than once.")
+
+            if section is None:
+                section = Section(template=self.template, **plan.fields)
+                diff.created['sections'].append(section)
+            else:
+                seen_sections.add(section.id)
+                changed = _changed_fields(section, plan.fields, plan.explicit_fields)
+                if changed:
+                    diff.mark_updated('sections', section, changed)
+            plan.instance = section
+
+            for question_plan in plan.questions:
+                question = questions.get(question_plan.db_id)
+                if question is not None and question.id in seen_questions:
+                    raise TemplatePayloadError(f"Question with id {question.id} appears more than once.")
+
+                if question is None:
+                    # Unknown ids are treated as new questions
+                    question = Question(section=section, **question_plan.fields)
+                    diff.created['questions'].append(question)
+                    stored_options = []
+                else:
+                    seen_questions.add(question.id)
+                    changed = _changed_fields(question, question_plan.fields, question_plan.explicit_fields)
+                    if question.section_id != section.id:
+                        # Question moved to another section
+                        question.section = section
+                        changed.add('section')
+                    if changed:
+                        diff.mark_updated('questions', question, changed)
+                    stored_options = options.get(question.id, [])
+                question_plan.instance = question
+                _diff_options(question, stored_options, question_plan.options, diff, answered_options)
+
+        if prune:
+            kept = [q for q in questions.values() if q.id not in seen_questions and q.id in answered_questions]
+            kept_sections = {question.section_id for question in kept}
+            diff.deleted['questions'] = [
+                q for q in questions.values() if q.id not in seen_questions and q.id not in answered_questions
+            ]
+            diff.deleted['sections'] = [
+                s for s in sections.values() if s.id not in seen_sections and s.id not in kept_sections
+            ]
+        return diff
+
+    def apply(self, diff):
+        """Write a TemplateDiff with one bulk statement per level and operation"""
+        now = timezone.now()
+        with transaction.atomic():
+            if diff.created['sections']:
+                Section.objects.bulk_create(diff.created['sections'], batch_size=BULK_BATCH_SIZE)
+            self._bulk_update(Section, diff.updated['sections'], now)
+
+            # New questions pick up the ids of sections saved just above
+            if diff.created['questions']:
+                Question.objects.bulk_create(diff.created['questions'], batch_size=BULK_BATCH_SIZE)
+            self._bulk_update(Question, diff.updated['questions'], now)
+
+            # Questions are deleted before sections so moved questions survive
+            if diff.deleted['questions']:
+                Question.objects.filter(id__in=[q.id for q in diff.deleted['questions']]).delete()
+            if diff.deleted['sections']:
+                Section.objects.filter(id__in=[s.id for s in diff.deleted['sections']]).delete()
+
+            if diff.deleted['options']:
+                QuestionOption.objects.filter(id__in=[o.id for o in diff.deleted['options']]).delete()
+            self._bulk_update(QuestionOption, diff.updated['options'], now)
+            if diff.created['options']:
+                QuestionOption.objects.bulk_create(diff.created['options'], batch_size=BULK_BATCH_SIZE)
+        return diff
+
+    def sync(self, plans, prune=False):
+        """Compute and apply the minimal diff for the plans; returns the diff summary"""
+        with transaction.atomic():
+            diff = self.diff(plans, prune=prune)
+            self.apply(diff)
+            self._write_targets(plans)
+        return diff.summary()
+
+    def _write_targets(self, plans):
+        """
+        Once every question has its database id, point logic rule targets that
+        name payload ids (new questions' generated ids) at the saved questions
+        """
+        question_plans = [question_plan for plan in plans for question_plan in plan.questions]
+        ids = {
+            str(question_plan.payload_id): str(question_plan.instance.id)
+            for question_plan in question_plans if question_plan.payload_id not in (None, '')
+        }
+        retargeted = []
+        for question_plan in question_plans:
+            rules = _retarget(question_plan.instance.logic_rules, ids)
+            if rules is not None:
+                question_plan.instance.logic_rules = rules
+                retargeted.append(question_plan.instance)
+        if retargeted:
+            Question.objects.bulk_update(retargeted, ['logic_rules'], batch_size=BULK_BATCH_SIZE)
+
+    def _bulk_update(self, model, updated, now):
+        if not updated:
+            return
+        fields = set()
+        for instance, changed in updated.items():
+            instance.updated_at = now
+            fields.update(changed)
+        fields.add('updated_at')
+        model.objects.bulk_update(list(updated), sorted(fields), batch_size=BULK_BATCH_SIZE)
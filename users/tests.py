@@ -1,3 +1,1448 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from unittest import mock
+from datetime import timedelta
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.models import Count, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+from PIL import Image
+
+from . import aql, audit_partitions, dashboard_counters, inspection_export, logic_graph, logic_rules
+from .audit import AuditLogWriter
+from .audit_partitions import add_months, month_start
+from .inspection_report import build_inspection_report, report_inspection_queryset
+from .pdf_reports import cache_name
+from .report_snapshots import decode_report
+from .template_persistence import TemplatePayloadError, parse_standard_sections
+from .models import (
+    CustomUser, Template, Section, Question, QuestionOption, TemplateAccess, MediaBlob, TemplateAssignment,
+    PermissionAuditLog, Inspection, InspectionReportSnapshot, Response as ResponseModel, GarmentDefectLine,
+    GarmentQuantityLine, InspectionRollup, DashboardCounter
+)
+
+
+def create_user(email, role='admin'):
+    return CustomUser.objects.create_user(
+        username=email,
+        email=email,
+        password='password',
+        company_name='Test Company',
+        industry_type='Manufacturing',
+        job_title='Tester',
+        company_size=10,
+        user_role=role,
+    )
+
+
+def create_template(user, sections=2, questions=3, options=2):
+    template = Template.objects.create(user=user, title='Template')
+    for s_index in range(sections):
+        section = Section.objects.create(template=template, title=f'Section {s_index}', order=s_index)
+        for q_index in range(questions):
+            question = Question.objects.create(
+                section=section, text=f'Question {q_index}', response_type='Multiple choice', order=q_index
+            )
+            for o_index in range(options):
+                QuestionOption.objects.create(question=question, text=f'Option {o_index}', order=o_index)
+    return template
+
+
+class TemplateListQueryCountTests(TestCase):
+    """Template list endpoints must not issue queries per template/section/question"""
+
+    LIST_URLS = [
+        '/api/users/templates/',
+        '/api/users/dashboard/templates/',
+        '/api/users/all-templates/',
+        '/api/users/templates-with-shared/',
+    ]
+
+    def setUp(self):
+        self.owner = create_user('owner@example.com')
+        self.other = create_user('other@example.com')
+        self.client.force_login(self.owner)
+
+    def add_templates(self, count):
+        for _ in range(count):
+            owned = create_template(self.owner)
+            TemplateAccess.objects.create(template=owned, user=self.other, permission_level='viewer')
+            shared = create_template(self.other)
+            TemplateAccess.objects.create(template=shared, user=self.owner, permission_level='editor')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_grow_with_templates(self):
+        self.add_templates(1)
+        baseline = {url: self.count_queries(url) for url in self.LIST_URLS}
+
+        self.add_templates(10)
+        for url in self.LIST_URLS:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), baseline[url])
+
+    def test_access_count_is_annotated(self):
+        self.add_templates(1)
+        response = self.client.get('/api/users/templates/')
+        self.assertEqual([t['access'] for t in response.json()], ['You and 1 other'])
+
+
+class TemplateSummaryListTests(TestCase):
+    """Template lists return summaries paged by an (updated_at, id) cursor"""
+
+    def setUp(self):
+        self.owner = create_user('owner@example.com')
+        self.client.force_login(self.owner)
+
+    def test_summary_has_counts_and_no_tree(self):
+        create_template(self.owner, sections=2, questions=3)
+        template = self.client.get('/api/users/templates/').json()[0]
+        self.assertNotIn('sections', template)
+        self.assertEqual(template['sectionCount'], 2)
+        self.assertEqual(template['questionCount'], 6)
+        self.assertEqual(template['accessCount'], 0)
+        self.assertIn('created_at', template)
+        self.assertIsNone(template['logo'])
+
+    def test_cursor_walks_every_template_once(self):
+        templates = [create_template(self.owner, sections=0) for _ in range(5)]
+        # Ties on updated_at must be broken by id
+        Template.objects.filter(id__in=[t.id for t in templates[:3]]).update(updated_at=templates[0].updated_at)
+
+        seen = []
+        url = '/api/users/dashboard/templates/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(t['id'] for t in response.json())
+            link = response.headers.get('Link')
+            url = link[1:link.index('>')] if link else None
+
+        expected = list(Template.objects.order_by('-updated_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get('/api/users/templates/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(AUDIT_LOG_ASYNC=False)
+class TemplateLogoRenditionTests(TestCase):
+    """Logos are resized once at upload and exposed as URLs, base64 only on request"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.owner = create_user('owner@example.com')
+        self.client.force_login(self.owner)
+
+    def png(self, size=(800, 400)):
+        buffer = io.BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, format='PNG')
+        return ContentFile(buffer.getvalue(), name='logo.png')
+
+    def test_renditions_are_built_on_upload(self):
+        template = Template.objects.create(user=self.owner, title='Logo', logo=self.png())
+        renditions = template.logo_renditions
+        self.assertEqual(renditions['source'], template.logo.name)
+        self.assertIn(renditions['hash'], renditions['thumbnail'])
+        # The original is served from the upload, not copied next to the renditions
+        self.assertEqual(renditions['original'], template.logo.name)
+        self.assertEqual(
+            sorted(default_storage.listdir(os.path.dirname(renditions['thumbnail']))[1]),
+            ['report.png', 'thumbnail.png'],
+        )
+
+        with default_storage.open(renditions['thumbnail']) as thumbnail:
+            self.assertLessEqual(max(Image.open(thumbnail).size), 96)
+
+        # Same bytes again map to the same rendition files
+        other = Template.objects.create(user=self.owner, title='Copy', logo=self.png())
+        self.assertEqual(other.logo_renditions['thumbnail'], renditions['thumbnail'])
+
+    def test_logo_is_a_url_unless_base64_is_requested(self):
+        template = Template.objects.create(user=self.owner, title='Logo', logo=self.png())
+
+        summary = self.client.get('/api/users/templates/').json()[0]
+        self.assertTrue(summary['logo'].endswith(template.logo_renditions['thumbnail']))
+
+        detail = self.client.get(f'/api/users/templates/{template.id}/').json()
+        self.assertTrue(detail['logo'].startswith('http'))
+        self.assertIn('report', detail['logoRenditions'])
+
+        inline = self.client.get(f'/api/users/templates/{template.id}/?logo_format=base64').json()
+        self.assertTrue(inline['logo'].startswith('data:image/png;base64,'))
+
+
+class ContentAddressedMediaTests(TestCase):
+    """Identical uploads share one reference-counted file that GC removes once unused"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.owner = create_user('owner@example.com')
+
+    def logo(self):
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 40), 'blue').save(buffer, format='PNG')
+        return ContentFile(buffer.getvalue(), name='company-logo.png')
+
+    def test_identical_logos_are_stored_once(self):
+        first = Template.objects.create(user=self.owner, title='First', logo=self.logo())
+        second = Template.objects.create(user=self.owner, title='Second', logo=self.logo())
+
+        self.assertEqual(first.logo.name, second.logo.name)
+        self.assertRegex(first.logo.name, r'^logos/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(MediaBlob.objects.get(name=first.logo.name).ref_count, 2)
+
+        first.delete()
+        self.assertEqual(MediaBlob.objects.get(name=second.logo.name).ref_count, 1)
+
+    def test_gc_removes_only_unreferenced_blobs(self):
+        kept = Template.objects.create(user=self.owner, title='Kept', logo=self.logo())
+        dropped = Template.objects.create(user=self.owner, title='Dropped', logo=self.logo())
+        # Deleting a shared file through the field must leave it for the other template
+        dropped.logo.delete(save=False)
+        self.assertTrue(default_storage.exists(kept.logo.name))
+        dropped.logo = ContentFile(b'not the same bytes', name='other.png')
+        dropped.save()
+        orphan = dropped.logo.name
+        dropped.delete()
+
+        call_command('gc_media_blobs', grace_hours=0, stdout=io.StringIO())
+
+        self.assertFalse(default_storage.exists(orphan))
+        self.assertFalse(MediaBlob.objects.filter(name=orphan).exists())
+        self.assertTrue(default_storage.exists(kept.logo.name))
+
+
+@override_settings(AUDIT_LOG_ASYNC=False)
+class PermissionResolutionQueryTests(TestCase):
+    """A template GET resolves the caller's permissions with a single query"""
+
+    PERMISSION_TABLES = ('users_templateaccess', 'users_granularpermission', 'users_permissiontype', 'template_assignments')
+
+    def setUp(self):
+        cache.clear()
+        self.owner = create_user('owner@example.com')
+        self.template = create_template(self.owner, sections=1, questions=1)
+
+    def permission_selects(self, user):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(f'/api/users/templates/{self.template.id}/')
+        # The template itself is loaded with an access_count annotation; that is data, not a permission check
+        selects = [
+            q['sql'] for q in context.captured_queries
+            if q['sql'].startswith('SELECT') and '"access_count"' not in q['sql']
+            and any(table in q['sql'] for table in self.PERMISSION_TABLES)
+        ]
+        return response, selects
+
+    def test_shared_user(self):
+        viewer = create_user('viewer@example.com', role='regular')
+        TemplateAccess.objects.create(template=self.template, user=viewer, permission_level='viewer')
+
+        response, selects = self.permission_selects(viewer)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(selects), 1, selects)
+
+    def test_assigned_inspector(self):
+        inspector = create_user('inspector@example.com', role='inspector')
+        TemplateAssignment.objects.create(template=self.template, inspector=inspector, assigned_by=self.owner)
+
+        response, selects = self.permission_selects(inspector)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(selects), 1, selects)
+
+    def test_unrelated_user_is_denied(self):
+        stranger = create_user('stranger@example.com', role='regular')
+        response, selects = self.permission_selects(stranger)
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(len(selects), 1, selects)
+
+    def test_later_requests_use_the_shared_cache(self):
+        viewer = create_user('viewer@example.com', role='regular')
+        TemplateAccess.objects.create(template=self.template, user=viewer, permission_level='viewer')
+
+        self.permission_selects(viewer)
+        response, selects = self.permission_selects(viewer)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(selects, [])
+
+    def test_revoke_invalidates_the_cache(self):
+        viewer = create_user('viewer@example.com', role='regular')
+        access = TemplateAccess.objects.create(template=self.template, user=viewer, permission_level='editor')
+        self.assertEqual(self.permission_selects(viewer)[0].status_code, 200)
+
+        access.status = 'revoked'
+        access.save()
+        self.assertEqual(self.permission_selects(viewer)[0].status_code, 403)
+
+    def test_ownership_change_invalidates_the_cache(self):
+        new_owner = create_user('new-owner@example.com', role='regular')
+        self.assertEqual(self.permission_selects(new_owner)[0].status_code, 403)
+
+        self.template.user = new_owner
+        self.template.save()
+        self.assertEqual(self.permission_selects(new_owner)[0].status_code, 200)
+
+
+class AuditLogWriterTests(TransactionTestCase):
+    """Access events are queued, written in batches and dropped (and counted) when the queue is full"""
+
+    def setUp(self):
+        self.user = create_user('owner@example.com')
+        self.template = Template.objects.create(user=self.user, title='Audited')
+
+    def event(self):
+        return dict(user=self.user, performed_by=self.user, template=self.template, action='access',
+                    additional_data={'status': 'allowed'})
+
+    def test_background_thread_flushes_batches(self):
+        writer = AuditLogWriter(batch_size=2, flush_interval=0.05, dedup_window=0)
+        with override_settings(AUDIT_LOG_ASYNC=True):
+            for _ in range(5):
+                self.assertTrue(writer.log(**self.event()))
+        writer.shutdown()
+
+        self.assertEqual(PermissionAuditLog.objects.count(), 5)
+        metrics = writer.metrics()
+        self.assertEqual(metrics['written'], 5)
+        self.assertEqual(metrics['dropped'], 0)
+        self.assertGreaterEqual(metrics['batches'], 3)
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        writer = AuditLogWriter(max_queue_size=2, enqueue_timeout=0, dedup_window=0)
+        writer._ensure_worker = lambda: None  # keep everything queued
+        with override_settings(AUDIT_LOG_ASYNC=True):
+            results = [writer.log(**self.event()) for _ in range(3)]
+
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(writer.metrics()['dropped'], 1)
+        self.assertEqual(PermissionAuditLog.objects.count(), 0)
+
+        writer.flush()
+        self.assertEqual(PermissionAuditLog.objects.count(), 2)
+
+
+@override_settings(AUDIT_LOG_ASYNC=False)
+class AccessAuditDedupTests(TestCase):
+    """Repeated allowed reads collapse into one row per window; denials are kept one by one"""
+
+    def setUp(self):
+        self.user = create_user('owner@example.com')
+        self.template = Template.objects.create(user=self.user, title='Audited')
+        self.writer = AuditLogWriter(dedup_window=300)
+
+    def log(self, method='GET', status='allowed'):
+        self.writer.log(user=self.user, performed_by=self.user, template=self.template, action='access',
+                        additional_data={'method': method, 'status': status})
+
+    def test_allowed_accesses_collapse_with_hit_counter(self):
+        for _ in range(3):
+            self.log()
+        self.log(method='PATCH')
+
+        rows = {row.additional_data['method']: row for row in PermissionAuditLog.objects.all()}
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows['GET'].additional_data['hits'], 3)
+        self.assertEqual(rows['PATCH'].additional_data['hits'], 1)
+        self.assertEqual(self.writer.metrics()['collapsed'], 2)
+
+    def test_denials_are_always_recorded(self):
+        self.log(status='denied')
+        self.log(status='denied')
+        self.assertEqual(PermissionAuditLog.objects.filter(additional_data__status='denied').count(), 2)
+
+    def test_zero_window_keeps_every_event(self):
+        self.writer = AuditLogWriter(dedup_window=0)
+        self.log()
+        self.log()
+        self.assertEqual(PermissionAuditLog.objects.count(), 2)
+
+    def test_failed_write_forgets_its_window(self):
+        with mock.patch.object(PermissionAuditLog.objects, 'bulk_create', side_effect=DatabaseError('down')):
+            self.log()
+        self.assertEqual(self.writer.metrics()['open_dedup_windows'], 0)
+
+        self.log()
+        self.log()
+        self.assertEqual(PermissionAuditLog.objects.get().additional_data['hits'], 2)
+
+    def test_closed_windows_are_forgotten_before_they_are_written(self):
+        self.writer._ensure_worker = lambda: None  # keep the row queued
+        with override_settings(AUDIT_LOG_ASYNC=True):
+            self.log()
+            self.log()
+        later = timezone.now().timestamp() + 2 * self.writer.dedup_window
+        with mock.patch('users.audit.time.time', return_value=later):
+            self.writer._update_aggregates()
+        self.assertEqual(self.writer.metrics()['open_dedup_windows'], 0)
+
+        self.writer.flush()
+        self.assertEqual(PermissionAuditLog.objects.get().additional_data['hits'], 2)
+
+
+class AuditLogPartitionTests(TestCase):
+    """The audit table is partitioned by month; old months are archived to gzip JSON lines"""
+
+    def setUp(self):
+        self.user = create_user('owner@example.com')
+        self.archive_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archive_dir, ignore_errors=True)
+
+    def log_at(self, when):
+        return PermissionAuditLog.objects.create(
+            user=self.user, performed_by=self.user, action='access', timestamp=when,
+        )
+
+    def partition_of(self, row):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT tableoid::regclass::text FROM "{audit_partitions.PARENT_TABLE}" WHERE id = %s',
+                           [row.pk])
+            return cursor.fetchone()[0]
+
+    def test_rows_land_in_their_month_partition(self):
+        row = self.log_at(timezone.now())
+        self.assertEqual(self.partition_of(row), audit_partitions.partition_name(month_start(timezone.now())))
+
+    def test_archive_command_creates_and_archives_partitions(self):
+        now = timezone.now()
+        audit_partitions.create_partition(month_start(now - timedelta(days=500)))
+        old = self.log_at(now - timedelta(days=500))
+        older = self.log_at(now - timedelta(days=700))
+        future_month = add_months(month_start(now), 6)
+        future = self.log_at(future_month + timedelta(days=2))
+        recent = self.log_at(now)
+        self.assertEqual(self.partition_of(old), audit_partitions.partition_name(month_start(old.timestamp)))
+        self.assertEqual(self.partition_of(older), audit_partitions.DEFAULT_PARTITION)
+        self.assertEqual(self.partition_of(future), audit_partitions.DEFAULT_PARTITION)
+
+        # The command runs in autocommit; inside the test transaction the deferred
+        # FK checks must fire before a partition can be dropped
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        call_command('archive_audit_logs', retention_months=12, months_ahead=6,
+                     archive_dir=self.archive_dir, stdout=io.StringIO())
+
+        self.assertEqual(self.partition_of(future), audit_partitions.partition_name(future_month))
+        self.assertEqual(set(PermissionAuditLog.objects.values_list('id', flat=True)), {future.pk, recent.pk})
+
+        self.assertNotIn(audit_partitions.partition_name(month_start(old.timestamp)),
+                         audit_partitions.monthly_partitions().values())
+
+        for row in (old, older):
+            path = os.path.join(self.archive_dir, audit_partitions.archive_file_name(month_start(row.timestamp)))
+            archived = audit_partitions.read_archive(path)
+            self.assertEqual([entry['id'] for entry in archived], [row.pk])
+            self.assertEqual(archived[0]['action'], 'access')
+
+
+class AuditLogApiTests(TestCase):
+    """Audit log endpoints are filtered and paged on (timestamp, id) with a fixed number of queries"""
+
+    def setUp(self):
+        self.owner = create_user('owner@example.com')
+        self.other = create_user('other@example.com')
+        self.template = Template.objects.create(user=self.owner, title='Audited')
+        self.client.force_login(self.owner)
+        self.now = timezone.now()
+
+    def log(self, minutes_ago=0, action='access', status='allowed', performed_by=None, **fields):
+        return PermissionAuditLog.objects.create(
+            user=self.other, template=self.template, action=action,
+            performed_by=performed_by or self.owner, timestamp=self.now - timedelta(minutes=minutes_ago),
+            additional_data={'status': status}, **fields,
+        )
+
+    def test_cursor_walks_every_row_once_in_constant_queries(self):
+        rows = [self.log(minutes_ago=i // 2) for i in range(7)]  # timestamp ties broken by id
+        url = f'/api/users/templates/{self.template.id}/audit-logs/?page_size=3'
+
+        seen, query_counts = [], []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                body = self.client.get(url).json()
+            query_counts.append(len(queries))
+            seen.extend(entry['id'] for entry in body['results'])
+            self.assertTrue(all(entry['template_title'] == 'Audited' for entry in body['results']))
+            url = body['next']
+
+        expected = sorted(rows, key=lambda row: (row.timestamp, row.id), reverse=True)
+        self.assertEqual(seen, [row.id for row in expected])
+        self.assertEqual(len(set(query_counts)), 1)
+
+    def test_filters(self):
+        denied = self.log(status='denied')
+        granted = self.log(action='grant', performed_by=self.other)
+        self.log(minutes_ago=3 * 24 * 60)
+        base = f'/api/users/templates/{self.template.id}/audit-logs/'
+
+        def ids(query):
+            response = self.client.get(base + query)
+            self.assertEqual(response.status_code, 200)
+            return [entry['id'] for entry in response.json()['results']]
+
+        self.assertEqual(ids('?status=denied'), [denied.id])
+        self.assertEqual(ids('?action=grant'), [granted.id])
+        self.assertEqual(ids(f'?performed_by={self.other.id}'), [granted.id])
+        self.assertEqual(len(ids(f'?start={(self.now - timedelta(days=1)).date()}')), 2)
+        self.assertEqual(len(ids(f'?end={(self.now - timedelta(days=2)).date()}')), 1)
+        self.assertEqual(self.client.get(base + '?start=yesterday').status_code, 400)
+        self.assertEqual(self.client.get(base + '?start=2024-02-30').status_code, 400)
+        self.assertEqual(self.client.get(base + '?end=2024-02-30T10:00:00').status_code, 400)
+
+    def test_recent_logs_are_paged(self):
+        for i in range(3):
+            self.log(minutes_ago=i)
+        body = self.client.get('/api/users/recent-audit-logs/?page_size=2').json()
+        self.assertEqual(len(body['results']), 2)
+        self.assertEqual(len(self.client.get(body['next']).json()['results']), 1)
+
+
+class InspectionSubmissionTests(TestCase):
+    """Submissions are written with bulk inserts; logic-rule entries are typed rows, not text prefixes"""
+
+    def setUp(self):
+        self.inspector = create_user('inspector@example.com', role='inspector')
+        self.client.force_login(self.inspector)
+        self.template = create_template(self.inspector, sections=3, questions=100, options=0)
+        self.questions = list(Question.objects.filter(section__template=self.template).order_by('id'))
+
+    def submit(self, **data):
+        return self.client.post('/api/users/submit-inspection/', {'template_id': self.template.id, **data},
+                                content_type='application/json')
+
+    def test_large_inspection_submits_in_constant_queries(self):
+        def submit_queries(answers):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.submit(answers=answers)
+            self.assertEqual(response.status_code, 201)
+            return len(queries), response
+
+        small_count, _ = submit_queries({str(self.questions[0].id): 'Option 1'})
+        large_count, response = submit_queries({str(question.id): 'Option 1' for question in self.questions})
+        # Includes writing the report snapshot (template tree + responses + insert)
+        # and reading the template's logic rule versions
+        self.assertEqual(small_count, large_count)
+        self.assertLessEqual(large_count, 17)
+
+        inspection = Inspection.objects.get(id=response.json()['inspection_id'])
+        self.assertEqual(inspection.inspection_responses.count(), 300)
+
+    def test_logic_entries_round_trip(self):
+        question = self.questions[0]
+        question.logic_rules = [
+            {'id': 'r2', 'condition': 'is', 'value': 'Option 0', 'trigger': 'require_evidence'},
+            {'id': 'r3', 'condition': 'is', 'value': 'Option 0', 'trigger': 'display_message',
+             'message': 'Check the seams'},
+        ]
+        question.save()
+        response = self.submit(
+            answers={str(question.id): 'Option 0', '999999': 'unknown question', 'abc': 'not an id'},
+            conditional_answers={f'{question.id}_r1_conditional': 'Loose threads: sleeve'},
+            conditional_evidence={f'{question.id}_r2': 'data:image/png;base64,AAAA'},
+            display_messages={str(question.id): 'Sent by the client'},
+        )
+        self.assertEqual(response.status_code, 201)
+        inspection_id = response.json()['inspection_id']
+
+        kinds = sorted(ResponseModel.objects.filter(inspection_responses__inspection_id=inspection_id)
+                       .values_list('kind', flat=True))
+        self.assertEqual(kinds, ['answer', 'conditional_answer', 'display_message', 'evidence'])
+        self.assertFalse(ResponseModel.objects.filter(text_response__startswith='CONDITIONAL_').exists())
+
+        report = self.client.get(f'/api/users/inspection/{inspection_id}/').json()
+        self.assertEqual(report['answers'], {str(question.id): 'Option 0'})
+        self.assertEqual(report['conditional_answers'], {f'{question.id}_r1_conditional': 'Loose threads: sleeve'})
+        self.assertEqual(report['conditional_evidence'], {f'{question.id}_r2': 'data:image/png;base64,AAAA'})
+        self.assertEqual(report['display_messages'], {str(question.id): 'Check the seams'})
+
+    def test_retry_with_same_submission_key_returns_original_inspection(self):
+        answers = {str(self.questions[0].id): 'Option 0'}
+        first = self.submit(answers=answers, submission_key='form-1')
+        self.assertEqual(first.status_code, 201)
+
+        with CaptureQueriesContext(connection) as queries:
+            retry = self.submit(answers=answers, submission_key='form-1')
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry.json()['inspection_id'], first.json()['inspection_id'])
+        self.assertFalse(any(query['sql'].startswith('INSERT') for query in queries.captured_queries))
+        self.assertEqual(Inspection.objects.count(), 1)
+        self.assertEqual(ResponseModel.objects.count(), 1)
+
+        other = Template.objects.create(user=self.inspector, title='Other')
+        conflict = self.client.post('/api/users/submit-inspection/', {'template_id': other.id, 'answers': {}},
+                                    content_type='application/json', HTTP_IDEMPOTENCY_KEY='form-1')
+        self.assertEqual(conflict.status_code, 409)
+
+    def test_report_loads_in_constant_queries(self):
+        def report_queries(inspection_id):
+            inspection = report_inspection_queryset().get(id=inspection_id)
+            with CaptureQueriesContext(connection) as queries:
+                report = build_inspection_report(inspection)
+            return len(queries), report
+
+        Question.objects.filter(id=self.questions[1].id).update(logic_rules=[
+            {'id': 'r1', 'condition': 'contains', 'value': 'A', 'trigger': 'display_message', 'message': 'Note'}
+        ])
+        small = self.submit(answers={str(self.questions[0].id): 'Option 0'}).json()['inspection_id']
+        answers = {str(question.id): json.dumps(['A', 'B']) for question in self.questions}
+        large = self.submit(answers=answers).json()
+
+        small_count, _ = report_queries(small)
+        large_count, report = report_queries(large['inspection_id'])
+        self.assertEqual(small_count, large_count)
+        self.assertLessEqual(large_count, 4)
+        self.assertEqual(report['answers'][str(self.questions[5].id)], ['A', 'B'])
+        self.assertEqual(sum(len(section['questions']) for section in report['template']['sections']), 300)
+        self.assertEqual(report['display_messages'], {str(self.questions[1].id): 'Note'})
+
+    def test_completed_report_is_a_frozen_snapshot_with_etag(self):
+        question = self.questions[0]
+        inspection_id = self.submit(answers={str(question.id): 'Option 0'}).json()['inspection_id']
+        self.assertTrue(InspectionReportSnapshot.objects.filter(inspection_id=inspection_id).exists())
+
+        # Later template edits don't reach the submitted report
+        Question.objects.filter(id=question.id).update(text='Renamed')
+        url = f'/api/users/inspection/{inspection_id}/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        report = json.loads(response.content)
+        self.assertEqual(report['template']['sections'][0]['questions'][0]['text'], 'Question 0')
+        self.assertEqual(report['answers'], {str(question.id): 'Option 0'})
+
+        with CaptureQueriesContext(connection) as queries:
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertLessEqual(len([q for q in queries.captured_queries if 'inspection_report_snapshots' in q['sql']]), 1)
+
+        compressed = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(compressed.content)), report)
+
+    def test_snapshot_logo_url_is_built_for_the_viewing_host(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        buffer = io.BytesIO()
+        Image.new('RGB', (800, 400), 'red').save(buffer, format='PNG')
+
+        with override_settings(MEDIA_ROOT=media_root, ALLOWED_HOSTS=['testserver', 'reports.example.com']):
+            self.template.logo = ContentFile(buffer.getvalue(), name='logo.png')
+            self.template.save()
+            report_logo = self.template.logo_renditions['report']
+            inspection_id = self.submit(answers={str(self.questions[0].id): 'Option 0'}).json()['inspection_id']
+
+            # The snapshot keeps the storage name, not the submitting request's host
+            snapshot = InspectionReportSnapshot.objects.get(inspection_id=inspection_id)
+            self.assertEqual(decode_report(snapshot)['template']['logo'], report_logo)
+
+            url = f'/api/users/inspection/{inspection_id}/'
+            for host in ('testserver', 'reports.example.com'):
+                report = json.loads(self.client.get(url, HTTP_HOST=host).content)
+                self.assertEqual(report['template']['logo'], f'http://{host}/media/{report_logo}')
+
+
+class TemplatePatchTests(TestCase):
+    """Saving a template from the builders never drops past inspections' answers"""
+
+    def setUp(self):
+        self.owner = create_user('owner@example.com')
+        self.client.force_login(self.owner)
+        self.template = create_template(self.owner, sections=1, questions=2, options=2)
+        self.section = self.template.sections.get()
+        self.answered, self.unanswered = self.section.questions.order_by('order')
+        response = self.client.post('/api/users/submit-inspection/', {
+            'template_id': self.template.id, 'answers': {str(self.answered.id): 'Option 0'},
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.inspection_id = response.json()['inspection_id']
+        self.chosen = self.answered.options.get(text='Option 0')
+        ResponseModel.objects.filter(question=self.answered).update(choice_response=self.chosen)
+
+    def patch(self, sections):
+        return self.client.patch(f'/api/users/templates/{self.template.id}/', {'sections': sections},
+                                 content_type='application/json')
+
+    def test_client_generated_ids_keep_stored_rows_and_answers(self):
+        response = self.patch([{'id': 'sec-1', 'title': 'Rebuilt', 'questions': [
+            {'id': 'q-1', 'text': 'New question', 'responseType': 'Text'},
+        ]}])
+        self.assertEqual(response.status_code, 200)
+        # The removed unanswered question goes; the answered one (and its section) stays
+        self.assertEqual(response.json()['diff']['questions']['deleted'], 1)
+        self.assertFalse(Question.objects.filter(id=self.unanswered.id).exists())
+        self.assertTrue(Question.objects.filter(id=self.answered.id).exists())
+        self.assertTrue(Section.objects.filter(id=self.section.id).exists())
+        self.assertEqual(ResponseModel.objects.filter(question=self.answered).count(), 1)
+        report = self.client.get(f'/api/users/inspection/{self.inspection_id}/').json()
+        self.assertEqual(report['answers'], {str(self.answered.id): 'Option 0'})
+
+    def test_renamed_options_do_not_take_over_answered_rows(self):
+        response = self.patch([{'id': self.section.id, 'title': 'Section', 'questions': [
+            {'id': self.answered.id, 'text': 'Edited', 'responseType': 'Multiple choice',
+             'options': ['Option 1', 'Renamed']},
+            {'id': self.unanswered.id, 'text': 'Question 1', 'responseType': 'Multiple choice',
+             'options': ['Option 0']},
+        ]}])
+        self.assertEqual(response.status_code, 200)
+        self.answered.refresh_from_db()
+        self.assertEqual(self.answered.text, 'Edited')
+        self.chosen.refresh_from_db()
+        self.assertEqual(self.chosen.text, 'Option 0')
+        self.assertEqual(sorted(self.answered.options.values_list('text', flat=True)),
+                         ['Option 0', 'Option 1', 'Renamed'])
+        self.assertEqual(list(self.unanswered.options.values_list('text', flat=True)), ['Option 0'])
+
+    def test_garment_templates_patch_through_the_garment_parser(self):
+        self.template.template_type = 'garment'
+        self.template.save()
+        self.section.is_garment_section = True
+        self.section.save()
+
+        # The garment builder sends snake_case keys
+        response = self.patch([{'id': self.section.id, 'title': 'Garment', 'type': 'garmentDetails', 'content': {
+            'aql_settings': {'aql_level': '4.0', 'inspection_level': 'II'}, 'sizes': ['S', 'M'],
+        }}])
+        self.assertEqual(response.status_code, 200)
+        self.section.refresh_from_db()
+        self.assertTrue(self.section.is_garment_section)
+        self.assertEqual((self.section.aql_level, self.section.sizes), ('4.0', ['S', 'M']))
+        self.assertEqual(ResponseModel.objects.filter(question=self.answered).count(), 1)
+
+        # Re-saving through the garment create endpoint updates in place too
+        response = self.client.post('/api/users/garment-template/', {
+            'id': self.template.id, 'title': 'Garment', 'sections': json.dumps([
+                {'id': self.section.id, 'title': 'Garment', 'type': 'garmentDetails', 'content': {}},
+                {'id': 'sec-new', 'title': 'Checks', 'type': 'standard', 'content': {'questions': [{'text': 'New'}]}},
+            ]),
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Section.objects.filter(id=self.section.id).exists())
+        self.assertEqual(ResponseModel.objects.filter(question=self.answered).count(), 1)
+        self.assertTrue(Question.objects.filter(section__template=self.template, text='New').exists())
+
+
+class InspectionPdfTests(TestCase):
+    """Reports render to PDF on the server, cached per updated_at and bundled into a streamed ZIP"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, REPORT_PDF_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.inspector = create_user('inspector@example.com', role='inspector')
+        self.client.force_login(self.inspector)
+        self.template = create_template(self.inspector, sections=1, questions=3, options=0)
+        Section.objects.filter(template=self.template).update(
+            is_garment_section=True, sizes=['S', 'M'], colors=['RED'])
+        self.question = Question.objects.filter(section__template=self.template).first()
+
+    def submit(self):
+        garment_data = {
+            'quantities': {'RED': {'S': {'orderQty': '10', 'offeredQty': '8'}}},
+            'defects': [{'type': 'Stitching', 'remarks': 'Loose <threads>', 'critical': 0, 'major': 2, 'minor': 1}],
+            'aqlSettings': {'aqlLevel': '2.5', 'inspectionLevel': 'II', 'status': 'FAIL'},
+        }
+        response = self.client.post('/api/users/submit-inspection/', {
+            'template_id': self.template.id, 'answers': {str(self.question.id): 'Option 0'},
+            'garment_data': garment_data,
+        }, content_type='application/json')
+        return response.json()['inspection_id']
+
+    def test_pdf_is_rendered_once_and_cached(self):
+        inspection = Inspection.objects.get(id=self.submit())
+        response = self.client.get(f'/api/users/inspection/{inspection.id}/pdf/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF'))
+        self.assertTrue(default_storage.exists(cache_name(inspection)))
+
+        with mock.patch('users.pdf_reports.render_report_pdf') as render:
+            cached = self.client.get(f'/api/users/inspection/{inspection.id}/pdf/')
+        render.assert_not_called()
+        self.assertEqual(cached.content, response.content)
+
+    def test_bulk_download_streams_a_zip_of_reports(self):
+        ids = [self.submit(), self.submit()]
+        with override_settings(REPORT_PDF_WORKERS=1):
+            response = self.client.post('/api/users/inspections/pdf/', {'inspection_ids': ids},
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            content = b''.join(response.streaming_content)
+
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertEqual(archive.namelist(), [f'inspection_{i}.pdf' for i in sorted(ids)])
+            self.assertTrue(all(archive.read(name).startswith(b'%PDF') for name in archive.namelist()))
+
+        bad = self.client.post('/api/users/inspections/pdf/', {'inspection_ids': 'all'},
+                               content_type='application/json')
+        self.assertEqual(bad.status_code, 400)
+
+    def test_reports_of_other_templates_are_refused(self):
+        own = self.submit()
+        other_owner = create_user('other@example.com')
+        other_template = create_template(other_owner, sections=1, questions=1, options=0)
+        other = Inspection.objects.create(template=other_template, title='Other', status='completed')
+
+        self.assertEqual(self.client.get(f'/api/users/inspection/{other.id}/pdf/').status_code, 403)
+        with mock.patch('users.pdf_reports.render_report_pdf') as render:
+            response = self.client.post('/api/users/inspections/pdf/', {'inspection_ids': [own, other.id]},
+                                        content_type='application/json')
+        render.assert_not_called()
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json()['inspection_ids'], [other.id])
+
+        # Viewer access to the other template is enough
+        TemplateAccess.objects.create(template=other_template, user=self.inspector, permission_level='viewer')
+        self.assertEqual(self.client.get(f'/api/users/inspection/{other.id}/pdf/').status_code, 200)
+
+
+class InspectionExportTests(TestCase):
+    """Template results export as one row per inspection, streamed as CSV or written as XLSX"""
+
+    def setUp(self):
+        self.creator = create_user('creator@example.com', role='inspector')
+        self.client.force_login(self.creator)
+        self.template = create_template(self.creator, sections=1, questions=2, options=0)
+        self.questions = list(Question.objects.filter(section__template=self.template).order_by('order', 'id'))
+
+    def submit(self, answer, defects):
+        response = self.client.post('/api/users/submit-inspection/', {
+            'template_id': self.template.id,
+            'answers': {str(self.questions[0].id): answer},
+            'garment_data': {'quantities': {'RED': {'S': {'offeredQty': '100'}}}, 'defects': defects,
+                             'aqlSettings': {'status': 'PASS'}},
+        }, content_type='application/json')
+        return response.json()['inspection_id']
+
+    def export(self, **params):
+        return self.client.get(f'/api/users/template/{self.template.id}/inspections/export/', params)
+
+    def test_csv_streams_one_row_per_inspection(self):
+        first = self.submit('Option 0', [{'type': 'Stain', 'critical': 1, 'major': '2', 'minor': 0},
+                                         {'type': 'Hole', 'critical': 0, 'major': 1, 'minor': 3}])
+        second = self.submit('Option 1', [])
+
+        # Batches of one exercise the per-chunk answer lookup
+        with mock.patch.object(inspection_export, 'EXPORT_CHUNK_SIZE', 1):
+            response = self.export()
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            content = b''.join(response.streaming_content).decode('utf-8-sig')
+
+        rows = list(csv.reader(io.StringIO(content)))
+        self.assertEqual(rows[0][-4:], inspection_export.GARMENT_COLUMNS)
+        self.assertEqual(len(rows[0]), len(inspection_export.INSPECTION_COLUMNS) + 2 + 4)
+        self.assertEqual([row[0] for row in rows[1:]], [str(first), str(second)])
+        answer_column = len(inspection_export.INSPECTION_COLUMNS)
+        # The critical defect fails the first; the client's PASS is not trusted
+        self.assertEqual(rows[1][answer_column:], ['Option 0', '', 'FAIL', '1', '3', '3'])
+        self.assertEqual(rows[2][answer_column:], ['Option 1', '', 'PASS', '0', '0', '0'])
+
+    def test_xlsx_and_date_range(self):
+        old = self.submit('Option 0', [])
+        Inspection.objects.filter(id=old).update(conducted_at=timezone.now() - timedelta(days=30))
+        recent = self.submit('Option 1', [{'critical': 2}])
+
+        response = self.export(type='xlsx', start=(timezone.now() - timedelta(days=7)).date().isoformat())
+        self.assertEqual(response.status_code, 200)
+        workbook = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)
+        rows = list(workbook['Inspections'].iter_rows(values_only=True))
+        self.assertEqual([row[0] for row in rows[1:]], [recent])
+        self.assertEqual(rows[1][-3:], (2, 0, 0))
+
+        self.assertEqual(self.export(type='pdf').status_code, 400)
+        self.assertEqual(self.export(start='yesterday').status_code, 400)
+
+    def test_only_the_creator_or_an_admin_can_export(self):
+        self.client.force_login(create_user('other@example.com', role='inspector'))
+        self.assertEqual(self.export().status_code, 403)
+
+
+class AqlEngineTests(TestCase):
+    """The server computes the AQL verdict from the template's garment section"""
+
+    def test_lookup_tables(self):
+        self.assertIsNone(aql.code_letter(1, 'II'))
+        self.assertEqual(aql.code_letter(8, 'II'), 'B')
+        self.assertEqual(aql.code_letter(9, 'II'), 'C')
+        self.assertEqual(aql.code_letter(1200, 'I'), 'J')
+        self.assertEqual(aql.code_letter(35000, 'III'), 'P')
+        self.assertIsNone(aql.code_letter(35001, 'II'))
+        self.assertEqual(aql.sample_plan('K', '2.5'), (125, 7, 8))
+        self.assertIsNone(aql.sample_plan('N', '2.5'))  # not tabulated, so the lot fails
+        self.assertIsNone(aql.sample_plan('K', '0.65'))
+
+    def test_verdict(self):
+        garment_data = {
+            'quantities': {'RED': {'S': {'offeredQty': '300'}, 'M': {'offeredQty': 200}},
+                           'BLUE': {'S': {'offeredQty': '700'}}},
+            'defects': [{'major': '4', 'minor': 10}, {'major': 3, 'minor': '4'}],
+        }
+        verdict = aql.evaluate(garment_data)
+        self.assertEqual((verdict['lotSize'], verdict['codeLetter'], verdict['sampleSize']), (1200, 'K', 125))
+        self.assertEqual(verdict['status'], aql.STATUS_PASS)  # 7 majors <= 7, 14 minors <= 14
+        self.assertEqual(verdict['defects'], {'critical': 0, 'major': 7, 'minor': 14})
+
+        section = Section(aql_level='1.5', inspection_level='II', colors=['RED'], sizes=['S', 'M'])
+        verdict = aql.evaluate(garment_data, section)
+        self.assertEqual((verdict['lotSize'], verdict['codeLetter'], verdict['accept']), (500, 'J', 3))
+        self.assertEqual(verdict['status'], aql.STATUS_FAIL)
+
+        garment_data['defects'].append({'critical': 1})
+        self.assertEqual(aql.evaluate(garment_data)['status'], aql.STATUS_FAIL)
+
+        # Policy overrides, and junk in the stored settings falls back to the defaults
+        verdict = aql.evaluate({'quantities': {'A': {'S': {'offeredQty': 'inf'}, 'M': {'offeredQty': 100}}},
+                                'aqlSettings': 'PASS'}, aql_level='4.0', inspection_level='III')
+        self.assertEqual((verdict['lotSize'], verdict['codeLetter'], verdict['accept']), (100, 'H', 5))
+
+    def test_submission_stores_the_server_verdict(self):
+        user = create_user('inspector@example.com', role='inspector')
+        self.client.force_login(user)
+        template = create_template(user, sections=1, questions=1, options=0)
+        Section.objects.filter(template=template).update(
+            is_garment_section=True, aql_level='2.5', inspection_level='II', sizes=['S'], colors=['RED'])
+
+        response = self.client.post('/api/users/submit-inspection/', {
+            'template_id': template.id, 'answers': {},
+            'garment_data': {'quantities': {'RED': {'S': {'offeredQty': '100'}}},
+                             'defects': [{'major': 1}], 'aqlSettings': {'status': 'FAIL', 'note': 'kept'}},
+        }, content_type='application/json')
+        inspection = Inspection.objects.get(id=response.json()['inspection_id'])
+        settings = inspection.garment_data['aqlSettings']
+        self.assertEqual((settings['status'], settings['codeLetter'], settings['note']), ('PASS', 'G', 'kept'))
+
+        report = build_inspection_report(inspection)
+        self.assertEqual(report['aql_verdict']['status'], 'PASS')
+        self.assertEqual(report['aql_verdict']['sampleSize'], 32)
+
+    def test_reevaluate_command_writes_changed_verdicts(self):
+        user = create_user('admin@example.com')
+        template = create_template(user, sections=1, questions=0, options=0)
+        Section.objects.filter(template=template).update(is_garment_section=True, aql_level='2.5')
+        garment_data = {'quantities': {'RED': {'S': {'offeredQty': 100}}}, 'defects': [{'major': 2}],
+                        'aqlSettings': {'status': 'PASS'}}
+        inspections = [Inspection.objects.create(template=template, title=f'Lot {i}', garment_data=garment_data)
+                       for i in range(3)]
+        Inspection.objects.create(template=template, title='No garment data')
+
+        # 2 majors pass at 2.5 (G, Ac 2) but fail at 1.5 (Ac 1)
+        out = io.StringIO()
+        call_command('reevaluate_aql', '--aql-level', '1.5', '--dry-run', stdout=out)
+        self.assertIn('Would change 3 of 3 verdicts (0 now PASS, 3 now FAIL)', out.getvalue())
+        self.assertEqual(Inspection.objects.get(id=inspections[0].id).garment_data, garment_data)
+
+        call_command('reevaluate_aql', '--aql-level', '1.5', '--chunk-size', '2', stdout=io.StringIO())
+        for inspection in Inspection.objects.filter(id__in=[i.id for i in inspections]):
+            settings = inspection.garment_data['aqlSettings']
+            self.assertEqual((settings['status'], settings['aqlLevel'], settings['accept']), ('FAIL', '1.5', 1))
+
+        # Under the template's own policy they pass again; a second run changes nothing
+        call_command('reevaluate_aql', '--template', str(template.id), stdout=io.StringIO())
+        self.assertEqual(Inspection.objects.get(id=inspections[0].id).garment_data['aqlSettings']['status'], 'PASS')
+        out = io.StringIO()
+        call_command('reevaluate_aql', stdout=out)
+        self.assertIn('Changed 0 of 3 verdicts', out.getvalue())
+
+    def test_reevaluate_command_rewrites_frozen_reports(self):
+        user = create_user('admin@example.com')
+        self.client.force_login(user)
+        template = create_template(user, sections=1, questions=1, options=0)
+        Section.objects.filter(template=template).update(is_garment_section=True, aql_level='2.5')
+        response = self.client.post('/api/users/submit-inspection/', {
+            'template_id': template.id, 'answers': {},
+            'garment_data': {'quantities': {'RED': {'S': {'offeredQty': 100}}}, 'defects': [{'major': 2}]},
+        }, content_type='application/json')
+        inspection = Inspection.objects.get(id=response.json()['inspection_id'])
+        etag = InspectionReportSnapshot.objects.get(inspection=inspection).etag
+        pdf_name = cache_name(inspection)
+
+        call_command('reevaluate_aql', '--aql-level', '1.5', stdout=io.StringIO())
+        inspection.refresh_from_db()
+        self.assertNotEqual(cache_name(inspection), pdf_name)
+        self.assertNotEqual(InspectionReportSnapshot.objects.get(inspection=inspection).etag, etag)
+
+        report = self.client.get(f'/api/users/inspection/{inspection.id}/').json()
+        self.assertEqual(report['aql_verdict']['status'], 'FAIL')
+        self.assertEqual(report['garment_data']['aqlSettings']['aqlLevel'], '1.5')
+        self.assertEqual(report['inspection']['updated_at'], inspection.updated_at.isoformat())
+
+
+class GarmentFactTests(TestCase):
+    """Garment data is projected into quantity and defect lines that stay in step with it"""
+
+    garment_data = {
+        'quantities': {'RED': {'S': {'orderQty': '120', 'offeredQty': '100'}, 'M': {'offeredQty': 50.0}},
+                       'BLUE': {'S': {'orderQty': 80, 'offeredQty': 'n/a'}}},
+        'defects': [{'type': 'Loose thread', 'remarks': 'Sleeve', 'major': '2', 'minor': 3},
+                    {'type': 'Stain', 'critical': 1}, 'not a defect'],
+        'cartonOffered': 10,
+    }
+
+    def setUp(self):
+        self.user = create_user('inspector@example.com', role='inspector')
+        self.template = create_template(self.user, sections=1, questions=0, options=0)
+
+    def test_submission_writes_fact_lines(self):
+        self.client.force_login(self.user)
+        response = self.client.post('/api/users/submit-inspection/', {
+            'template_id': self.template.id, 'answers': {}, 'garment_data': self.garment_data,
+        }, content_type='application/json')
+        inspection_id = response.json()['inspection_id']
+
+        quantities = GarmentQuantityLine.objects.filter(inspection_id=inspection_id)
+        self.assertEqual(sorted(quantities.values_list('color', 'size', 'order_qty', 'offered_qty')),
+                         [('BLUE', 'S', 80, 0), ('RED', 'M', 0, 50), ('RED', 'S', 120, 100)])
+        defects = GarmentDefectLine.objects.filter(inspection_id=inspection_id).order_by('id')
+        self.assertEqual(list(defects.values_list('defect_type', 'remarks', 'critical', 'major', 'minor')),
+                         [('Loose thread', 'Sleeve', 0, 2, 3), ('Stain', '', 1, 0, 0)])
+
+    def test_lines_follow_garment_data_updates(self):
+        inspection = Inspection.objects.create(template=self.template, title='Lot', garment_data=self.garment_data)
+        self.assertEqual(inspection.defect_lines.count(), 2)
+
+        inspection.garment_data = {**self.garment_data, 'defects': [{'type': 'Stain', 'minor': 1}]}
+        inspection.save(update_fields=['garment_data'])
+        self.assertEqual(list(inspection.defect_lines.values_list('defect_type', 'minor')), [('Stain', 1)])
+
+        # Saves that don't touch garment data leave the lines alone
+        with CaptureQueriesContext(connection) as queries:
+            inspection.save(update_fields=['title'])
+        self.assertEqual(len(queries), 1)
+
+        inspection.garment_data = None
+        inspection.save()
+        self.assertFalse(inspection.quantity_lines.exists())
+        self.assertFalse(inspection.defect_lines.exists())
+
+    def test_backfill_and_defect_aggregates(self):
+        other = create_template(self.user, sections=1, questions=0, options=0)
+        for index in range(3):
+            Inspection.objects.create(template=self.template, title=f'Lot {index}', garment_data=self.garment_data)
+        Inspection.objects.create(template=other, title='Other', garment_data=self.garment_data)
+        cleared = Inspection.objects.create(template=self.template, title='Cleared', garment_data=self.garment_data)
+        # Rows written around the model (bulk updates, older data) have no or stale lines
+        GarmentQuantityLine.objects.all().delete()
+        GarmentDefectLine.objects.all().delete()
+        Inspection.objects.filter(id=cleared.id).update(garment_data=None)
+        GarmentDefectLine.objects.create(inspection=cleared, defect_type='Stale')
+
+        out = io.StringIO()
+        call_command('backfill_garment_facts', '--template', str(self.template.id), '--chunk-size', '2', stdout=out)
+        self.assertIn('Wrote 9 quantity lines and 6 defect lines for 3 inspections', out.getvalue())
+        self.assertIn('1 stale lines removed', out.getvalue())
+
+        # Top defect types for a template, as one SQL aggregate
+        top = list(
+            GarmentDefectLine.objects.filter(inspection__template=self.template)
+            .values('defect_type')
+            .annotate(inspections=Count('inspection', distinct=True), major=Sum('major'), critical=Sum('critical'))
+            .order_by('-inspections', 'defect_type')
+        )
+        self.assertEqual(top, [
+            {'defect_type': 'Loose thread', 'inspections': 3, 'major': 6, 'critical': 0},
+            {'defect_type': 'Stain', 'inspections': 3, 'major': 0, 'critical': 3},
+        ])
+        self.assertEqual(GarmentQuantityLine.objects.aggregate(offered=Sum('offered_qty'))['offered'], 450)
+
+        call_command('backfill_garment_facts', stdout=io.StringIO())
+        self.assertEqual(GarmentQuantityLine.objects.count(), 12)
+        self.assertEqual(GarmentDefectLine.objects.count(), 8)
+
+
+class InspectionAnalyticsTests(TestCase):
+    """Analytics are read from daily rollups that are counted up as inspections complete"""
+
+    def setUp(self):
+        self.owner = create_user('owner@example.com')
+        self.inspector = create_user('inspector@example.com', role='inspector')
+        self.template = create_template(self.owner, sections=1, questions=0, options=0)
+        Section.objects.filter(template=self.template).update(
+            is_garment_section=True, aql_level='2.5', inspection_level='II', sizes=['S'], colors=['RED'])
+
+    def submit(self, defects):
+        self.client.force_login(self.inspector)
+        response = self.client.post('/api/users/submit-inspection/', {
+            'template_id': self.template.id, 'answers': {},
+            'garment_data': {'quantities': {'RED': {'S': {'offeredQty': 100}}}, 'defects': defects},
+        }, content_type='application/json')
+        return Inspection.objects.get(id=response.json()['inspection_id'])
+
+    def analytics(self, **params):
+        self.client.force_login(self.owner)
+        return self.client.get('/api/users/analytics/inspections/', params)
+
+    def test_rollups_follow_submissions_and_verdict_changes(self):
+        self.submit([{'type': 'Stain', 'major': 1, 'minor': 2}])
+        self.submit([{'type': 'Stain', 'major': 2}, {'type': 'Hole', 'critical': 1}])
+        failed = self.submit([{'type': 'Hole', 'major': 3}])  # 3 majors > Ac 2
+        Inspection.objects.filter(id=failed.id).update(site='Plant 2')
+
+        rollup = InspectionRollup.objects.get()
+        self.assertEqual(
+            (rollup.day, rollup.inspector, rollup.inspections, rollup.passed, rollup.failed,
+             rollup.critical, rollup.major, rollup.minor),
+            (timezone.localdate(), 'inspector@example.com', 3, 1, 2, 1, 6, 2),
+        )
+
+        data = self.analytics().json()
+        self.assertEqual(data['totals']['inspections'], 3)
+        self.assertEqual(data['totals']['pass_rate'], 33.3)
+        self.assertEqual(data['series'], [{**data['totals'], 'period': str(timezone.localdate())}])
+        self.assertEqual(
+            [(row['defect_type'], row['occurrences'], row['defects'], row['cumulative_percent'])
+             for row in data['defect_types']],
+            [('Stain', 2, 5, 55.6), ('Hole', 2, 4, 100.0)],
+        )
+
+        # Re-judging at a looser AQL moves the 3-major lot to passed
+        call_command('reevaluate_aql', '--aql-level', '4.0', stdout=io.StringIO())
+        totals = self.analytics(interval='month').json()['totals']
+        self.assertEqual((totals['passed'], totals['failed']), (2, 1))
+
+        # A rebuild from the inspections lands on the same numbers, split by site this time
+        incremental = self.analytics(breakdown='inspector').json()
+        call_command('rebuild_inspection_rollups', stdout=io.StringIO())
+        self.assertEqual(InspectionRollup.objects.count(), 2)
+        self.assertEqual(self.analytics(breakdown='inspector').json(), incremental)
+
+        by_site = {row['site']: row['inspections'] for row in self.analytics(breakdown='site').json()['breakdown']}
+        self.assertEqual(by_site, {'': 2, 'Plant 2': 1})
+        self.assertEqual(self.analytics(site='Plant 2').json()['totals']['failed'], 0)
+
+    def test_filters_and_access(self):
+        self.submit([{'type': 'Stain', 'minor': 1}])
+        self.assertEqual(self.analytics(start='2000-01-01', end='2000-12-31').json()['totals']['inspections'], 0)
+        self.assertEqual(self.analytics(template=self.template.id, interval='week').json()['totals']['inspections'], 1)
+        self.assertEqual(self.analytics(interval='year').status_code, 400)
+        self.assertEqual(self.analytics(start='yesterday').status_code, 400)
+        self.assertEqual(self.analytics(end='2024-02-30').status_code, 400)
+
+        # Inspectors only see rollups of their own templates
+        self.client.force_login(self.inspector)
+        response = self.client.get('/api/users/analytics/inspections/', {'template': self.template.id})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get('/api/users/analytics/inspections/')
+        self.assertEqual(response.json()['totals']['inspections'], 0)
+
+
+class DashboardCounterTests(TestCase):
+    """Dashboard counts are per user, maintained by signals and served without counting tables"""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = create_user('admin@example.com')
+        self.other = create_user('other@example.com')
+        self.inspector = create_user('inspector@example.com', role='inspector')
+        self.template = create_template(self.admin, sections=1, questions=0, options=0)
+        create_template(self.other, sections=1, questions=0, options=0)
+        Inspection.objects.create(template=self.template, title='Done', status='completed')
+        Inspection.objects.create(template=self.template, title='Draft')
+
+    def dashboard(self, user):
+        self.client.force_login(user)
+        return self.client.get('/api/users/dashboard/').json()
+
+    def counts(self, data):
+        return tuple(data[name] for name in dashboard_counters.COUNTERS)
+
+    def test_counts_are_scoped_and_kept_current(self):
+        data = self.dashboard(self.admin)
+        self.assertEqual(self.counts(data), (1, 1, 0, 0))
+        self.assertEqual(self.counts(data['global']), (2, 1, 0, 0))
+        self.assertNotIn('global', self.dashboard(self.inspector))
+
+        # Served from the cache: no COUNT over templates or inspections
+        with CaptureQueriesContext(connection) as queries:
+            self.dashboard(self.admin)
+        self.assertFalse([q for q in queries.captured_queries if 'COUNT' in q['sql']])
+
+        Template.objects.create(user=self.admin, title='Another')
+        Inspection.objects.create(template=self.template, title='Done too', status='completed')
+        self.assertEqual(self.counts(self.dashboard(self.admin)), (2, 2, 0, 0))
+        self.assertEqual(self.counts(self.dashboard(self.other)), (1, 0, 0, 0))
+
+        # Deleting a template takes its inspections with it
+        self.template.delete()
+        data = self.dashboard(self.admin)
+        self.assertEqual(self.counts(data), (1, 0, 0, 0))
+        self.assertEqual(self.counts(data['global']), (2, 0, 0, 0))
+
+    def test_assignment_counts_follow_status_and_due_dates(self):
+        self.dashboard(self.admin)
+        self.dashboard(self.inspector)
+        now = timezone.now()
+        overdue = TemplateAssignment.objects.create(
+            template=self.template, inspector=self.inspector, assigned_by=self.admin, due_date=now - timedelta(hours=1))
+        other_template = Template.objects.get(user=self.other)
+        upcoming = TemplateAssignment.objects.create(
+            template=other_template, inspector=self.inspector, assigned_by=self.other, due_date=now + timedelta(hours=1))
+        self.assertEqual(self.counts(self.dashboard(self.inspector))[2:], (2, 1))
+        self.assertEqual(self.counts(self.dashboard(self.admin))[2:], (1, 1))
+
+        counter = DashboardCounter.objects.get(user=self.inspector, name=dashboard_counters.OVERDUE_ASSIGNMENTS)
+        self.assertEqual(counter.valid_until, upcoming.due_date)
+
+        # Becoming overdue needs no write: the counter is recounted once its due date passes
+        cache.clear()
+        with mock.patch('users.dashboard_counters.timezone.now', return_value=now + timedelta(hours=2)):
+            self.assertEqual(self.counts(self.dashboard(self.inspector))[2:], (2, 2))
+
+        overdue.revoke()
+        self.assertEqual(self.counts(self.dashboard(self.admin))[2:], (0, 0))
+        upcoming.delete()
+        self.assertEqual(self.counts(self.dashboard(self.inspector))[2:], (0, 0))
+
+    def test_reconcile_repairs_drift(self):
+        self.dashboard(self.admin)
+        # Writes that bypass signals leave the counters behind
+        Inspection.objects.filter(title='Draft').update(status='completed')
+        self.assertEqual(self.counts(self.dashboard(self.admin)), (1, 1, 0, 0))
+
+        out = io.StringIO()
+        call_command('reconcile_dashboard_counters', '--dry-run', stdout=out)
+        self.assertIn('Would fix 2 drifted dashboard counters', out.getvalue())
+        self.assertIn(f'inspections_completed for {self.admin.id}: 1 -> 2', out.getvalue())
+
+        call_command('reconcile_dashboard_counters', stdout=io.StringIO())
+        data = self.dashboard(self.admin)
+        self.assertEqual(self.counts(data), (1, 2, 0, 0))
+        self.assertEqual(self.counts(data['global']), (2, 2, 0, 0))
+        out = io.StringIO()
+        call_command('reconcile_dashboard_counters', stdout=out)
+        self.assertIn('Fixed 0 drifted', out.getvalue())
+
+
+class LogicRuleEngineTests(TestCase):
+    """Logic rules are compiled once per question version and evaluated like the inspection page does"""
+
+    def setUp(self):
+        self.inspector = create_user('inspector@example.com', role='inspector')
+        self.client.force_login(self.inspector)
+        self.template = create_template(self.inspector, sections=1, questions=2, options=0)
+        self.number, self.choice = Question.objects.filter(section__template=self.template).order_by('order')
+        self.number.response_type = 'Number'
+        self.number.logic_rules = [
+            {'id': 'rule1', 'condition': 'greater than', 'value': 5, 'trigger': 'require_evidence',
+             'message': 'Please upload evidence for values greater than 5'},
+            {'id': 'rule2', 'condition': 'equal to', 'value': '10', 'trigger': 'display_message',
+             'message': 'Perfect score!'},
+        ]
+        self.number.save()
+        self.choice.logic_rules = [
+            {'id': 'r1', 'condition': 'is not', 'value': 'Pass', 'trigger': 'notify'},
+            {'id': 'r2', 'condition': 'is', 'value': 'Fail', 'trigger': 'ask_questions',
+             'subQuestion': {'text': 'What failed?', 'responseType': 'Text'}},
+            {'id': 'r3', 'condition': 'no such condition', 'value': 'Fail', 'trigger': 'display_message'},
+        ]
+        self.choice.save()
+
+    def test_conditions(self):
+        def matches(condition, rule_value, answer, response_type='Text'):
+            return logic_rules.compile_rules(
+                [{'condition': condition, 'value': rule_value}], response_type)[0].predicate(answer)
+
+        self.assertTrue(matches('greater than', '5', '5.5kg', 'Number'))  # parseFloat prefix
+        self.assertFalse(matches('greater than', 5, 'abc', 'Number'))
+        self.assertFalse(matches('greater than', 5, '7'))  # strings aren't numbers outside Number/Slider
+        self.assertTrue(matches('equal to', 10, '10.0', 'Slider'))
+        self.assertTrue(matches('is', 10, 10.0, 'Number'))
+        self.assertTrue(matches('is', 'Yes,No', ['Yes', 'No']))
+        self.assertTrue(matches('contains', 'thread', 'Loose threads'))
+        self.assertFalse(matches('not contains', 'thread', 'Loose threads'))
+        self.assertTrue(matches('not equal to', 'Pass', ['Pass']))
+        self.assertFalse(matches('less than or equal to', 3, '4', 'Number'))
+
+    def test_template_rules_compile_once_per_version(self):
+        answers = {str(self.number.id): '10', str(self.choice.id): 'Fail'}
+        results = logic_rules.evaluate_template_rules(self.template.id, answers)
+        self.assertEqual(results.required_evidence,
+                         {f'{self.number.id}_rule1': 'Please upload evidence for values greater than 5'})
+        self.assertEqual(results.display_messages, {
+            str(self.number.id): 'Perfect score!',
+            str(self.choice.id): '🔔 NOTIFICATION: Admin has been notified about answer: Fail',
+        })
+        self.assertEqual(results.conditional_questions, {f'{self.choice.id}_r2_conditional': 'What failed?'})
+
+        # Warm: only ids and versions are read
+        with CaptureQueriesContext(connection) as queries:
+            logic_rules.evaluate_template_rules(self.template.id, answers)
+        self.assertEqual(len(queries), 1)
+
+        self.number.logic_rules = [{'id': 'rule1', 'condition': 'less than', 'value': 5, 'trigger': 'display_message'}]
+        self.number.save()
+        with CaptureQueriesContext(connection) as queries:
+            results = logic_rules.evaluate_template_rules(self.template.id, {str(self.number.id): 3})
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(results.display_messages, {str(self.number.id): '✅ Condition met! You entered 3.'})
+
+    def test_submission_requires_evidence_and_derives_messages(self):
+        def submit(**data):
+            return self.client.post('/api/users/submit-inspection/', {
+                'template_id': self.template.id, 'answers': {str(self.number.id): 7}, **data,
+            }, content_type='application/json')
+
+        response = submit(display_messages={str(self.number.id): 'Looks fine'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['missing_evidence'],
+                         {f'{self.number.id}_rule1': 'Please upload evidence for values greater than 5'})
+        self.assertFalse(Inspection.objects.exists())
+
+        response = submit(conditional_evidence={f'{self.number.id}_rule1': 'data:image/png;base64,AAAA'},
+                          display_messages={str(self.number.id): 'Looks fine'})
+        self.assertEqual(response.status_code, 201)
+        report = self.client.get(f"/api/users/inspection/{response.json()['inspection_id']}/").json()
+        self.assertEqual(report['display_messages'], {
+            str(self.number.id): '📸 EVIDENCE REQUIRED: Please upload evidence for values greater than 5'
+        })
+
+
+class LogicRuleGraphTests(TestCase):
+    """A changed answer re-evaluates only the rules downstream of it; rule cycles are rejected on save"""
+
+    def setUp(self):
+        self.inspector = create_user('inspector@example.com', role='inspector')
+        self.client.force_login(self.inspector)
+        self.template = create_template(self.inspector, sections=1, questions=3, options=0)
+        self.number, self.choice, self.other = Question.objects.filter(
+            section__template=self.template).order_by('order')
+        self.number.response_type = 'Number'
+        self.number.logic_rules = [{'id': 'n1', 'condition': 'greater than', 'value': 5,
+                                    'trigger': 'require_evidence', 'message': 'Photo please'}]
+        self.number.save()
+        # Fail asks a follow-up, whose own rule acts on the number question
+        self.choice.logic_rules = [{
+            'id': 'c1', 'condition': 'is', 'value': 'Fail', 'trigger': 'ask_questions',
+            'subQuestion': {'text': 'What failed?', 'responseType': 'Text', 'logicRules': [
+                {'id': 's1', 'condition': 'contains', 'value': 'seam', 'trigger': 'require_action',
+                 'message': 'Measure the seam', 'targetElementId': str(self.number.id)},
+            ]},
+        }]
+        self.choice.save()
+        self.other.logic_rules = [{'id': 'o1', 'condition': 'is', 'value': 'Yes', 'trigger': 'notify'}]
+        self.other.save()
+        self.follow_up = f'{self.choice.id}_c1_conditional'
+
+    def test_downstream_keys_and_cache(self):
+        graph = logic_graph.template_graph(self.template.id)
+        self.assertEqual(graph.downstream(str(self.choice.id)),
+                         [str(self.choice.id), self.follow_up, str(self.number.id)])
+        self.assertEqual(graph.downstream(str(self.number.id)), [str(self.number.id)])
+        self.assertIsNone(graph.find_cycle())
+
+        # Cached until one of the template's questions changes
+        with CaptureQueriesContext(connection) as queries:
+            self.assertIs(logic_graph.template_graph(self.template.id), graph)
+        self.assertEqual(len(queries), 1)
+        self.other.logic_rules = None
+        self.other.save()
+        rebuilt = logic_graph.template_graph(self.template.id)
+        self.assertIsNot(rebuilt, graph)
+        self.assertNotIn(str(self.other.id), rebuilt.rules)
+
+    def test_live_validation_returns_only_affected_rules(self):
+        url = f'/api/users/template/{self.template.id}/logic/validate/'
+        answers = {str(self.number.id): 7, str(self.choice.id): 'Fail', str(self.other.id): 'Yes'}
+
+        response = self.client.post(url, {
+            'changed': self.choice.id, 'answers': answers, 'conditional_answers': {self.follow_up: 'Open seam'},
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['affected'], [str(self.choice.id), self.follow_up, str(self.number.id)])
+        self.assertEqual(body['conditional_questions'], {self.follow_up: 'What failed?'})
+        self.assertEqual(body['display_messages'], {
+            self.follow_up: '⚠️ ACTION REQUIRED: Measure the seam',
+            str(self.number.id): '📸 EVIDENCE REQUIRED: Photo please',
+        })
+        self.assertEqual(body['missing_evidence'], {f'{self.number.id}_n1': 'Photo please'})
+        self.assertEqual(body['notifications'], {})  # the other question isn't downstream
+
+        response = self.client.post(url, {'answers': answers}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_login(create_user('stranger@example.com', role='inspector'))
+        response = self.client.post(url, {'changed': self.choice.id, 'answers': answers},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_saved_targets_point_at_database_ids(self):
+        admin = create_user('admin@example.com')
+        self.client.force_login(admin)
+
+        def question(question_id, text, rules):
+            return {'id': question_id, 'text': text, 'responseType': 'Text', 'logicRules': rules}
+
+        check = question('tmp-1', 'Check', [{'id': 'r1', 'condition': 'is', 'value': 'Fail', 'trigger': 'notify',
+                                             'targetElementId': 'tmp-2'}])
+        photo = question('tmp-2', 'Photo', [{'id': 'r2', 'condition': 'is', 'value': 'Torn',
+                                             'trigger': 'require_evidence', 'message': 'Photo please'}])
+        response = self.client.post('/api/users/create_templates/', {
+            'title': 'Targets', 'sections': json.dumps([{'id': 'tmp-s', 'title': 'S', 'questions': [check, photo]}]),
+        }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        template_id = response.json()['id']
+        first, second = Question.objects.filter(section__template_id=template_id).order_by('order', 'id')
+        self.assertEqual(first.logic_rules[0]['targetElementId'], str(second.id))
+
+        response = self.client.post(f'/api/users/template/{template_id}/logic/validate/', {
+            'changed': first.id, 'answers': {str(first.id): 'Fail', str(second.id): 'Torn'},
+        }, content_type='application/json')
+        self.assertEqual(response.json()['affected'], [str(first.id), str(second.id)])
+        self.assertEqual(response.json()['missing_evidence'], {f'{second.id}_r2': 'Photo please'})
+
+        # An edit that targets a question added in the same save
+        section_id = first.section_id
+        photo.update(id=second.id, logicRules=[{'id': 'r2', 'condition': 'is', 'value': 'Torn',
+                                                'trigger': 'notify', 'targetElementId': 'tmp-3'}])
+        check.update(id=first.id, logicRules=first.logic_rules)
+        response = self.client.patch(f'/api/users/templates/{template_id}/', {'sections': [
+            {'id': section_id, 'title': 'S', 'questions': [check, photo, question('tmp-3', 'Repair', [])]},
+        ]}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        added = Question.objects.get(section_id=section_id, text='Repair')
+        second.refresh_from_db()
+        self.assertEqual(second.logic_rules[0]['targetElementId'], str(added.id))
+        self.assertEqual(logic_graph.template_graph(template_id).downstream(str(first.id)),
+                         [str(first.id), str(second.id), str(added.id)])
+
+    def test_rule_cycles_are_rejected_on_save(self):
+        def question(question_id, target):
+            return {'id': question_id, 'text': 'Q', 'responseType': 'Text', 'logicRules': [
+                {'id': 'r', 'condition': 'is', 'value': 'x', 'trigger': 'display_message', 'targetElementId': target},
+            ]}
+
+        with self.assertRaisesMessage(TemplatePayloadError, 'Logic rules form a cycle: a -> b -> a'):
+            parse_standard_sections([{'title': 'S', 'questions': [question('a', 'b'), question('b', 'a')]}])
+        # A chain is fine
+        parse_standard_sections([{'title': 'S', 'questions': [question('a', 'b'), question('b', 'c')]}])
@@ -14,15 +14,19 @@ from .granular_permission_views import (
     PermissionTypeListView, GranularPermissionListView, GranularPermissionDetailView
 )
 from .audit_log_views import (
-    TemplateAuditLogView, UserAuditLogView, recent_audit_logs
+    TemplateAuditLogView, UserAuditLogView, recent_audit_logs, audit_writer_metrics
 )
 from .template_assignment_views import (
     TemplateAssignmentListView, TemplateAssignmentDetailView,
     InspectorAssignmentsView, start_assignment, complete_assignment,
     revoke_assignment, reassign_template
 )
+from .analytics_views import inspection_analytics
 from .inspector_views import InspectorListView, get_inspectors
-from .inspection_views import submit_inspection, get_inspection, get_template_inspections, get_assignment_inspection
+from .inspection_views import (
+    submit_inspection, get_inspection, get_template_inspections, get_assignment_inspection,
+    get_inspection_pdf, bulk_inspection_pdfs, export_template_inspections, validate_logic_rules
+)
 
 
 urlpatterns = [
@@ -83,6 +87,8 @@ urlpatterns = [
          UserAuditLogView.as_view(), name="my-audit-logs"),
     path("recent-audit-logs/",
          recent_audit_logs, name="recent-audit-logs"),
+    path("audit-logs/writer-metrics/",
+         audit_writer_metrics, name="audit-writer-metrics"),
 
     # Template assignment endpoints
     path("template-assignments/",
@@ -129,9 +135,21 @@ urlpatterns = [
          submit_inspection, name="api-submit-inspection"),
     path("inspection/<int:inspection_id>/",
          get_inspection, name="api-get-inspection"),
+    path("inspection/<int:inspection_id>/pdf/",
+         get_inspection_pdf, name="api-get-inspection-pdf"),
+    path("inspections/pdf/",
+         bulk_inspection_pdfs, name="api-bulk-inspection-pdfs"),
     path("template/<int:template_id>/inspections/",
          get_template_inspections, name="api-get-template-inspections"),
+    path("template/<int:template_id>/inspections/export/",
+         export_template_inspections, name="api-export-template-inspections"),
+    path("template/<int:template_id>/logic/validate/",
+         validate_logic_rules, name="api-validate-logic-rules"),
     path("assignment/<int:assignment_id>/inspection/",
          get_assignment_inspection, name="api-get-assignment-inspection"),
+
+    # Analytics endpoints
+    path("analytics/inspections/",
+         inspection_analytics, name="api-inspection-analytics"),
 ]
 
@@ -3,13 +3,21 @@ from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
 from django.contrib.auth import authenticate, login, logout
 from django.http import JsonResponse
-from .serializers import UserRegistrationSerializer, TemplateSerializer
+from .serializers import UserRegistrationSerializer, TemplateSerializer, TemplateSummarySerializer
 from django.contrib.auth.decorators import login_required
 from django.utils.decorators import method_decorator
 from rest_framework import status, viewsets
 from rest_framework.decorators import action, api_view, permission_classes, parser_classes
-from .models import Template, Section, Question, Inspection
+from .models import Template, Section, Question
+from .querysets import plan_template_queryset, plan_template_summary_queryset
+from .pagination import KeysetPagination
+from .dashboard_counters import dashboard_counters
+from .permission_resolver import get_permission_resolver
+from .template_persistence import (
+    TemplateWriter, TemplatePayloadError, parse_standard_sections, parse_garment_sections
+)
 from rest_framework.parsers import MultiPartParser
+from django.db import transaction
 import json
 from django.shortcuts import get_object_or_404, render
 from rest_framework.generics import RetrieveAPIView
@@ -111,7 +119,7 @@ def login_user(request):
 def templates_api(request):
     if request.method == "GET":
         templates = Template.objects.all()
-        serializer = TemplateSerializer(templates, many=True)
+        serializer = TemplateSerializer(templates, many=True, context={'request': request})
         return Response(serializer.data)
 
     if request.method == "POST":
@@ -175,18 +183,18 @@ def templates_api(request):
 class DashboardAPI(APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request):
-        templates_created = Template.objects.count()
-        inspections_completed = Inspection.objects.filter(status="Completed").count()
-
+        # The user's own counts (and everyone's, for admins), kept current by
+        # signals and cached, so loading the dashboard doesn't COUNT any table
         data = {
-            "templates_created": templates_created,
-            "inspections_completed": f"{inspections_completed}/25",
+            **dashboard_counters(request.user.id),
             "open_issues": 3,  # Example, this can be dynamic too
             "recent_activity": [
                 {"id": 1, "title": "Safety Inspection", "type": "Template", "date": "2024-03-01", "status": "Completed"},
                 {"id": 2, "title": "Monthly Equipment Check", "type": "Inspection", "date": "2024-02-28", "status": "In Progress"}
             ]
         }
+        if request.user.user_role == 'admin':
+            data["global"] = dashboard_counters()
         return Response(data)
 
 
@@ -205,10 +213,14 @@ class TemplateAPI(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        # Only return templates that the user has access to
-        templates = Template.objects.filter(user=request.user)
-        serializer = TemplateSerializer(templates, many=True)
-        response = Response(serializer.data)
+        # Only return templates that the user has access to. Lists carry the
+        # summary only; the full tree comes from TemplateDetailView.
+        paginator = KeysetPagination()
+        templates = paginator.paginate_queryset(
+            plan_template_summary_queryset(Template.objects.filter(user=request.user)), request
+        )
+        serializer = TemplateSummarySerializer(templates, many=True, context={'request': request})
+        response = paginator.add_link_header(Response(serializer.data))
 
         # Add cache-control headers to ensure fresh data
         response['Cache-Control'] = 'no-cache, no-store, must-revalidate'
@@ -269,109 +281,31 @@ class TemplateCreateView(APIView):
             except Exception:
                 return Response({"error": "Invalid JSON in sections"}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Handle existing template or create new one
-            if template_id:
-                template = get_object_or_404(Template, id=template_id)
-                template.title = title
-                template.description = description
-                if logo_file:
-                    template.logo = logo_file
-                template.save()
-            else:
-                template = Template.objects.create(
-                        title=title,
-                        description=description,
-                        logo=logo_file,
-                        user=request.user,
-                    )
-
-            # Process sections and questions
-            for section_data in sections:
-                section_id = section_data.get("id")
-                section = None
-
-                if section_id and str(section_id).isdigit():
-                    try:
-                        section = Section.objects.get(id=section_id, template=template)
-                        section.title = section_data.get("title", section.title)
-                        section.description = section_data.get("description", section.description)
-                        section.order = section_data.get("order", section.order)
-                        section.is_collapsed = section_data.get("isCollapsed", section.is_collapsed)
-                        section.save()
-                    except Section.DoesNotExist:
-                        print(f"Section ID {section_id} not found; creating new section.")
-                        section = Section.objects.create(
-                            template=template,
-                            title=section_data.get("title"),
-                            description=section_data.get("description", ""),
-                            order=section_data.get("order", 0),
-                            is_collapsed=section_data.get("isCollapsed", False),
-                        )
-
+            # Validate the whole nested payload before writing anything
+            try:
+                section_plans = parse_standard_sections(sections or [])
+            except TemplatePayloadError as e:
+                return Response({"error": str(e)}, status=400)
+
+            with transaction.atomic():
+                # Handle existing template or create new one
+                if template_id:
+                    template = get_object_or_404(Template, id=template_id)
+                    template.title = title
+                    template.description = description
+                    if logo_file:
+                        template.logo = logo_file
+                    template.save()
                 else:
-                    # If no section ID is provided, create a new section
-                    section = Section.objects.create(
-                        template=template,
-                        title=section_data.get("title"),
-                        description=section_data.get("description", ""),
-                        order=section_data.get("order", 0),
-                        is_collapsed=section_data.get("isCollapsed", False),
-                    )
-
-
-                # Create/update questions for this section
-                for question_data in section_data.get("questions", []):
-                    # Check for response_type or responseType (handle both for compatibility)
-                    print(f"🔍 Processing question: {question_data}")
-                    print(f"🔍 Logic rules in question_data: {question_data.get('logicRules')}")
-                    response_type = question_data.get("response_type") or question_data.get("responseType")
-                    if not response_type:
-                        print(f"❌ Missing response_type for question: {question_data}")
-                        return Response({"error": f"response_type is required for question: {question_data}"}, status=400)
-
-                    question_id = question_data.get("id")
-                    if question_id and str(question_id).isdigit():
-                        question = Question.objects.filter(id=question_id, section=section).first()
-                        if question:
-                            question.text = question_data.get("text", question.text)
-                            question.response_type = response_type
-                            question.required = question_data.get("required", question.required)
-                            question.order = question_data.get("order", question.order)
-                            # Handle both camelCase and snake_case for logic_rules
-                            logic_rules = question_data.get("logic_rules") or question_data.get("logicRules")
-                            if logic_rules is not None:
-                                question.logic_rules = logic_rules
-                            question.flagged = question_data.get("flagged", question.flagged)
-                            question.multiple_selection = question_data.get("multipleSelection", question.multiple_selection)
-                            print(f"🔍 Saving question with logic_rules: {question.logic_rules}")
-                            question.save()
-                        else:
-                            print(f"❌ Question with id {question_id} not found in section {section.id}")
-                            return Response({"error": f"Question with id {question_id} not found."}, status=400)
-
-                    else:
-                        # Handle both camelCase and snake_case for logic_rules
-                        logic_rules_data = question_data.get("logic_rules") or question_data.get("logicRules")
-                        print(f"🔍 Creating new question with logic_rules: {logic_rules_data}")
-                        question = Question.objects.create(
-                            section=section,
-                            text=question_data.get("text"),
-                            response_type=response_type,
-                            required=question_data.get("required", False),
-                            order=question_data.get("order", 0),
-                            logic_rules=logic_rules_data,
-                            flagged=question_data.get("flagged", False),
-                            multiple_selection=question_data.get("multipleSelection", False),
+                    template = Template.objects.create(
+                            title=title,
+                            description=description,
+                            logo=logo_file,
+                            user=request.user,
                         )
-                        print(f"🔍 Created question with ID {question.id}, logic_rules: {question.logic_rules}")
 
-                        # Create options for multiple choice questions
-                        for o_index, option in enumerate(question_data.get("options", [])):
-                            QuestionOption.objects.create(
-                                question=question,
-                                text=option,
-                                order=o_index
-                            )
+                # Process sections and questions in bulk
+                TemplateWriter(template).write(section_plans)
 
             return Response({
                 "message": "Template saved successfully!",
@@ -407,7 +341,7 @@ class TemplateCreateView(APIView):
 
 
 class TemplateDetailView(RetrieveAPIView):
-    queryset = Template.objects.all()
+    queryset = plan_template_queryset()
     serializer_class = TemplateSerializer
     authentication_classes = [CsrfExemptSessionAuthentication]
     permission_classes = [IsAuthenticated]
@@ -418,22 +352,13 @@ class TemplateDetailView(RetrieveAPIView):
         print(f"🔍 TemplateDetailView.get: template_id={template_id}, user={request.user}, user_role={getattr(request.user, 'user_role', 'unknown')}")
 
         if request.user.user_role == 'inspector':
-            from .models import TemplateAssignment
-            # Check if this template is assigned to the inspector (including completed assignments for viewing results)
-            has_assignment = TemplateAssignment.objects.filter(
-                template_id=template_id,
-                inspector=request.user,
-                status__in=['assigned', 'in_progress', 'completed']
-            ).exists()
+            # Resolved once per request (the middleware already did the lookup)
+            perms = get_permission_resolver(request).resolve(template_id)
 
-            if not has_assignment:
+            # Check if this template is assigned to the inspector (including completed assignments for viewing results)
+            if not perms.has_assignment(('assigned', 'in_progress', 'completed')):
                 # Check if they have any assignment for this template (even revoked/expired) for better error message
-                any_assignment = TemplateAssignment.objects.filter(
-                    template_id=template_id,
-                    inspector=request.user
-                ).exists()
-
-                if any_assignment:
+                if perms.assignment_statuses:
                     return Response(
                         {"detail": "Your access to this template has expired or been revoked. Please contact your administrator."},
                         status=status.HTTP_403_FORBIDDEN
@@ -499,116 +424,28 @@ class TemplateDetailView(RetrieveAPIView):
             elif hasattr(logo, 'read'):
                 template.logo = logo
 
-            template.save()
-
             # Process sections if provided
+            section_plans = []
             if sections_data:
                 try:
                     sections = json.loads(sections_data) if isinstance(sections_data, str) else sections_data
-
-                    # Process sections and questions
-                    for section_data in sections:
-                        section_id = section_data.get("id")
-                        section = None
-
-                        if section_id and str(section_id).isdigit():
-                            try:
-                                section = Section.objects.get(id=section_id, template=template)
-                                section.title = section_data.get("title", section.title)
-                                section.description = section_data.get("description", section.description)
-                                section.order = section_data.get("order", section.order)
-                                section.is_collapsed = section_data.get("isCollapsed", section.is_collapsed)
-                                section.save()
-                            except Section.DoesNotExist:
-                                section = Section.objects.create(
-                                    template=template,
-                                    title=section_data.get("title"),
-                                    description=section_data.get("description", ""),
-                                    order=section_data.get("order", 0),
-                                    is_collapsed=section_data.get("isCollapsed", False),
-                                )
-                        else:
-                            # If no section ID is provided, create a new section
-                            section = Section.objects.create(
-                                template=template,
-                                title=section_data.get("title"),
-                                description=section_data.get("description", ""),
-                                order=section_data.get("order", 0),
-                                is_collapsed=section_data.get("isCollapsed", False),
-                            )
-
-                        # Create/update questions for this section
-                        for question_data in section_data.get("questions", []):
-                            response_type = question_data.get("response_type") or question_data.get("responseType")
-                            if not response_type:
-                                return Response({"error": f"response_type is required for question"}, status=400)
-
-                            question_id = question_data.get("id")
-                            if question_id and str(question_id).isdigit():
-                                question = Question.objects.filter(id=question_id, section=section).first()
-                                if question:
-                                    question.text = question_data.get("text", question.text)
-                                    question.response_type = response_type
-                                    question.required = question_data.get("required", question.required)
-                                    question.order = question_data.get("order", question.order)
-                                    # Handle both camelCase and snake_case for logic_rules
-                                    logic_rules = question_data.get("logic_rules") or question_data.get("logicRules")
-                                    if logic_rules is not None:
-                                        question.logic_rules = logic_rules
-                                    question.flagged = question_data.get("flagged", question.flagged)
-                                    question.multiple_selection = question_data.get("multipleSelection", question.multiple_selection)
-                                    question.save()
-
-                                    # Update options for existing question
-                                    question.options.all().delete()  # Remove existing options
-                                    for o_index, option in enumerate(question_data.get("options", [])):
-                                        QuestionOption.objects.create(
-                                            question=question,
-                                            text=option,
-                                            order=o_index
-                                        )
-                                else:
-                                    question = Question.objects.create(
-                                        section=section,
-                                        text=question_data.get("text"),
-                                        response_type=response_type,
-                                        required=question_data.get("required", False),
-                                        order=question_data.get("order", 0),
-                                        logic_rules=question_data.get("logic_rules") or question_data.get("logicRules"),
-                                        flagged=question_data.get("flagged", False),
-                                        multiple_selection=question_data.get("multipleSelection", False),
-                                    )
-
-                                    # Create options for new question
-                                    for o_index, option in enumerate(question_data.get("options", [])):
-                                        QuestionOption.objects.create(
-                                            question=question,
-                                            text=option,
-                                            order=o_index
-                                        )
-                            else:
-                                question = Question.objects.create(
-                                    section=section,
-                                    text=question_data.get("text"),
-                                    response_type=response_type,
-                                    required=question_data.get("required", False),
-                                    order=question_data.get("order", 0),
-                                    logic_rules=question_data.get("logic_rules") or question_data.get("logicRules"),
-                                    flagged=question_data.get("flagged", False),
-                                    multiple_selection=question_data.get("multipleSelection", False),
-                                )
-
-                                # Create options for new question
-                                for o_index, option in enumerate(question_data.get("options", [])):
-                                    QuestionOption.objects.create(
-                                        question=question,
-                                        text=option,
-                                        order=o_index
-                                    )
-                except Exception as e:
+                    # The garment builder saves through here too, with its own section shape
+                    if template.template_type == 'garment':
+                        section_plans = parse_garment_sections(sections)
+                    else:
+                        section_plans = parse_standard_sections(sections)
+                except (ValueError, TemplatePayloadError) as e:
                     print(f"Error processing sections: {e}")
                     return Response({"error": f"Error processing sections: {str(e)}"}, status=400)
 
+            diff_summary = None
+            with transaction.atomic():
+                template.save()
+                if sections_data:
+                    # Only write the inserts, updates, deletes and reorders that changed.
+                    # Removed questions that hold past inspections' answers are kept
+                    diff_summary = TemplateWriter(template).sync(section_plans, prune=True)
+
             return Response({
                 "message": "Template updated successfully!",
                 "id": template.id,
@@ -616,7 +453,8 @@ class TemplateDetailView(RetrieveAPIView):
                     "id": template.id,
                     "title": template.title,
                     "description": template.description
-                }
+                },
+                "diff": diff_summary
             }, status=status.HTTP_200_OK)
 
         except Exception as e:
@@ -630,9 +468,12 @@ class DashboardTemplateView(APIView):
 
     def get(self, request):
         # Return templates for the dashboard - only user's templates
-        templates = Template.objects.filter(user=request.user)
-        serializer = TemplateSerializer(templates, many=True)
-        return Response(serializer.data)
+        paginator = KeysetPagination()
+        templates = paginator.paginate_queryset(
+            plan_template_summary_queryset(Template.objects.filter(user=request.user)), request
+        )
+        serializer = TemplateSummarySerializer(templates, many=True, context={'request': request})
+        return paginator.add_link_header(Response(serializer.data))
 
 # Add this new view to check authentication status
 class AuthStatusView(APIView):
@@ -775,8 +616,8 @@ def logout_user(request):
 @permission_classes([IsAuthenticated])
 def user_templates(request):
     user = request.user
-    templates = Template.objects.filter(user=user)
-    serializer = TemplateSerializer(templates, many=True)
+    templates = plan_template_queryset(Template.objects.filter(user=user))
+    serializer = TemplateSerializer(templates, many=True, context={'request': request})
     return Response(serializer.data)
 
 @ensure_csrf_cookie
@@ -798,7 +639,7 @@ def get_csrf_token(request):
     return response
 
 
-from .models import Template, Section, Question, QuestionOption
+from .models import Template, Section, Question
 
 class GarmentTemplateCreateView(APIView):
     authentication_classes = [SessionAuthentication]
@@ -838,75 +679,35 @@ class GarmentTemplateCreateView(APIView):
             elif hasattr(logo, 'read'):
                 logo_file = logo
 
-            # Parse section JSON
+            # Parse and validate section JSON before touching the database
             sections = json.loads(sections_data) if isinstance(sections_data, str) else sections_data
-
-            # Create or update template
-            if template_id:
-                template = get_object_or_404(Template, id=template_id)
-                template.title = title
-                template.description = description
-                if logo_file:
-                    template.logo = logo_file
-                template.template_type = 'garment'
-                template.save()
-
-                # Clear existing sections when updating
-                template.sections.all().delete()
-            else:
-                template = Template.objects.create(
-                    user=request.user,
-                    title=title,
-                    description=description,
-                    logo=logo_file,
-                    template_type='garment'
-                )
-
-            # Loop through sections
-            for index, section_data in enumerate(sections):
-                section_type = section_data.get("type", "standard")
-                content = section_data.get("content", {})
-                aql = content.get("aqlSettings", {})
-                section = Section.objects.create(
-                    template=template,
-                    title=section_data.get("title"),
-                    description=content.get("description", ""),
-                    order=index,
-                    is_collapsed=section_data.get("isCollapsed", False),
-                    is_garment_section=(section_type == "garmentDetails"),
-                    aql_level=aql.get("aqlLevel"),
-                    inspection_level=aql.get("inspectionLevel"),
-                    sampling_plan=aql.get("samplingPlan"),
-                    severity=aql.get("severity"),
-                    sizes=content.get("sizes", []),
-                    colors=content.get("colors", []),
-                    default_defects=content.get("defaultDefects", []),
-                    include_carton_offered=content.get("includeCartonOffered", True),
-                    include_carton_inspected=content.get("includeCartonInspected", True),
-                )
-
-                # If standard, process questions
-                if section_type == "standard":
-                    for q_index, question_data in enumerate(content.get("questions", [])):
-                        # Ensure response_type is never null
-                        response_type = question_data.get("response_type") or question_data.get("responseType") or "Text"
-
-                        question = Question.objects.create(
-                            section=section,
-                            text=question_data.get("text", "Type question"),
-                            response_type=response_type,
-                            required=question_data.get("required", False),
-                            order=q_index,
-                            logic_rules=question_data.get("logic_rules") or question_data.get("logicRules"),
-                            flagged=question_data.get("flagged", False),
-                            multiple_selection=question_data.get("multiple_selection") or question_data.get("multipleSelection", False),
-                        )
-                        for o_index, option in enumerate(question_data.get("options", [])):
-                            QuestionOption.objects.create(
-                                question=question,
-                                text=option,
-                                order=o_index
-                            )
+            try:
+                section_plans = parse_garment_sections(sections or [])
+            except TemplatePayloadError as e:
+                return Response({"error": str(e)}, status=400)
+
+            with transaction.atomic():
+                # Create or update template
+                if template_id:
+                    template = get_object_or_404(Template, id=template_id)
+                    template.title = title
+                    template.description = description
+                    if logo_file:
+                        template.logo = logo_file
+                    template.template_type = 'garment'
+                    template.save()
+
+                    # Apply the changes in place; answered questions and their sections are kept
+                    TemplateWriter(template).sync(section_plans, prune=True)
+                else:
+                    template = Template.objects.create(
+                        user=request.user,
+                        title=title,
+                        description=description,
+                        logo=logo_file,
+                        template_type='garment'
+                    )
+                    TemplateWriter(template).write(section_plans)
 
             return Response({
                 "message": "Garment template saved successfully",